@@ -1,8 +1,9 @@
 #!/APSshare/anaconda/x86_64/bin/python
 
-import epics
-from epics import caput, caget
-from epics import PV
+try:
+    from PVBackend import caput, caget, PV
+except ImportError:
+    from epics import caput, caget, PV
 import time
 import numpy as np
 
@@ -5,9 +5,10 @@ This is for X-piezo scan (stage coordinates) and Y-combined (stage coordinates)
 The max scan width in X direction is 80 um.
 
 '''
-import epics
-from epics import caput, caget
-from epics import PV
+try:
+    from PVBackend import caput, caget, PV
+except ImportError:
+    from epics import caput, caget, PV
 import time
 import numpy as np
 import pdb
@@ -37,11 +37,333 @@ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 POSSIBILITY OF SUCH DAMAGE.
 '''
 
-import epics
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import asyncio
+import threading
+import time
+import PVBackend
+
+
+class CalibrationSnapshot(namedtuple('CalibrationSnapshot', ['version', 'origin_offsets', 'optical_axis_offsets',
+                                                             'offsets', 'scale_factors'])):
+    """
+    An immutable copy of the calibration values of a coordinate system.  The version
+    changes whenever any of the values are changed in the IOC.
+
+    origin_offsets and optical_axis_offsets are (x, y, z) tuples.  offsets and
+    scale_factors are (x, y, z, t, fine_x, fine_y) tuples.
+    """
+
+    __slots__ = ()
+
+
+class PVChannelPool(object):
+    """
+    A process wide pool of PV channels keyed by PV name.  Channels are created the
+    first time they are asked for and are shared by every CoordinateSystem, so
+    creating a coordinate system does not open any connections by itself.
+    """
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.executor = None
+        self.max_workers = 24
+        self.backend = None
+        self.generation = 0
+        self.channels = {}
+        self.monitor_values = {}
+        self.monitor_versions = {}
+
+        return
+
+    def get(self, pv_name):
+        """
+        Return the channel for a PV, creating it if needed.  Creating a channel
+        starts the connection in the background and does not wait for it.
+
+        :param pv_name: The full name of the PV.
+        :type  pv_name: str
+        :return: A PV object of the current backend, e.g. epics.PV
+        """
+
+        backend = PVBackend.get_backend()
+        with self.lock:
+            self.check_backend(backend)
+            pv = self.channels.get(pv_name)
+            if pv is None:
+                pv = backend.create_pv(pv_name)
+                self.channels[pv_name] = pv
+
+        return pv
+
+    def check_backend(self, backend):
+        """
+        Channels belong to a backend, start over if the backend was replaced.  The
+        generation counts the replacements, so monitored values read from an older
+        backend are never mistaken for current ones.  Must be called with the lock held.
+
+        :param backend: The current PV backend, from PVBackend.get_backend().
+        :return: None
+        """
+
+        if backend is not self.backend:
+            self.backend = backend
+            self.generation += 1
+            #  The executor threads were prepared for the old backend.
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+            self.channels = {}
+            self.monitor_values = {}
+            self.monitor_versions = {}
+
+        return
+
+    def connect(self, pv_names, timeout=5.0):
+        """
+        Connect a group of channels at once.  All of the channels are created before
+        waiting on any of them, so the connections are made concurrently and the
+        whole group takes about as long as the slowest single connection.
+
+        :param pv_names: The full names of the PVs to connect.
+        :type  pv_names: list of str
+        :param timeout:  The total time to wait for the group, in seconds.
+        :type  timeout:  float
+        :return: A list of the PV names that did not connect.
+        """
+
+        pvs = [self.get(pv_name) for pv_name in pv_names]
+        deadline = time.time() + timeout
+        not_connected = []
+        for pv in pvs:
+            if not pv.connected:
+                if not pv.wait_for_connection(timeout=max(deadline - time.time(), 0.001)):
+                    not_connected.append(pv.pvname)
+
+        return not_connected
+
+    def get_executor(self):
+        """
+        Return the thread pool used for concurrent reads.  It is created on first use
+        and its threads are prepared for the current backend.  get() discards the
+        pool when the backend is replaced.
+        """
+
+        backend = PVBackend.get_backend()
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, initializer=backend.init_thread)
+
+        return self.executor
+
+    def read_many(self, pv_names, timeout=1.0, raise_timeout=True):
+        """
+        Read a group of channels concurrently.  Every read is issued at once on the
+        thread pool, so the group takes about one round trip instead of one per PV.
+
+        :param pv_names:      The full names of the PVs to read.
+        :type  pv_names:      list of str
+        :param timeout:       The time allowed for each read, in seconds.
+        :type  timeout:       float
+        :param raise_timeout: Raise TimeoutError if a read times out, otherwise its value is None.
+        :type  raise_timeout: bool
+        :return: A list of values in the same order as pv_names.
+        """
+
+        self.connect(pv_names)
+        pvs = [self.get(pv_name) for pv_name in pv_names]
+        executor = self.get_executor()
+        futures = [executor.submit(pv.get, timeout=timeout) for pv in pvs]
+
+        values = []
+        timed_out = []
+        deadline = time.time() + timeout
+        for pv, future in zip(pvs, futures):
+            try:
+                value = future.result(timeout=max(deadline - time.time(), 0))
+            except FutureTimeoutError:
+                value = None
+            if value is None:
+                timed_out.append(pv.pvname)
+            values.append(value)
+
+        if timed_out and raise_timeout:
+            raise TimeoutError('No value read from %s within %s seconds' % (', '.join(timed_out), timeout))
+
+        return values
+
+    async def read_many_async(self, pv_names, timeout=1.0, raise_timeout=True):
+        """
+        The asyncio version of read_many().  Each read runs on the thread pool with its
+        own timeout, and the reads are gathered so they all happen concurrently.
+
+        :param pv_names:      The full names of the PVs to read.
+        :type  pv_names:      list of str
+        :param timeout:       The time allowed for each read, in seconds.
+        :type  timeout:       float
+        :param raise_timeout: Raise TimeoutError if a read times out, otherwise its value is None.
+        :type  raise_timeout: bool
+        :return: A list of values in the same order as pv_names.
+        """
+
+        loop = asyncio.get_running_loop()
+        pvs = [self.get(pv_name) for pv_name in pv_names]
+        executor = self.get_executor()
+        await loop.run_in_executor(executor, self.connect, pv_names)
+
+        async def read(pv):
+            try:
+                value = await asyncio.wait_for(loop.run_in_executor(executor, lambda: pv.get(timeout=timeout)),
+                                               timeout)
+            except asyncio.TimeoutError:
+                value = None
+            if value is None and raise_timeout:
+                raise TimeoutError('No value read from %s within %s seconds' % (pv.pvname, timeout))
+            return value
+
+        return list(await asyncio.gather(*[read(pv) for pv in pvs]))
+
+    def monitor(self, pv_names):
+        """
+        Keep the latest value of each channel in memory using a Channel Access monitor.
+        Each channel only ever gets one monitor callback, however many coordinate
+        systems use it.
+
+        :param pv_names: The full names of the PVs to monitor.
+        :type  pv_names: list of str
+        :return: None
+        """
+
+        for pv_name in pv_names:
+            pv = self.get(pv_name)
+            with self.lock:
+                if pv_name in self.monitor_versions:
+                    continue
+                self.monitor_versions[pv_name] = 0
+                generation = self.generation
+            pv.add_callback(partial(self.on_monitor, generation=generation))
+
+        return
+
+    def on_monitor(self, pvname=None, value=None, generation=None, **kwargs):
+
+        with self.lock:
+            #  Ignore updates from the channels of a replaced backend.
+            if generation != self.generation:
+                return
+            if self.monitor_values.get(pvname) != value:
+                self.monitor_values[pvname] = value
+                self.monitor_versions[pvname] = self.monitor_versions.get(pvname, 0) + 1
+
+        return
+
+    def get_monitored(self, pv_names):
+        """
+        Return the monitored values of a group of channels.
+
+        :param pv_names: The full names of the PVs.
+        :type  pv_names: list of str
+        :return: A tuple of (version, values).  The version is the backend generation
+                 and the total number of changes seen on the channels, and a value is
+                 None for a channel that has not sent a monitor update yet.
+        """
+
+        backend = PVBackend.get_backend()
+        with self.lock:
+            self.check_backend(backend)
+            version = (self.generation, sum(self.monitor_versions.get(pv_name, 0) for pv_name in pv_names))
+            values = [self.monitor_values.get(pv_name) for pv_name in pv_names]
+
+        return version, values
+
+
+pv_pool = PVChannelPool()
+
+
+class PoolPV(object):
+    """
+    A CoordinateSystem attribute that returns the channel for a PV from the shared
+    pool.  The channel is only created the first time the attribute is used.
+    """
+
+    def __init__(self, pattern):
+
+        self.pattern = pattern
+
+        return
+
+    def __get__(self, instance, owner):
+
+        if instance is None:
+            return self
+
+        return pv_pool.get(self.pattern % instance.prefix)
 
 
 class CoordinateSystem(object):
 
+    # Offsets between the center of rotation and the sample origin.
+    xo_offset_pv = PoolPV('%s:SM:SXO.VAL')
+    yo_offset_pv = PoolPV('%s:SY:SYO.VAL')
+    zo_offset_pv = PoolPV('%s:SM:SZO.VAL')
+
+    # Offsets between the center of rotation at the home positions and the optical axis.
+    xa_offset_pv = PoolPV('%s:SM:SXA.VAL')
+    ya_offset_pv = PoolPV('%s:SY:SYA.VAL')
+    za_offset_pv = PoolPV('%s:SM:SZA.VAL')
+
+    # Axes for coarse X, Y, Z, T, fine X, and fine Y
+    cx_pv = PoolPV('%s:SM:CX:RqsPos.VAL')
+    cy_pv = PoolPV('%s:SY:CY:RqsPos.VAL')
+    cz_pv = PoolPV('%s:SM:CZ:RqsPos.VAL')
+    ct_pv = PoolPV('%s:SM:CT:RqsPos.VAL')
+    fx_pv = PoolPV('%s:SM:FX:RqsPos.VAL')
+    fy_pv = PoolPV('%s:SY:FY:RqsPos.VAL')
+
+    # Drives for coarse X, Y, Z, T, fine X, and fine Y
+    sx_pv = PoolPV('%s:SM:SX:RqsPos.VAL')
+    sy_pv = PoolPV('%s:SY:SY:RqsPos.VAL')
+    sz_pv = PoolPV('%s:SM:SZ:RqsPos.VAL')
+    st_pv = PoolPV('%s:SM:ST:RqsPos.VAL')
+    px_pv = PoolPV('%s:SM:PX:RqsPos.VAL')
+    py_pv = PoolPV('%s:SY:PY:RqsPos.VAL')
+
+    # Motors for coarse X, Y, Z, T, fine X, and fine Y
+    mx_pv = PoolPV('%s:SM:mx:RqsPos.VAL')
+    my_pv = PoolPV('%s:SY:my:RqsPos.VAL')
+    mz_pv = PoolPV('%s:SM:mz:RqsPos.VAL')
+    tz_pv = PoolPV('%s:SM:mt:RqsPos.VAL')
+    mpx_pv = PoolPV('%s:SM:mpx:RqsPos.VAL')
+    mpy_pv = PoolPV('%s:SY:mpy:RqsPos.VAL')
+
+    x_offset_pv = PoolPV('%s:SM:SX:Offset.VAL')
+    x_scale_pv = PoolPV('%s:SM:SX:Scale.VAL')
+    y_offset_pv = PoolPV('%s:SY:SY:Offset.VAL')
+    y_scale_pv = PoolPV('%s:SY:SY:Scale.VAL')
+    z_offset_pv = PoolPV('%s:SM:SZ:Offset.VAL')
+    z_scale_pv = PoolPV('%s:SM:SZ:Scale.VAL')
+    t_offset_pv = PoolPV('%s:SM:ST:Offset.VAL')
+    t_scale_pv = PoolPV('%s:SM:ST:Scale.VAL')
+    fine_x_offset_pv = PoolPV('%s:SM:PX:Offset.VAL')
+    fine_x_scale_pv = PoolPV('%s:SM:PX:Scale.VAL')
+    fine_y_offset_pv = PoolPV('%s:SY:PY:Offset.VAL')
+    fine_y_scale_pv = PoolPV('%s:SY:PY:Scale.VAL')
+
+    # The attribute names of each group of PVs, in the order they are returned.
+    origin_offset_pvs = ('xo_offset_pv', 'yo_offset_pv', 'zo_offset_pv')
+    optical_axis_offset_pvs = ('xa_offset_pv', 'ya_offset_pv', 'za_offset_pv')
+    axis_pvs = ('cx_pv', 'cy_pv', 'cz_pv', 'ct_pv', 'fx_pv', 'fy_pv')
+    drive_pvs = ('sx_pv', 'sy_pv', 'sz_pv', 'st_pv', 'px_pv', 'py_pv')
+    motor_pvs = ('mx_pv', 'my_pv', 'mz_pv', 'tz_pv', 'mpx_pv', 'mpy_pv')
+    offset_pvs = ('x_offset_pv', 'y_offset_pv', 'z_offset_pv', 't_offset_pv', 'fine_x_offset_pv',
+                  'fine_y_offset_pv')
+    scale_pvs = ('x_scale_pv', 'y_scale_pv', 'z_scale_pv', 't_scale_pv', 'fine_x_scale_pv', 'fine_y_scale_pv')
+    calibration_pvs = origin_offset_pvs + optical_axis_offset_pvs + offset_pvs + scale_pvs
+
     def __init__(self, prefix):
 
         """
@@ -49,7 +371,9 @@ class CoordinateSystem(object):
         :param prefix: The ioc specific prefix of the PVs
         :type  prefix: str
         """
-    
+
+        self.prefix = prefix
+
         self.x_axis = 0
         self.z_axis = 0
         self.y_axis = 0
@@ -71,93 +395,180 @@ class CoordinateSystem(object):
         self.fine_x_motor = 0
         self.fine_y_motor = 0
 
-        # Offsets between the center of rotation and the sample origin.
-        self.xo_offset_pv = epics.PV('%s:SM:SXO.VAL' % prefix)
-        self.yo_offset_pv = epics.PV('%s:SY:SYO.VAL' % prefix)
-        self.zo_offset_pv = epics.PV('%s:SM:SZO.VAL' % prefix)
-
-        # Offsets between the center of rotation at the home positions and the optical axis.
-        self.xa_offset_pv = epics.PV('%s:SM:SXA.VAL' % prefix)
-        self.ya_offset_pv = epics.PV('%s:SY:SYA.VAL' % prefix)
-        self.za_offset_pv = epics.PV('%s:SM:SZA.VAL' % prefix)
-
-        # Axes for coarse X, Y, Z, T, fine X, and fine Y
-        self.cx_pv = epics.PV('%s:SM:CX:RqsPos.VAL' % prefix)
-        self.cy_pv = epics.PV('%s:SY:CY:RqsPos.VAL' % prefix)
-        self.cz_pv = epics.PV('%s:SM:CZ:RqsPos.VAL' % prefix)
-        self.ct_pv = epics.PV('%s:SM:CT:RqsPos.VAL' % prefix)
-        self.fx_pv = epics.PV('%s:SM:FX:RqsPos.VAL' % prefix)
-        self.fy_pv = epics.PV('%s:SY:FY:RqsPos.VAL' % prefix)
-
-        # Drives for coarse X, Y, Z, T, fine X, and fine Y
-        self.sx_pv = epics.PV('%s:SM:SX:RqsPos.VAL' % prefix)
-        self.sy_pv = epics.PV('%s:SY:SY:RqsPos.VAL' % prefix)
-        self.sz_pv = epics.PV('%s:SM:SZ:RqsPos.VAL' % prefix)
-        self.st_pv = epics.PV('%s:SM:ST:RqsPos.VAL' % prefix)
-        self.px_pv = epics.PV('%s:SM:PX:RqsPos.VAL' % prefix)
-        self.py_pv = epics.PV('%s:SY:PY:RqsPos.VAL' % prefix)
-
-        # Motors for coarse X, Y, Z, T, fine X, and fine Y
-        self.mx_pv = epics.PV('%s:SM:mx:RqsPos.VAL' % prefix)
-        self.my_pv = epics.PV('%s:SY:my:RqsPos.VAL' % prefix)
-        self.mz_pv = epics.PV('%s:SM:mz:RqsPos.VAL' % prefix)
-        self.tz_pv = epics.PV('%s:SM:mt:RqsPos.VAL' % prefix)
-        self.mpx_pv = epics.PV('%s:SM:mpx:RqsPos.VAL' % prefix)
-        self.mpy_pv = epics.PV('%s:SY:mpy:RqsPos.VAL' % prefix)
-
-        self.x_offset_pv = epics.PV('%s:SM:SX:Offset.VAL' % prefix)
-        self.x_scale_pv = epics.PV('%s:SM:SX:Scale.VAL' % prefix)
-        self.y_offset_pv = epics.PV('%s:SY:SY:Offset.VAL' % prefix)
-        self.y_scale_pv = epics.PV('%s:SY:SY:Scale.VAL' % prefix)
-        self.z_offset_pv = epics.PV('%s:SM:SZ:Offset.VAL' % prefix)
-        self.z_scale_pv = epics.PV('%s:SM:SZ:Scale.VAL' % prefix)
-        self.t_offset_pv = epics.PV('%s:SM:ST:Offset.VAL' % prefix)
-        self.t_scale_pv = epics.PV('%s:SM:ST:Scale.VAL' % prefix)
-        self.fine_x_offset_pv = epics.PV('%s:SM:PX:Offset.VAL' % prefix)
-        self.fine_x_scale_pv = epics.PV('%s:SM:PX:Scale.VAL' % prefix)
-        self.fine_y_offset_pv = epics.PV('%s:SY:PY:Offset.VAL' % prefix)
-        self.fine_y_scale_pv = epics.PV('%s:SY:PY:Scale.VAL' % prefix)
+        self.calibration = None
 
         return
 
+    def get_pv_names(self, attributes):
+        """
+        :param attributes: The attribute names of a group of PVs, e.g. CoordinateSystem.drive_pvs
+        :type  attributes: tuple of str
+        :return: A list of the full PV names.
+        """
+
+        return [getattr(type(self), attribute).pattern % self.prefix for attribute in attributes]
+
+    def connect(self, attributes=None, timeout=5.0):
+        """
+        Connect a group of PVs, or all of them, in one concurrent batch.
+
+        :param attributes: The attribute names of the PVs to connect.  Connects all PVs if None.
+        :type  attributes: tuple of str
+        :param timeout:    The total time to wait for the connections, in seconds.
+        :type  timeout:    float
+        :return: A list of the PV names that did not connect.
+        """
+
+        if attributes is None:
+            attributes = self.calibration_pvs + self.axis_pvs + self.drive_pvs + self.motor_pvs
+
+        return pv_pool.connect(self.get_pv_names(attributes), timeout)
+
+    def read_pvs(self, attributes, timeout=1.0, raise_timeout=True):
+        """
+        Read a group of PVs concurrently.
+
+        :param attributes:    The attribute names of the PVs, e.g. CoordinateSystem.axis_pvs
+        :type  attributes:    tuple of str
+        :param timeout:       The time allowed for each read, in seconds.
+        :type  timeout:       float
+        :param raise_timeout: Raise TimeoutError if a read times out, otherwise its value is None.
+        :type  raise_timeout: bool
+        :return: A list of values in the same order as attributes.
+        """
+
+        return pv_pool.read_many(self.get_pv_names(attributes), timeout, raise_timeout)
+
+    async def read_pvs_async(self, attributes, timeout=1.0, raise_timeout=True):
+        """
+        The asyncio version of read_pvs().
+        """
+
+        return await pv_pool.read_many_async(self.get_pv_names(attributes), timeout, raise_timeout)
+
+    def get_limits(self, attributes, timeout=1.0):
+        """
+        Read the low and high drive limits (the DRVL and DRVH fields) of a group of
+        position PVs in one concurrent batch.  EPICS uses equal limits to mean that no
+        limits are set, so those are returned as -inf and inf.
+
+        :param attributes: The attribute names of the PVs, e.g. CoordinateSystem.drive_pvs
+        :type  attributes: tuple of str
+        :param timeout:    The time allowed for each read, in seconds.
+        :type  timeout:    float
+        :return: Two lists of (low limits, high limits) in the same order as attributes.
+        """
+
+        pv_names = [pv_name.replace('.VAL', '') for pv_name in self.get_pv_names(attributes)]
+        values = pv_pool.read_many(['%s.DRVL' % pv_name for pv_name in pv_names] +
+                                   ['%s.DRVH' % pv_name for pv_name in pv_names], timeout)
+        low_limits = values[:len(pv_names)]
+        high_limits = values[len(pv_names):]
+
+        for i in range(len(pv_names)):
+            if low_limits[i] == high_limits[i]:
+                low_limits[i] = float('-inf')
+                high_limits[i] = float('inf')
+
+        return low_limits, high_limits
+
+    def get_drive_limits(self, timeout=1.0):
+
+        return self.get_limits(self.drive_pvs, timeout)
+
+    def get_motor_limits(self, timeout=1.0):
+
+        return self.get_limits(self.motor_pvs, timeout)
+
+    def get_calibration(self):
+        """
+        Return the current calibration snapshot.  The calibration PVs are monitored, so
+        a new snapshot is only built after a monitor has reported a changed value, and
+        only PVs that have not yet sent a monitor update are read from the IOC.
+
+        :return: A CalibrationSnapshot
+        """
+
+        pv_names = self.get_pv_names(self.calibration_pvs)
+        version, values = pv_pool.get_monitored(pv_names)
+
+        if self.calibration is not None and self.calibration.version == version and None not in values:
+            return self.calibration
+
+        if None in values:
+            pv_pool.monitor(pv_names)
+            self.connect(self.calibration_pvs)
+            version, values = pv_pool.get_monitored(pv_names)
+            missing = [pv_name for pv_name, value in zip(pv_names, values) if value is None]
+            if missing:
+                read_values = dict(zip(missing, pv_pool.read_many(missing)))
+                values = [read_values[pv_name] if value is None else value
+                          for pv_name, value in zip(pv_names, values)]
+
+        snapshot = CalibrationSnapshot(version, tuple(values[0:3]), tuple(values[3:6]),
+                                       tuple(values[6:12]), tuple(values[12:18]))
+        self.calibration = snapshot
+
+        return snapshot
+
     def get_offsets(self):
 
-        return self.x_offset_pv.get(), self.y_offset_pv.get(), self.z_offset_pv.get(), self.t_offset_pv.get(), self.fine_x_offset_pv.get(), self.fine_y_offset_pv.get()
+        return self.get_calibration().offsets
 
     def get_scale_factors(self):
 
-        return self.x_scale_pv.get(), self.y_scale_pv.get(), self.z_scale_pv.get(), self.t_scale_pv.get(), self.fine_x_scale_pv.get(), self.fine_y_scale_pv.get()
+        return self.get_calibration().scale_factors
 
     def get_sample_origin_offsets(self):
     
-        return self.xo_offset_pv.get(), self.yo_offset_pv.get(), self.zo_offset_pv.get()
+        return self.get_calibration().origin_offsets
 
     def get_optical_axis_offsets(self):
     
-        return self.xa_offset_pv.get(), self.ya_offset_pv.get(), self.za_offset_pv.get()
+        return self.get_calibration().optical_axis_offsets
 
-    def get_axis_pv_positions(self):
-    
-        self.x_axis = self.cx_pv.get()
-        self.y_axis = self.cy_pv.get()
-        self.z_axis = self.cz_pv.get()
-        self.t_axis = self.ct_pv.get()
-        self.fine_x_axis = self.fx_pv.get()
-        self.fine_y_axis = self.fy_pv.get()
+    def get_axis_pv_positions(self, timeout=1.0):
+
+        (self.x_axis, self.y_axis, self.z_axis, self.t_axis, self.fine_x_axis,
+         self.fine_y_axis) = self.read_pvs(self.axis_pvs, timeout, False)
+
+        return self.x_axis, self.y_axis, self.z_axis, self.t_axis, self.fine_x_axis, self.fine_y_axis
+
+    async def get_axis_pv_positions_async(self, timeout=1.0):
+
+        (self.x_axis, self.y_axis, self.z_axis, self.t_axis, self.fine_x_axis,
+         self.fine_y_axis) = await self.read_pvs_async(self.axis_pvs, timeout, False)
 
         return self.x_axis, self.y_axis, self.z_axis, self.t_axis, self.fine_x_axis, self.fine_y_axis
 
-    def get_drive_pv_positions(self):
+    def get_drive_pv_positions(self, timeout=1.0):
+
+        (self.x_drive, self.y_drive, self.z_drive, self.t_drive, self.fine_x_drive,
+         self.fine_y_drive) = self.read_pvs(self.drive_pvs, timeout, False)
 
-        self.x_drive = self.sx_pv.get()
-        self.y_drive = self.sy_pv.get()
-        self.z_drive = self.sz_pv.get()
-        self.t_drive = self.st_pv.get()
-        self.fine_x_drive = self.px_pv.get()
-        self.fine_y_drive = self.py_pv.get()
+        return self.x_drive, self.y_drive, self.z_drive, self.t_drive, self.fine_x_drive, self.fine_y_drive
+
+    async def get_drive_pv_positions_async(self, timeout=1.0):
+
+        (self.x_drive, self.y_drive, self.z_drive, self.t_drive, self.fine_x_drive,
+         self.fine_y_drive) = await self.read_pvs_async(self.drive_pvs, timeout, False)
 
         return self.x_drive, self.y_drive, self.z_drive, self.t_drive, self.fine_x_drive, self.fine_y_drive
 
+    def get_motor_pv_positions(self, timeout=1.0):
+
+        (self.x_motor, self.y_motor, self.z_motor, self.t_motor, self.fine_x_motor,
+         self.fine_y_motor) = self.read_pvs(self.motor_pvs, timeout, False)
+
+        return self.x_motor, self.y_motor, self.z_motor, self.t_motor, self.fine_x_motor, self.fine_y_motor
+
+    async def get_motor_pv_positions_async(self, timeout=1.0):
+
+        (self.x_motor, self.y_motor, self.z_motor, self.t_motor, self.fine_x_motor,
+         self.fine_y_motor) = await self.read_pvs_async(self.motor_pvs, timeout, False)
+
+        return self.x_motor, self.y_motor, self.z_motor, self.t_motor, self.fine_x_motor, self.fine_y_motor
+
     def get_axis_positions(self):
 
         return self.x_axis, self.y_axis, self.z_axis, self.t_axis, self.fine_x_axis, self.fine_y_axis
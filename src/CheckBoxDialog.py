@@ -38,6 +38,7 @@ POSSIBILITY OF SUCH DAMAGE.
 '''
 
 import math
+import numpy as np
 
 try:
     from PyQt4.QtGui import *
@@ -50,11 +51,13 @@ except ImportError:
 
 class QMessageBoxWithCheckBox(QMessageBox):
 
-    def __init__(self, box_list=None):
+    def __init__(self, box_list=None, exclusive=True, previews=None):
         super(QMessageBoxWithCheckBox, self).__init__()
 
         self.element_dict = {}
         checkbox_group = QButtonGroup(self)
+        #  Allow more than one box to be checked, e.g. to combine elements.
+        checkbox_group.setExclusive(exclusive)
         layout = self.layout()
 
         list_length = len(box_list)
@@ -77,6 +80,32 @@ class QMessageBoxWithCheckBox(QMessageBox):
             layout.addWidget(checkbox,pos[j][0],pos[j][1])
             j = j+1
 
+        if previews:
+            self.set_previews(previews)
+
+        return
+
+    def set_previews(self, previews):
+        """
+        Show a thumbnail and the signal to noise ratio next to each name.
+
+        :param previews: A dictionary of name to (thumbnail scaled from 0 to 1, signal to noise ratio).
+        :type  previews: dict
+        """
+
+        for name, (thumbnail, snr) in previews.items():
+            checkbox = self.element_dict.get(name)
+            if checkbox is None:
+                continue
+
+            pixels = np.ascontiguousarray(np.clip(thumbnail * 255, 0, 255).astype(np.uint8))
+            height, width = pixels.shape
+            image = QImage(pixels.data, width, height, width, QImage.Format_Grayscale8).copy()
+            checkbox.setIcon(QIcon(QPixmap.fromImage(image)))
+            checkbox.setIconSize(QSize(width, height))
+            checkbox.setText('{} (SNR {:.1f})'.format(name, snr))
+            checkbox.setMinimumSize(width + 120, height + 4)
+
         return
 
     def exec_(self, *args, **kwargs):
@@ -37,9 +37,13 @@ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 POSSIBILITY OF SUCH DAMAGE.
 '''
 
+import os
 from XRF_Boundary import *
 from CreateScriptWidget import *
 from CheckBoxDialog import QMessageBoxWithCheckBox
+from ScanWatcher import ScanWatcher, ScanIndexThread
+from RoiViews import RoiGrid, RoiMosaic
+from ElementPreview import PreviewThread
 from os.path import expanduser
 
 try:
@@ -59,6 +63,7 @@ class CoarseScanWidget(QWidget):
         self.parent = parent
         self.scan_boundary = XRFBoundary()
         self.scan_boundary.roiChangedSig.connect(self.bounds_changed)
+        self.scan_boundary.roiRowsChangedSig.connect(self.bounds_rows_changed)
         self.file_path = None
         self.file_list = None
         self.scan_params = None
@@ -104,6 +109,16 @@ class CoarseScanWidget(QWidget):
         self.bound_y = QCheckBox("Bound y")
         self.bound_y.setChecked(True)
 
+        self.sinusoid_fit = QCheckBox("Sinusoid fit")
+        self.sinusoid_fit.setChecked(False)
+        self.sinusoid_fit.setToolTip('Fit a sinusoidal model to the coarse boundaries instead of interpolating '
+                                     'between them.')
+
+        self.full_rotation = QCheckBox("Full rotation")
+        self.full_rotation.setChecked(False)
+        self.full_rotation.setToolTip('Build fine scans over 360 degrees from the first coarse scan angle, '
+                                      'interpolating across the last and first coarse scans.')
+
         self.build_scan_button = QPushButton('Build Scan')
         self.build_scan_button.setStyleSheet('background-color: yellow')
         self.build_scan_button.setMaximumSize(200, 25)
@@ -116,6 +131,24 @@ class CoarseScanWidget(QWidget):
         self.show_plots_button.setToolTip('Show plots with calculated boundaries.')
         self.show_plots_button.clicked.connect(self.on_show_plots_button_click)
 
+        self.watch_directory = QCheckBox("Watch directory")
+        self.watch_directory.setChecked(False)
+        self.watch_directory.setToolTip('Add new scan files in the selected directory as they are written, and '
+                                        'update the built scan.')
+        self.watch_directory.toggled.connect(self.on_watch_directory_toggled)
+        self.scan_watcher = None
+        #  New files are indexed in the background, one group at a time.
+        self.index_thread = None
+        self.pending_scans = []
+
+        #  Thumbnails and signal to noise ratios of the elements, calculated in the background.
+        self.element_previews = None
+        self.preview_thread = None
+
+        self.mosaic_view = QCheckBox("Mosaic view")
+        self.mosaic_view.setChecked(False)
+        self.mosaic_view.setToolTip('Show all ROIs in one downsampled image, click an image to adjust its ROI.')
+
         self.label_x_size = QLabel('X step size (mm)')
         self.label_x_size.setAlignment(Qt.AlignRight)
         self.text_x_size = QLineEdit('0.001')
@@ -154,7 +187,16 @@ class CoarseScanWidget(QWidget):
         self.text_element = QLineEdit()
         self.text_element.setReadOnly(True)
         self.text_element.setMinimumWidth(70)
-        self.text_element.setMaximumSize(70, 20)
+        self.text_element.setMaximumSize(140, 20)
+
+        self.label_combine = QLabel('Combine elements')
+        self.label_combine.setAlignment(Qt.AlignRight)
+        self.combine_elements = QComboBox()
+        self.combine_elements.addItem('Sum', 'sum')
+        self.combine_elements.addItem('Union', 'union')
+        self.combine_elements.setMaximumSize(100, 20)
+        self.combine_elements.setToolTip('Find the boundaries of the sum of the elements, or boundaries that contain '
+                                         'those of every element.')
 
         self.label_coefficient = QLabel('Boundary Coefficient')
         self.label_coefficient.setAlignment(Qt.AlignRight)
@@ -162,6 +204,14 @@ class CoarseScanWidget(QWidget):
         self.text_coefficient.setMinimumWidth(70)
         self.text_coefficient.setMaximumSize(70, 20)
 
+        self.coefficient_slider = QSlider(Qt.Horizontal)
+        self.coefficient_slider.setRange(0, 100)
+        self.coefficient_slider.setMaximumSize(200, 20)
+        self.coefficient_slider.setToolTip('Change the boundary coefficient of the built scan.')
+        self.coefficient_slider.setDisabled(True)
+        self.coefficient_slider.valueChanged.connect(self.on_coefficient_slider_changed)
+        self.coefficient_slider.sliderReleased.connect(self.on_coefficient_slider_released)
+
         self.label_boundary_offset_x = QLabel('X offset left,right (mm)')
         self.label_boundary_offset_x.setAlignment(Qt.AlignRight)
         self.text_boundary_offset_x = QLineEdit('0,0')
@@ -201,10 +251,16 @@ class CoarseScanWidget(QWidget):
         grid_layout.addWidget(self.select_element_button, 1, 0)
         grid_layout.addWidget(self.build_scan_button, 2, 0)
         grid_layout.addWidget(self.show_plots_button, 3, 0)
+        grid_layout.addWidget(self.mosaic_view, 5, 0)
+        grid_layout.addWidget(self.watch_directory, 5, 1)
+        grid_layout.addWidget(self.label_combine, 5, 2)
+        grid_layout.addWidget(self.combine_elements, 5, 3)
         grid_layout.addWidget(self.label_ETA,4,0)
 
         grid_layout.addWidget(self.text_num_files, 0, 1)
+        grid_layout.addWidget(self.full_rotation, 1, 1)
         grid_layout.addWidget(self.bound_y,2,1)
+        grid_layout.addWidget(self.sinusoid_fit,3,1)
         grid_layout.addWidget(self.text_ETA,4,1)
 
         grid_layout.addWidget(self.label_x_size, 0, 2)
@@ -225,6 +281,7 @@ class CoarseScanWidget(QWidget):
         grid_layout.addWidget(self.text_element, 3, 3)
         grid_layout.addWidget(self.text_angle_offset, 1, 5)
         grid_layout.addWidget(self.text_coefficient, 2, 5)
+        grid_layout.addWidget(self.coefficient_slider, 2, 6)
         grid_layout.addWidget(self.text_boundary_offset_x, 3, 5)
         grid_layout.addWidget(self.text_boundary_offset_y, 4, 5)
         grid_layout.addWidget(self.text_stage_pv, 4, 3)
@@ -283,6 +340,7 @@ class CoarseScanWidget(QWidget):
         else:
             self.scan_boundary.open_files(self.file_path, self.file_list, stage_pv)
             self.select_element_button.setDisabled(False)
+            self.start_element_previews()
             num_files = len(self.scan_boundary.get_hdf_file_list())
             self.text_num_files.setText('{} Files Selected'.format(num_files))
 
@@ -299,28 +357,185 @@ class CoarseScanWidget(QWidget):
             return
         return
 
+    def on_watch_directory_toggled(self, checked):
+
+        if self.scan_watcher is not None:
+            self.scan_watcher.stop()
+            self.scan_watcher = None
+
+        if not checked:
+            return
+
+        stage_pv = self.text_stage_pv.text()
+        if self.file_path is None or stage_pv == '':
+            err_msg = QMessageBox()
+            err_msg.setIcon(QMessageBox.Critical)
+            err_msg.setText('Missing Information')
+            err_msg.setInformativeText('No directory or stage PV')
+            err_msg.setDetailedText('Please make sure that a directory has been selected in the browser window and a '
+                                    'valid PV has been given for the rotation stage.')
+            err_msg.setStandardButtons(QMessageBox.Ok)
+            err_msg.exec_()
+            self.watch_directory.setChecked(False)
+            return
+
+        #  Only files written after watching starts are added, not the files that the user
+        #  left out of the selection.
+        known_paths = set(self.scan_boundary.file_names.get(1, []))
+        try:
+            known_paths.update(os.path.join(self.file_path, file_name) for file_name in os.listdir(self.file_path)
+                               if file_name.endswith('.h5'))
+        except OSError as e:
+            print('Unable to list {}: {}'.format(self.file_path, e))
+
+        self.scan_watcher = ScanWatcher(stage_pv)
+        self.scan_watcher.scansReady.connect(self.on_scans_ready)
+        self.scan_watcher.start(self.file_path, known_paths)
+
+        return
+
+    def on_scans_ready(self, paths):
+        """
+        Queue scan files found by the directory watcher to be indexed in the background.
+        """
+
+        self.pending_scans.extend(paths)
+        if self.index_thread is None:
+            self.start_scan_indexing()
+
+        return
+
+    def start_scan_indexing(self):
+
+        paths, self.pending_scans = self.pending_scans, []
+        self.index_thread = ScanIndexThread(paths, self.text_stage_pv.text(), self)
+        self.index_thread.scansIndexed.connect(self.on_scans_indexed)
+        self.index_thread.finished.connect(self.on_index_thread_finished)
+        self.index_thread.start()
+
+        return
+
+    def on_index_thread_finished(self):
+
+        thread = self.sender()
+        if thread is self.index_thread:
+            self.index_thread = None
+        thread.deleteLater()
+
+        if self.index_thread is None and self.pending_scans:
+            self.start_scan_indexing()
+
+        return
+
+    def on_scans_indexed(self, records):
+        """
+        Add indexed scan files to the scan.  If the scan has been built, the boundaries and edited
+        ROIs of the other files and the fine scans that do not depend on the new files are kept.
+        """
+
+        had_rows = len(self.scan_boundary.bounds_positions) > 0
+        num_added = self.scan_boundary.add_records(records)
+        if num_added == 0:
+            return
+
+        num_files = len(self.scan_boundary.get_hdf_file_list())
+        self.text_num_files.setText('{} Files Selected'.format(num_files))
+        self.select_element_button.setDisabled(False)
+        if self.element_previews is None:
+            self.start_element_previews()
+
+        if self.scan_params is not None and had_rows:
+            self.scan_params = self.scan_boundary.get_boundaries()
+            self.fill_scan_table()
+            self.text_ETA.setText(self.get_ETA())
+        elif self.scan_params is not None and self.text_element.text() != '' and num_files >= 2:
+            self.on_build_scan_button_click()
+
+        self.refresh_roi_views()
+
+        return
+
+    def refresh_roi_views(self):
+        """
+        Show an open ROI window again after scans were added.  The windows refer to the
+        projections by their index, which changes when the scans are sorted again.
+        """
+
+        w = getattr(self.parent, 'w', None)
+        if isinstance(w, (RoiGrid, RoiMosaic)):
+            visible = w.isVisible()
+            w.close()
+            if visible:
+                self.on_show_plots_button_click()
+
+        return
+
+    def start_element_previews(self):
+        """
+        Start calculating the element thumbnails and signal to noise ratios shown by the
+        element picker, from a subset of the opened files.
+        """
+
+        self.element_previews = None
+        self.scan_boundary.create_element_list()
+        elem_list = self.scan_boundary.get_element_list()
+        if not elem_list:
+            return
+
+        #  The thread belongs to this widget, and deletes itself when it is done.
+        self.preview_thread = PreviewThread(self.scan_boundary.file_names[1], elem_list, self)
+        self.preview_thread.previewsReady.connect(self.on_element_previews_ready)
+        self.preview_thread.finished.connect(self.on_preview_thread_finished)
+        self.preview_thread.start()
+
+        return
+
+    def on_element_previews_ready(self, previews):
+
+        #  Previews from a thread started for older files are not used.
+        if self.sender() is self.preview_thread:
+            self.element_previews = previews
+
+        return
+
+    def on_preview_thread_finished(self):
+
+        thread = self.sender()
+        if thread is self.preview_thread:
+            self.preview_thread = None
+        thread.deleteLater()
+
+        return
+
     def on_select_element_button_click(self):
 
         self.scan_boundary.create_element_list()
         elem_list = self.scan_boundary.get_element_list()
-        elem_dialog = QMessageBoxWithCheckBox(elem_list)
+        elem_dialog = QMessageBoxWithCheckBox(elem_list, exclusive=False, previews=self.element_previews)
+        #  Show the previews if they are calculated while the picker is open.
+        thread = self.preview_thread if self.element_previews is None else None
+        if thread is not None:
+            thread.previewsReady.connect(elem_dialog.set_previews)
         ret_val, elem_dict = elem_dialog.exec_()
-
-        for key, value in elem_dict.items():
-            if value.isChecked():
-                self.text_element.setText(key)
-                self.build_scan_button.setDisabled(False)
+        if thread is not None:
+            try:
+                thread.previewsReady.disconnect(elem_dialog.set_previews)
+            except (TypeError, RuntimeError):
+                pass
+
+        #  Several elements can be checked, their boundaries are combined.
+        elements = [elem for elem in elem_list if elem_dict[elem].isChecked()]
+        if elements:
+            self.text_element.setText(', '.join(elements))
+            self.build_scan_button.setDisabled(False)
 
         #tmp
         # self.text_element.setText('TFY')
         self.build_scan_button.setDisabled(False)
         return
 
-    def on_build_scan_button_click(self):
-        coefficient = int(self.text_coefficient.text())
-        element = self.text_element.text()
-        dtheta = float(self.text_theta.text())
-        angle_offset = float(self.text_angle_offset.text())
+    def get_boundary_offsets(self):
+
         try:
             left_offset, right_offset = self.text_boundary_offset_x.text().split(',')
             top_offset, bottom_offset = self.text_boundary_offset_y.text().split(',')
@@ -339,50 +554,121 @@ class CoarseScanWidget(QWidget):
             top_offset = float(top_offset)
             bottom_offset = float(bottom_offset)
 
-        element_index = self.scan_boundary.get_element_index(element)
-        self.scan_boundary.calc_xy_bounds(coefficient, element_index, self.bound_y.isChecked())
-        self.scan_boundary.interpolate_bounds(dtheta)
-        self.scan_boundary.offset_bounds(angle_offset, left_offset, right_offset, top_offset, bottom_offset)
-        self.scan_boundary.offset_ROI_bounds(left_offset, right_offset, top_offset, bottom_offset)
-        self.scan_params = self.scan_boundary.get_boundaries()
+        return left_offset, right_offset, top_offset, bottom_offset
+
+    def on_build_scan_button_click(self):
+        coefficient = int(self.text_coefficient.text())
+        elements = [element.strip() for element in self.text_element.text().split(',')]
+        combine = self.combine_elements.currentData()
+
+        element_index = [self.scan_boundary.get_element_index(element) for element in elements]
+        if 0 <= coefficient <= 100:
+            #  Find the bounds of every coefficient, so that the slider can change it without
+            #  recalculating them.
+            self.scan_boundary.calc_bounds_sweep(element_index, self.bound_y.isChecked(), combine)
+            self.coefficient_slider.blockSignals(True)
+            self.coefficient_slider.setValue(coefficient)
+            self.coefficient_slider.blockSignals(False)
+            self.coefficient_slider.setDisabled(False)
+            self.scan_boundary.select_coefficient(coefficient)
+        else:
+            self.scan_boundary.bounds_sweep = None
+            self.coefficient_slider.setDisabled(True)
+            self.scan_boundary.calc_xy_bounds(coefficient, element_index, self.bound_y.isChecked(), combine)
+
+        self.build_scan_params()
+        self.fill_scan_table()
 
         self.show_plots_button.setDisabled(False)
         self.build_scan_button.setDisabled(False)
         #  self.enable_build_scan_button()
 
-        self.scan_params2 = []
+    def build_scan_params(self):
+        """
+        Interpolate and offset the current boundaries of self.scan_boundary into scan parameters.
+        """
+
+        dtheta = float(self.text_theta.text())
+        angle_offset = float(self.text_angle_offset.text())
+        left_offset, right_offset, top_offset, bottom_offset = self.get_boundary_offsets()
+
+        period = 360.0 if self.full_rotation.isChecked() else None
+        if self.sinusoid_fit.isChecked():
+            self.scan_boundary.interpolate_bounds(dtheta, period=period, model='sinusoid')
+        else:
+            self.scan_boundary.interpolate_bounds(dtheta, period=period)
+        self.scan_boundary.offset_bounds(angle_offset, left_offset, right_offset, top_offset, bottom_offset)
+        self.scan_boundary.offset_ROI_bounds(left_offset, right_offset, top_offset, bottom_offset)
+        self.scan_params = self.scan_boundary.get_boundaries()
+
         self.x_pixel_size = self.text_x_size.text()
         self.y_pixel_size = self.text_y_size.text()
         self.dwell_time = self.text_dwell.text()
-        coordinate_list = []
 
-        self.parent.file_tab.scan_table.setRowCount(len(self.scan_params))
-        for i in range(len(self.scan_params)): # i is the row number
-            self.parent.file_tab.scan_table.setItem(i,0,QTableWidgetItem(str(self.scan_params[i][1]))) #  x center
-            self.parent.file_tab.scan_table.setItem(i,1,QTableWidgetItem(str(self.scan_params[i][3]))) #  y center
-            self.parent.file_tab.scan_table.setItem(i,2,QTableWidgetItem(str(0))) #  z center
-            self.parent.file_tab.scan_table.setItem(i,3,QTableWidgetItem(str(self.scan_params[i][0]))) #  theta
-            self.parent.file_tab.scan_table.setItem(i,4,QTableWidgetItem(str(self.scan_params[i][2]))) #  x width
-            self.parent.file_tab.scan_table.setItem(i,5,QTableWidgetItem(str(self.x_pixel_size))) #  x step_size
-            self.parent.file_tab.scan_table.setItem(i,6,QTableWidgetItem(str(self.scan_params[i][4]))) #  y width
-            self.parent.file_tab.scan_table.setItem(i,7,QTableWidgetItem(str(self.y_pixel_size))) #  y step_sze
-            self.parent.file_tab.scan_table.setItem(i,8,QTableWidgetItem(str(self.dwell_time))) #  dwell time
+        eta = self.get_ETA()
+        self.text_ETA.setText(eta)
 
-            coordinate_list.append((self.scan_params[i][1], self.scan_params[i][3], 0, self.scan_params[i][0],
-                                    self.scan_params[i][1], self.scan_params[i][3]))
+        return
 
-        self.parent.file_tab.set_coordinate_list(coordinate_list)
+    def on_coefficient_slider_changed(self, coefficient):
+        """
+        Show the ETA of a new coefficient while the slider moves.  The scan table is
+        only filled when the slider is released.
+        """
 
-        eta = self.get_ETA()
-        self.text_ETA.setText(eta)
+        self.text_coefficient.setText(str(coefficient))
+        if self.scan_boundary.bounds_sweep is None:
+            return
+
+        self.scan_boundary.select_coefficient(coefficient)
+        self.build_scan_params()
+        if not self.coefficient_slider.isSliderDown():
+            self.fill_scan_table()
+
+        return
+
+    def on_coefficient_slider_released(self):
+
+        if self.scan_boundary.bounds_sweep is not None:
+            self.fill_scan_table()
+
+        return
 
     def bounds_changed(self, new_bounds):
         self.scan_params = new_bounds
 
-        self.scan_params2 = []
         self.x_pixel_size = self.text_x_size.text()
         self.y_pixel_size = self.text_y_size.text()
         self.dwell_time = self.text_dwell.text()
+
+        self.fill_scan_table()
+        eta = self.get_ETA()
+        self.text_ETA.setText(eta)
+
+    def bounds_rows_changed(self, rows, new_rows):
+        """
+        Update only the rows of the scan table whose boundaries were changed by an ROI edit.
+        """
+
+        scan_table = self.parent.file_tab.scan_table
+        coordinate_list = self.parent.file_tab.coordinate_list
+
+        for i, params in zip(rows, new_rows):
+            self.scan_params[i] = params
+            scan_table.setItem(i,0,QTableWidgetItem(str(params[1]))) #  x center
+            scan_table.setItem(i,1,QTableWidgetItem(str(params[3]))) #  y center
+            scan_table.setItem(i,3,QTableWidgetItem(str(params[0]))) #  theta
+            scan_table.setItem(i,4,QTableWidgetItem(str(params[2]))) #  x width
+            scan_table.setItem(i,6,QTableWidgetItem(str(params[4]))) #  y width
+            if i < len(coordinate_list):
+                coordinate_list[i] = (params[1], params[3], 0, params[0], params[1], params[3])
+
+        eta = self.get_ETA()
+        self.text_ETA.setText(eta)
+
+    def fill_scan_table(self):
+
+        self.scan_params2 = []
         coordinate_list = []
 
         self.parent.file_tab.scan_table.setRowCount(len(self.scan_params))
@@ -401,8 +687,6 @@ class CoarseScanWidget(QWidget):
                                     self.scan_params[i][1], self.scan_params[i][3]))
 
         self.parent.file_tab.set_coordinate_list(coordinate_list)
-        eta = self.get_ETA()
-        self.text_ETA.setText(eta)
 
     def get_ETA(self):
 
@@ -418,7 +702,10 @@ class CoarseScanWidget(QWidget):
 
     def on_show_plots_button_click(self):
 
-        w = self.scan_boundary.show_roi_box2()
+        if self.mosaic_view.isChecked():
+            w = self.scan_boundary.show_roi_mosaic()
+        else:
+            w = self.scan_boundary.show_roi_box2()
         self.parent.w = w
         self.parent.w.show()
         # self.scan_boundary.show_roi_box()
@@ -168,9 +168,21 @@ class CoordinatesWidget(QWidget):
         if self.usePVValuesRadioButton.isChecked():
             # Create a coordinate system and get the current drive values
             coords = CS("9idbTAU")
-            coarse_x, coarse_y, z_coord, theta, x_coord, y_coord = coords.get_drive_pv_positions()
-            # Convert the axes values to drive values using the new angle entered.
-            self.xzt_transform.transform_axes(t_coord, coarse_x, coarse_y, z_coord, x_coord, y_coord, True, True)
+            try:
+                coarse_x, coarse_y, z_coord, theta, x_coord, y_coord = coords.read_pvs(coords.drive_pvs)
+                # Convert the axes values to drive values using the new angle entered.
+                self.xzt_transform.transform_axes(t_coord, coarse_x, coarse_y, z_coord, x_coord, y_coord, True, True)
+            except TimeoutError as e:
+                # Never add a coordinate calculated from missing PV values.
+                err_msg = QMessageBox()
+                err_msg.setIcon(QMessageBox.Critical)
+                err_msg.setText('PV Read Failed')
+                err_msg.setInformativeText('The current positions could not be read, no coordinates were added.')
+                err_msg.setDetailedText(str(e))
+                err_msg.setStandardButtons(QMessageBox.Ok)
+                err_msg.exec_()
+
+                return
             coords = None
 
         # If the user wants to use the text field values, they must first be converted to axis
@@ -41,6 +41,7 @@ import stat
 
 from ScriptWriter import FlyScanScriptWriter
 from ScriptWriter import ScriptLogWriter
+from ScanLimits import check_scan_limits, format_violations
 
 try:
     from PyQt4.QtGui import *
@@ -157,6 +158,66 @@ class ScriptWidget(QWidget):
         file_tab_vbox.addLayout(hbox)
         self.setLayout(file_tab_vbox)
 
+    def check_scan_limits(self, x_width_list, y_width_list):
+        """
+        Check every corner of every scan against the drive and motor limits before a
+        script is written.  The limits and the calibration are read once from the IOC.
+
+        :return: True if the script should be written.
+        """
+
+        transform = self.parent.table_tab.xzt_transform
+        coordsys = transform.coordsys
+
+        try:
+            calibration = transform.get_calibration()
+            drive_limits = coordsys.get_drive_limits()
+            motor_limits = coordsys.get_motor_limits()
+        except TimeoutError as e:
+            return self.confirm_unchecked_limits('The limits or the calibration could not be read.', e)
+
+        try:
+            violations = check_scan_limits(calibration, self.coordinate_list, x_width_list, y_width_list,
+                                           drive_limits, motor_limits)
+        except ValueError as e:
+            return self.confirm_unchecked_limits('The scan plan could not be checked.', e)
+
+        if not violations:
+            return True
+
+        rows = sorted(set(violation.row for violation in violations))
+        err_msg = QMessageBox()
+        err_msg.setIcon(QMessageBox.Critical)
+        err_msg.setText('Scan Outside Limits')
+        err_msg.setInformativeText('{} of {} scans move outside of the drive or motor limits: rows {}'.format(
+                                   len(rows), len(self.coordinate_list), ', '.join(str(row) for row in rows)))
+        err_msg.setDetailedText(format_violations(violations))
+        err_msg.setStandardButtons(QMessageBox.Ok)
+        err_msg.exec_()
+
+        return False
+
+    def confirm_unchecked_limits(self, reason, error):
+        """
+        Ask the user whether to write the script when the scan limits could not be checked.
+
+        :param reason: Why the limits were not checked.
+        :type  reason: str
+        :param error:  The exception that stopped the check.
+        :type  error:  Exception
+        :return: True if the script should be written without the check.
+        """
+
+        warn_msg = QMessageBox()
+        warn_msg.setIcon(QMessageBox.Warning)
+        warn_msg.setText('Scan Limits Not Checked')
+        warn_msg.setInformativeText('{} Write the script without checking the scan limits?'.format(reason))
+        warn_msg.setDetailedText(str(error))
+        warn_msg.setStandardButtons(QMessageBox.Ok | QMessageBox.Cancel)
+        warn_msg.setDefaultButton(QMessageBox.Cancel)
+
+        return warn_msg.exec_() == QMessageBox.Ok
+
     #  The default signal passes no arguments, so indicate that this should
     #  use the overloaded version that passes an object of type QTableWidgetItem.
     @pyqtSlot(QTableWidgetItem)
@@ -245,6 +306,9 @@ class ScriptWidget(QWidget):
         use_theta = self.useThetaCheckBox.isChecked()
         use_z = self.useZCheckBox.isChecked()
 
+        if not self.check_scan_limits(x_width_list, y_width_list):
+            return
+
         with FlyScanScriptWriter() as writer:
             writer.set_template_file(template_name)
             writer.write_script(file_name, self.coordinate_list, x_width_list, y_width_list,
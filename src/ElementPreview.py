@@ -0,0 +1,139 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import h5py
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+def channel_snr(images):
+    """
+    Estimate the signal to noise ratio of each channel of a stack of images, as the
+    height of the brightest pixels above the median in units of the spread of the
+    background.  The spread is the median absolute deviation scaled to a standard
+    deviation.
+
+    :param images: A (channels, H, W) array.
+    :type  images: numpy.ndarray
+    :return: An array of one value per channel.
+    """
+
+    pixels = images.reshape(len(images), -1)
+    background = np.median(pixels, axis=1)
+    noise = 1.4826 * np.median(np.abs(pixels - background[:, np.newaxis]), axis=1)
+    signal = np.percentile(pixels, 99, axis=1) - background
+    noise = np.where(noise > 0, noise, np.finfo(float).eps)
+
+    return signal / noise
+
+
+def compute_element_previews(paths, channel_names, max_files=16, thumbnail_size=48):
+    """
+    Calculate a thumbnail and a signal to noise ratio of every channel from the sum of
+    the projections of an evenly spaced subset of the scan files.  The projections are
+    downsampled as they are read.
+
+    :param paths:          The full paths to the hdf5 files, sorted by angle.
+    :type  paths:          list of str
+    :param channel_names:  The names of the channels in the files.
+    :type  channel_names:  list of str
+    :param max_files:      The largest number of files to read.
+    :type  max_files:      int
+    :param thumbnail_size: The largest size of a thumbnail in pixels.
+    :type  thumbnail_size: int
+    :return: A dictionary of channel name to (thumbnail scaled from 0 to 1, signal to noise ratio).
+    """
+
+    paths = list(paths)
+    if not paths:
+        return {}
+
+    #  Spread the files over the whole angle range, including the last file.
+    indices = np.unique(np.linspace(0, len(paths) - 1, min(max_files, len(paths))).astype(int))
+    summed = None
+
+    for index in indices:
+        path = paths[index]
+        with h5py.File(path, 'r') as hdf_file:
+            data_set = hdf_file['MAPS']['XRF_roi']
+            if summed is None:
+                shape = data_set.shape
+                step = max(1, -(-max(shape[1:]) // thumbnail_size))
+            elif data_set.shape != shape:
+                print('Skipping {} in the element previews, its shape {} is not {}'.format(path, data_set.shape,
+                                                                                           shape))
+                continue
+            cube = np.nan_to_num(np.asarray(data_set[:, ::step, ::step], dtype=float))
+        summed = cube if summed is None else summed + cube
+
+    snr = channel_snr(summed)
+    low = summed.min(axis=(1, 2))[:, np.newaxis, np.newaxis]
+    span = summed.max(axis=(1, 2))[:, np.newaxis, np.newaxis] - low
+    thumbnails = (summed - low) / np.where(span > 0, span, 1.0)
+
+    return {name: (thumbnails[i], float(snr[i])) for i, name in enumerate(channel_names) if i < len(summed)}
+
+
+class PreviewThread(QThread):
+    """
+    Calculates the element previews without blocking the GUI, and sends them with
+    previewsReady.
+    """
+
+    previewsReady = pyqtSignal(object, name = "previewsReady" )
+
+    def __init__(self, paths, channel_names, parent=None):
+        super(PreviewThread, self).__init__(parent)
+
+        self.paths = list(paths)
+        self.channel_names = list(channel_names)
+
+        return
+
+    def run(self):
+
+        try:
+            previews = compute_element_previews(self.paths, self.channel_names)
+        except (OSError, KeyError, ValueError) as e:
+            print('Unable to calculate element previews: {}'.format(e))
+            return
+
+        self.previewsReady.emit(previews)
+
+        return
@@ -0,0 +1,438 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import os
+import threading
+import time
+
+#  The environment variable that selects the PV backend, 'epics' (the default) or 'sim'.
+BACKEND_ENV_VAR = 'COORDINATE_TRANSFORMS_PV_BACKEND'
+
+
+class EpicsBackend(object):
+    """
+    The PV backend that talks to real IOCs through pyepics.
+    """
+
+    def __init__(self):
+
+        import epics
+        self.epics = epics
+
+        return
+
+    def create_pv(self, pv_name):
+
+        return self.epics.PV(pv_name)
+
+    def init_thread(self):
+        """
+        Prepare a worker thread for Channel Access calls.  pyepics requires threads
+        that it did not create to join the initial CA context.
+        """
+
+        self.epics.ca.use_initial_context()
+
+        return
+
+    def caget(self, pv_name, **kwargs):
+
+        return self.epics.caget(pv_name, **kwargs)
+
+    def caput(self, pv_name, value, **kwargs):
+
+        return self.epics.caput(pv_name, value, **kwargs)
+
+
+class SimulatedPV(object):
+    """
+    A channel of a SimulatedIOC.  It has the parts of the epics.PV interface that
+    this package and the batch scan templates use.
+    """
+
+    def __init__(self, ioc, pv_name):
+
+        self.ioc = ioc
+        self.pvname = pv_name
+        self.created = time.time()
+        self.callbacks = {}
+
+        return
+
+    @property
+    def connected(self):
+
+        return time.time() - self.created >= self.ioc.connect_latency
+
+    def wait_for_connection(self, timeout=None):
+
+        remaining = self.ioc.connect_latency - (time.time() - self.created)
+        if remaining > 0:
+            if timeout is not None and timeout < remaining:
+                time.sleep(timeout)
+                return False
+            time.sleep(remaining)
+
+        return True
+
+    def get(self, timeout=None, **kwargs):
+
+        if not self.wait_for_connection(timeout):
+            return None
+
+        return self.ioc.read(self.pvname)
+
+    def put(self, value, wait=False, timeout=None, **kwargs):
+
+        if not self.wait_for_connection(timeout):
+            return None
+
+        self.ioc.write(self.pvname, value, wait=wait)
+
+        return 1
+
+    def add_callback(self, callback, index=None, **kwargs):
+
+        if index is None:
+            index = len(self.callbacks) + 1
+            while index in self.callbacks:
+                index += 1
+        self.callbacks[index] = callback
+        self.ioc.subscribe(self)
+
+        #  Like a Channel Access monitor, the current value is sent right away.
+        callback(pvname=self.pvname, value=self.ioc.read(self.pvname, latency=False))
+
+        return index
+
+    def remove_callback(self, index=None):
+
+        self.callbacks.pop(index, None)
+
+        return
+
+    def run_callbacks(self, value):
+
+        for callback in list(self.callbacks.values()):
+            callback(pvname=self.pvname, value=value)
+
+        return
+
+
+class SimulatedMotor(object):
+    """
+    A motor of a SimulatedIOC.  Writing the setpoint PV starts a move, and the
+    readback PV follows it linearly until the move is done.
+    """
+
+    def __init__(self, position=0.0, speed=None, move_time=0.0):
+
+        self.start = position
+        self.target = position
+        self.start_time = 0.0
+        self.speed = speed
+        self.move_time = move_time
+        self.duration = 0.0
+
+        return
+
+    def move(self, target):
+
+        self.start = self.readback()
+        self.target = float(target)
+        self.start_time = time.time()
+        if self.speed:
+            self.duration = abs(self.target - self.start) / self.speed
+        else:
+            self.duration = self.move_time
+
+        return
+
+    def readback(self):
+
+        elapsed = time.time() - self.start_time
+        if elapsed >= self.duration:
+            return self.target
+
+        return self.start + (self.target - self.start) * elapsed / self.duration
+
+    def moving(self):
+
+        return time.time() - self.start_time < self.duration
+
+
+class SimulatedIOC(object):
+    """
+    An in-process stand in for the IOCs, used to run and time the transforms and the
+    batch scan templates without beamline hardware.  Every get and put waits for the
+    configured latency, which is done outside of any lock so that concurrent reads
+    overlap like they do with Channel Access.  As with an IOC, a PV name with or
+    without the .VAL field refers to the same value.
+    """
+
+    def __init__(self, latency=0.0, connect_latency=0.0, default_value=0.0):
+        """
+
+        :param latency:         The round trip time of each get and put, in seconds.
+        :type  latency:         float
+        :param connect_latency: The time it takes a new channel to connect, in seconds.
+        :type  connect_latency: float
+        :param default_value:   The value of a PV that has never been written.
+        :type  default_value:   float
+        """
+
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.default_value = default_value
+        self.lock = threading.Lock()
+        self.values = {}
+        self.motors = {}
+        self.readbacks = {}
+        self.busy_records = {}
+        self.subscribers = {}
+        self.get_count = 0
+        self.put_count = 0
+
+        return
+
+    def create_pv(self, pv_name):
+
+        return SimulatedPV(self, pv_name)
+
+    def init_thread(self):
+
+        return
+
+    def caget(self, pv_name, **kwargs):
+
+        return self.create_pv(pv_name).get(**kwargs)
+
+    def caput(self, pv_name, value, wait=False, **kwargs):
+
+        return self.create_pv(pv_name).put(value, wait=wait, **kwargs)
+
+    @staticmethod
+    def record(pv_name):
+
+        if pv_name.endswith('.VAL'):
+            return pv_name[:-4]
+
+        return pv_name
+
+    def set_value(self, pv_name, value):
+        """
+        Set the value of a PV without any latency, e.g. to set up a simulation.
+        """
+
+        with self.lock:
+            self.values[self.record(pv_name)] = value
+
+        self.notify(pv_name, value)
+
+        return
+
+    def add_motor(self, setpoint_pv, readback_pvs=(), position=0.0, speed=None, move_time=0.0):
+        """
+        Add a motor.  A motor moves at a fixed speed if one is given, otherwise every
+        move takes move_time seconds.
+
+        :param setpoint_pv:  The PV that is written to start a move, e.g. '2xfm:m24.VAL'.
+        :type  setpoint_pv:  str
+        :param readback_pvs: The PVs that report the current position, e.g. '2xfm:m24.RBV'.
+        :type  readback_pvs: list of str
+        :param position:     The starting position.
+        :type  position:     float
+        :param speed:        The speed of the motor in position units per second.
+        :type  speed:        float
+        :param move_time:    The duration of every move in seconds, when speed is not given.
+        :type  move_time:    float
+        :return: The SimulatedMotor
+        """
+
+        motor = SimulatedMotor(position, speed, move_time)
+        with self.lock:
+            self.motors[self.record(setpoint_pv)] = motor
+            self.values[self.record(setpoint_pv)] = position
+            for readback_pv in readback_pvs:
+                self.readbacks[self.record(readback_pv)] = motor
+
+        return motor
+
+    def add_busy_record(self, pv_name, duration):
+        """
+        Add a record that reads 1 for duration seconds after 1 is written to it, and
+        0 otherwise, like the EXSC field of a scan record.
+        """
+
+        with self.lock:
+            self.busy_records[self.record(pv_name)] = [duration, 0.0]
+            self.values[self.record(pv_name)] = 0
+
+        return
+
+    def add_coordinate_system(self, prefix, move_time=0.0):
+        """
+        Set up the PVs of a CoordinateSystem: zero offsets, unit scale factors, and a
+        motor behind each requested position PV with an ActPos readback.
+
+        :param prefix:    The ioc specific prefix of the PVs.
+        :type  prefix:    str
+        :param move_time: The duration of every move in seconds.
+        :type  move_time: float
+        :return: None
+        """
+
+        from CS import CoordinateSystem
+
+        coordsys = CoordinateSystem(prefix)
+        for pv_name in coordsys.get_pv_names(CoordinateSystem.origin_offset_pvs +
+                                             CoordinateSystem.optical_axis_offset_pvs +
+                                             CoordinateSystem.offset_pvs):
+            self.set_value(pv_name, 0.0)
+        for pv_name in coordsys.get_pv_names(CoordinateSystem.scale_pvs):
+            self.set_value(pv_name, 1.0)
+        for pv_name in coordsys.get_pv_names(CoordinateSystem.axis_pvs + CoordinateSystem.drive_pvs +
+                                             CoordinateSystem.motor_pvs):
+            self.add_motor(pv_name, [pv_name.replace('RqsPos', 'ActPos')], move_time=move_time)
+
+        return
+
+    def subscribe(self, pv):
+
+        with self.lock:
+            self.subscribers.setdefault(self.record(pv.pvname), []).append(pv)
+
+        return
+
+    def notify(self, pv_name, value):
+
+        with self.lock:
+            subscribers = list(self.subscribers.get(self.record(pv_name), []))
+
+        for pv in subscribers:
+            pv.run_callbacks(value)
+
+        return
+
+    def read(self, pv_name, latency=True):
+
+        if latency and self.latency:
+            time.sleep(self.latency)
+
+        pv_name = self.record(pv_name)
+        with self.lock:
+            self.get_count += 1
+            if pv_name in self.readbacks:
+                return self.readbacks[pv_name].readback()
+            if pv_name in self.busy_records:
+                duration, start_time = self.busy_records[pv_name]
+                return 1 if time.time() - start_time < duration else 0
+            return self.values.get(pv_name, self.default_value)
+
+    def write(self, pv_name, value, wait=False):
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        pv_name = self.record(pv_name)
+        with self.lock:
+            self.put_count += 1
+            self.values[pv_name] = value
+            motor = self.motors.get(pv_name)
+            if motor is not None:
+                motor.move(value)
+            if pv_name in self.busy_records and value:
+                self.busy_records[pv_name][1] = time.time()
+
+        self.notify(pv_name, value)
+
+        if wait and motor is not None:
+            while motor.moving():
+                time.sleep(0.001)
+
+        return
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Return the PV backend in use.  Unless set_backend() was called, this is chosen by
+    the COORDINATE_TRANSFORMS_PV_BACKEND environment variable: 'sim' for a
+    SimulatedIOC and anything else for pyepics.
+    """
+
+    global _backend
+
+    if _backend is None:
+        if os.environ.get(BACKEND_ENV_VAR, 'epics').lower() == 'sim':
+            _backend = SimulatedIOC()
+        else:
+            _backend = EpicsBackend()
+
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the PV backend, e.g. with a SimulatedIOC for profiling.  Channels created
+    with the previous backend are dropped by the CoordinateSystem channel pool.
+    """
+
+    global _backend
+    _backend = backend
+
+    return
+
+
+#  Drop in replacements for the pyepics functions used by the batch scan templates.
+def PV(pv_name):
+
+    return get_backend().create_pv(pv_name)
+
+
+def caget(pv_name, **kwargs):
+
+    return get_backend().caget(pv_name, **kwargs)
+
+
+def caput(pv_name, value, **kwargs):
+
+    return get_backend().caput(pv_name, value, **kwargs)
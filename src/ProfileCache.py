@@ -0,0 +1,189 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import threading
+import h5py
+import numpy as np
+from ScanIndex import USER_CACHE_DIR, PARALLEL_THRESHOLD, PROCESS_CONTEXT
+
+#  The directory that holds the column and row profiles of scan files.
+PROFILE_CACHE_DIR = os.path.join(USER_CACHE_DIR, 'profiles')
+
+
+def read_profiles(path):
+    """
+    Calculate the column and row means of every channel of one scan file.  NaN values
+    are treated as zero.
+
+    :param path: The full path to the hdf5 file.
+    :type  path: str
+    :return: A (channels, W) array of column means and a (channels, H) array of row means.
+    """
+
+    with h5py.File(path, 'r') as hdf_file:
+        cube = np.nan_to_num(np.asarray(hdf_file['MAPS']['XRF_roi'][...], dtype=float))
+
+    dim_y, dim_x = cube.shape[1:]
+
+    return cube.sum(axis=1) / dim_y, cube.sum(axis=2) / dim_x
+
+
+class ProfileCache(object):
+    """
+    A cache of the column and row profiles of every channel of scan files.  The boundary
+    search only needs these profiles, so once a file is in the cache the projections are
+    not read again to recalculate boundaries.  Profiles are kept in memory and saved as
+    one .npz file per scan file, and are used while the size and modification time of
+    the scan file are unchanged.
+    """
+
+    def __init__(self, cache_dir=PROFILE_CACHE_DIR):
+
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.profiles = {}
+
+        return
+
+    def get_cache_file(self, path):
+
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def lookup(self, path, file_stat):
+        """
+        :return: The (column means, row means) of a file, or None if they are not cached.
+        """
+
+        stat_key = (file_stat.st_size, file_stat.st_mtime_ns)
+
+        with self.lock:
+            entry = self.profiles.get(path)
+        if entry is not None and entry[0] == stat_key:
+            return entry[1]
+
+        try:
+            with np.load(self.get_cache_file(path)) as cached:
+                if (int(cached['size']), int(cached['mtime'])) != stat_key:
+                    return None
+                profiles = (cached['columns'], cached['rows'])
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+        with self.lock:
+            self.profiles[path] = (stat_key, profiles)
+
+        return profiles
+
+    def store(self, path, file_stat, profiles):
+
+        with self.lock:
+            self.profiles[path] = ((file_stat.st_size, file_stat.st_mtime_ns), profiles)
+
+        cache_file = self.get_cache_file(path)
+        temp_file = '{}.{}.tmp.npz'.format(cache_file[:-4], os.getpid())
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            np.savez(temp_file, size=file_stat.st_size, mtime=file_stat.st_mtime_ns,
+                     columns=profiles[0], rows=profiles[1])
+            os.replace(temp_file, cache_file)
+        except (IOError, OSError) as e:
+            print('Unable to save the profile cache {}: {}'.format(cache_file, e))
+
+        return
+
+    def build(self, paths, max_workers=None):
+        """
+        Make sure that the profiles of every file are in the cache.  Files that are not
+        are read in parallel.
+
+        :param paths:       The full paths to the hdf5 files.
+        :type  paths:       list of str
+        :param max_workers: The number of worker processes, None to use the number of CPUs.
+        :type  max_workers: int
+        :return: A list of (column means, row means), one per path.
+        """
+
+        paths = list(paths)
+        file_stats = [os.stat(path) for path in paths]
+        profiles = [self.lookup(path, file_stat) for path, file_stat in zip(paths, file_stats)]
+        missing = [i for i in range(len(paths)) if profiles[i] is None]
+        missing_paths = [paths[i] for i in missing]
+
+        if len(missing_paths) < PARALLEL_THRESHOLD or max_workers == 1:
+            read = [read_profiles(path) for path in missing_paths]
+        else:
+            if max_workers is None:
+                max_workers = min(os.cpu_count() or 1, 8)
+            chunk_size = max(1, len(missing_paths) // (4 * max_workers))
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=PROCESS_CONTEXT) as executor:
+                read = list(executor.map(read_profiles, missing_paths, chunksize=chunk_size))
+
+        for i, file_profiles in zip(missing, read):
+            self.store(paths[i], file_stats[i], file_profiles)
+            profiles[i] = file_profiles
+
+        return profiles
+
+    def get(self, paths, element_index, max_workers=None):
+        """
+        :return: A list of column means and a list of row means of one element, one per
+                 path.  Files of different shapes have profiles of different lengths.
+        """
+
+        profiles = self.build(paths, max_workers)
+
+        return ([columns[element_index] for columns, rows in profiles],
+                [rows[element_index] for columns, rows in profiles])
+
+    def clear(self):
+
+        with self.lock:
+            self.profiles = {}
+
+        return
+
+
+#  The profile cache used by every XRFBoundary.
+profile_cache = ProfileCache()
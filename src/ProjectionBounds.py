@@ -0,0 +1,416 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import numpy as np
+
+
+def projection_profiles(stack, block_size=64):
+    """
+    Calculate the mean of every column and every row of a stack of projections.  The
+    stack is read block_size projections at a time, so a memory mapped stack is never
+    loaded into memory at once.
+
+    :param stack:      An (N, H, W) array of projections, or a list of N projections that
+                       may differ in shape.  NaN values are treated as zero.
+    :type  stack:      numpy.ndarray
+    :param block_size: The number of projections to read at a time.
+    :type  block_size: int
+    :return: An (N, W) array of column means and an (N, H) array of row means, or for a
+             list, a list of N column means and a list of N row means.
+    """
+
+    if not isinstance(stack, np.ndarray):
+        projections = [np.nan_to_num(np.asarray(projection, dtype=float)) for projection in stack]
+        return ([projection.mean(axis=0) for projection in projections],
+                [projection.mean(axis=1) for projection in projections])
+
+    num_projections, dim_y, dim_x = stack.shape
+    column_sums = np.empty((num_projections, dim_x))
+    row_sums = np.empty((num_projections, dim_y))
+
+    for start in range(0, num_projections, block_size):
+        block = np.nan_to_num(np.asarray(stack[start:start + block_size], dtype=float))
+        column_sums[start:start + block_size] = block.sum(axis=1) / dim_y
+        row_sums[start:start + block_size] = block.sum(axis=2) / dim_x
+
+    return column_sums, row_sums
+
+
+def _shape_groups(column_sums, row_sums):
+    """
+    Group the profiles of projections that have the same shape, so that each group can
+    be searched at once.
+
+    :return: A list of (indices, (n, W) column means, (n, H) row means), one per shape.
+    """
+
+    if (isinstance(column_sums, np.ndarray) and column_sums.ndim == 2 and
+            isinstance(row_sums, np.ndarray) and row_sums.ndim == 2):
+        return [(np.arange(len(column_sums)), column_sums, row_sums)]
+
+    groups = {}
+    for i, (columns, rows) in enumerate(zip(column_sums, row_sums)):
+        groups.setdefault((len(columns), len(rows)), []).append(i)
+
+    return [(np.array(indices), np.stack([column_sums[i] for i in indices]), np.stack([row_sums[i] for i in indices]))
+            for indices in groups.values()]
+
+
+def _merge_groups(groups, num_projections):
+    """
+    Put the edges found for each group of projections back in the order of the projections.
+
+    :param groups: A list of (indices, bounds), where the last axis of each array of bounds
+                   has one value per index.
+    :return: A dictionary of arrays with one value per projection in the last axis.
+    """
+
+    bounds = {}
+    for key in range(4):
+        shape = groups[0][1][key].shape[:-1] + (num_projections,)
+        bounds[key] = np.empty(shape)
+        for indices, group_bounds in groups:
+            bounds[key][..., indices] = group_bounds[key]
+
+    return bounds
+
+
+def _smallest_positive(profiles):
+
+    positive = np.where(profiles > 0, profiles, np.inf)
+    smallest = positive.min(axis=1)
+
+    return smallest, np.isfinite(smallest)
+
+
+def _edges(profiles, thresholds, valid, missing=0.0):
+    """
+    :return: The index of the first and the last value of each profile that is above
+             its threshold, or missing if there is none.
+    """
+
+    above = (profiles > thresholds[:, np.newaxis]) & valid[:, np.newaxis]
+    found = above.any(axis=1)
+    length = profiles.shape[1]
+    first = np.where(found, np.argmax(above, axis=1), missing)
+    last = np.where(found, length - 1 - np.argmax(above[:, ::-1], axis=1), missing)
+
+    return first, last
+
+
+def profile_bounds(column_sums, row_sums, coefficient, bound_y=True, missing=0.0):
+    """
+    Find the edges of the sample in a batch of projections from their column and row
+    profiles.  The noise level of a projection is the smallest positive column or row
+    value, and an edge is the first column or row above the noise plus coefficient
+    percent of the difference between the largest value and the noise.
+
+    :param column_sums: An (N, W) array of column means, or a list of N column means that
+                        may differ in length.
+    :type  column_sums: numpy.ndarray
+    :param row_sums:    An (N, H) array of row means, or a list of N row means.
+    :type  row_sums:    numpy.ndarray
+    :param coefficient: The threshold as a percentage, from 0 to 100.
+    :type  coefficient: float
+    :param bound_y:     Find the top and bottom edges, otherwise use the first and last rows.
+    :type  bound_y:     bool
+    :param missing:     The value of an edge that is not found, e.g. NaN for union_bounds().
+    :type  missing:     float
+    :return: A dictionary of arrays of the left, right, top and bottom edges, keys 0 to 3,
+             in pixel units.
+    """
+
+    groups = _shape_groups(column_sums, row_sums)
+    if len(groups) > 1:
+        return _merge_groups([(indices, profile_bounds(columns, rows, coefficient, bound_y, missing))
+                              for indices, columns, rows in groups], len(column_sums))
+
+    column_sums = np.asarray(column_sums, dtype=float)
+    row_sums = np.asarray(row_sums, dtype=float)
+    num_projections = column_sums.shape[0]
+
+    smallest_column_sum, has_column = _smallest_positive(column_sums)
+    smallest_row_sum, has_row = _smallest_positive(row_sums)
+
+    #  Set the noise level equal to the smallest of the column sums or row sums.  Without a
+    #  positive row sum there is no noise level, and no edges are found.
+    use_column = has_column & (smallest_column_sum <= smallest_row_sum)
+    noise = np.where(use_column, smallest_column_sum, smallest_row_sum)
+    valid = has_row
+    noise = np.where(valid, noise, 0.0)
+
+    scale_factor = coefficient / 100
+    thresh_col = (column_sums.max(axis=1) - noise) * scale_factor + noise
+    thresh_row = (row_sums.max(axis=1) - noise) * scale_factor + noise
+
+    bounds = {}
+    left, right = _edges(column_sums, thresh_col, valid, missing)
+    bounds[0] = left.astype(float)
+    bounds[1] = right.astype(float)
+
+    if bound_y:
+        top, bottom = _edges(row_sums, thresh_row, valid, missing)
+        bounds[2] = top.astype(float)
+        bounds[3] = bottom.astype(float)
+    else:
+        bounds[2] = np.zeros(num_projections)
+        bounds[3] = np.full(num_projections, float(row_sums.shape[1] - 1))
+
+    return bounds
+
+
+def _sweep_edges(profiles, thresholds, valid, missing=0.0):
+    """
+    :return: The first and last edges of each profile for every row of thresholds,
+             as two (C, N) arrays, with missing where there is no edge.
+    """
+
+    num_projections, length = profiles.shape
+    first = np.full(thresholds.shape, missing)
+    last = np.full(thresholds.shape, missing)
+
+    #  The first value above a threshold is the first place that the running maximum
+    #  is above it, and the running maximum is sorted, so every threshold is found
+    #  with one binary search.  The last edge is the same search from the other end.
+    forward_max = np.maximum.accumulate(profiles, axis=1)
+    reverse_max = np.maximum.accumulate(profiles[:, ::-1], axis=1)
+
+    for i in np.nonzero(valid)[0]:
+        index = np.searchsorted(forward_max[i], thresholds[:, i], side='right')
+        first[:, i] = np.where(index < length, index, missing)
+        index = np.searchsorted(reverse_max[i], thresholds[:, i], side='right')
+        last[:, i] = np.where(index < length, length - 1 - index, missing)
+
+    return first, last
+
+
+def coefficient_sweep(column_sums, row_sums, bound_y=True, coefficients=None, missing=0.0):
+    """
+    Find the edges that profile_bounds() finds for many coefficients at once.  The
+    threshold grows with the coefficient, so the edges of every coefficient come from
+    one pass over the running maximum of each profile.
+
+    :param column_sums:  An (N, W) array of column means, or a list of N column means that
+                         may differ in length.
+    :type  column_sums:  numpy.ndarray
+    :param row_sums:     An (N, H) array of row means, or a list of N row means.
+    :type  row_sums:     numpy.ndarray
+    :param bound_y:      Find the top and bottom edges, otherwise use the first and last rows.
+    :type  bound_y:      bool
+    :param coefficients: The coefficients, the integers from 0 to 100 if None.
+    :type  coefficients: list of float
+    :param missing:      The value of an edge that is not found, e.g. NaN for union_bounds().
+    :type  missing:      float
+    :return: A dictionary of (C, N) arrays of the left, right, top and bottom edges, keys
+             0 to 3, with one row per coefficient.
+    """
+
+    if coefficients is None:
+        coefficients = np.arange(101)
+
+    groups = _shape_groups(column_sums, row_sums)
+    if len(groups) > 1:
+        return _merge_groups([(indices, coefficient_sweep(columns, rows, bound_y, coefficients, missing))
+                              for indices, columns, rows in groups], len(column_sums))
+
+    column_sums = np.asarray(column_sums, dtype=float)
+    row_sums = np.asarray(row_sums, dtype=float)
+    scale_factors = np.asarray(coefficients)[:, np.newaxis] / 100
+    num_projections = column_sums.shape[0]
+
+    smallest_column_sum, has_column = _smallest_positive(column_sums)
+    smallest_row_sum, has_row = _smallest_positive(row_sums)
+    use_column = has_column & (smallest_column_sum <= smallest_row_sum)
+    valid = has_row
+    noise = np.where(valid, np.where(use_column, smallest_column_sum, smallest_row_sum), 0.0)
+
+    thresh_col = (column_sums.max(axis=1) - noise) * scale_factors + noise
+    thresh_row = (row_sums.max(axis=1) - noise) * scale_factors + noise
+
+    bounds = {}
+    left, right = _sweep_edges(column_sums, thresh_col, valid, missing)
+    bounds[0] = left.astype(float)
+    bounds[1] = right.astype(float)
+
+    if bound_y:
+        top, bottom = _sweep_edges(row_sums, thresh_row, valid, missing)
+        bounds[2] = top.astype(float)
+        bounds[3] = bottom.astype(float)
+    else:
+        bounds[2] = np.zeros(thresh_row.shape)
+        bounds[3] = np.full(thresh_row.shape, float(row_sums.shape[1] - 1))
+
+    return bounds
+
+
+def interpolate_edges(theta, edges, angles, period=None):
+    """
+    Linearly interpolate the edges found at the coarse scan angles to any other angles.
+    All of the edges are interpolated with one search for the neighbouring coarse angles.
+
+    :param theta:  The M coarse scan angles.
+    :type  theta:  numpy.ndarray
+    :param edges:  An (M, E) array of edge positions, one row per coarse angle.
+    :type  edges:  numpy.ndarray
+    :param angles: The K angles to interpolate to, in any order and with any spacing.
+    :type  angles: numpy.ndarray
+    :param period: The period of the rotation, e.g. 360, to interpolate across the ends of
+                   the coarse angles.  If None, angles outside of the coarse angles take
+                   the edges of the nearest end.
+    :type  period: float
+    :return: A (K, E) array of edge positions.
+    """
+
+    theta = np.asarray(theta, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    angles = np.asarray(angles, dtype=float)
+
+    if period is not None:
+        theta = np.mod(theta, period)
+        angles = np.mod(angles, period)
+
+    order = np.argsort(theta, kind='stable')
+    theta = theta[order]
+    edges = edges[order]
+
+    if len(theta) == 1:
+        return np.repeat(edges, len(angles), axis=0)
+
+    if period is not None:
+        #  Add the last coarse angle before the first and the first after the last, so that
+        #  angles between them are interpolated across the wrap.
+        theta = np.concatenate([theta[-1:] - period, theta, theta[:1] + period])
+        edges = np.concatenate([edges[-1:], edges, edges[:1]])
+
+    index = np.clip(np.searchsorted(theta, angles, side='right') - 1, 0, len(theta) - 2)
+    span = theta[index + 1] - theta[index]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(span > 0, (angles - theta[index]) / span, 0.0)
+    weight = np.clip(weight, 0.0, 1.0)[:, np.newaxis]
+
+    return edges[index] + weight * (edges[index + 1] - edges[index])
+
+
+def _harmonic_basis(angles, harmonics):
+
+    radians = np.radians(angles)[:, np.newaxis]
+    harmonics = np.asarray(harmonics, dtype=float)
+
+    return np.hstack([np.ones((len(angles), 1)), np.cos(radians * harmonics), np.sin(radians * harmonics)])
+
+
+def sinusoid_edges(theta, edges, angles, center_harmonics=1, width_harmonics=1, cover=True):
+    """
+    Fit a model of a rotating sample to the edges found at the coarse scan angles and
+    evaluate it at any other angles.  A point of the sample traces a sinusoid, so the
+    center of each pair of edges is fit by a constant plus odd harmonics of the angle,
+    and the half width, which repeats every 180 degrees, by a constant plus even
+    harmonics.  Fewer coarse angles are needed than for linear interpolation.
+
+    :param theta:            The M coarse scan angles in degrees.
+    :type  theta:            numpy.ndarray
+    :param edges:            An (M, 4) array of the left, right, top and bottom edges.
+    :type  edges:            numpy.ndarray
+    :param angles:           The K angles to evaluate the model at, in degrees.
+    :type  angles:           numpy.ndarray
+    :param center_harmonics: The number of odd harmonics, 1, 3, ..., of the centers.
+    :type  center_harmonics: int
+    :param width_harmonics:  The number of even harmonics, 2, 4, ..., of the half widths.
+    :type  width_harmonics:  int
+    :param cover:            Widen the model so that it contains every coarse box.
+    :type  cover:            bool
+    :return: A (K, 4) array of edge positions.
+    """
+
+    theta = np.asarray(theta, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    angles = np.asarray(angles, dtype=float)
+
+    #  Columns 0 and 1 are the x center and half width, 2 and 3 the same in y.
+    centers = (edges[:, 0::2] + edges[:, 1::2]) / 2
+    half_widths = (edges[:, 1::2] - edges[:, 0::2]) / 2
+
+    center_orders = 2 * np.arange(center_harmonics) + 1
+    width_orders = 2 * np.arange(1, width_harmonics + 1)
+    center_basis = _harmonic_basis(theta, center_orders)
+    width_basis = _harmonic_basis(theta, width_orders)
+
+    center_coefficients = np.linalg.lstsq(center_basis, centers, rcond=None)[0]
+    width_coefficients = np.linalg.lstsq(width_basis, half_widths, rcond=None)[0]
+
+    if cover:
+        #  The largest distance that a coarse edge is outside of the model.
+        outside = (np.abs(centers - center_basis.dot(center_coefficients)) + half_widths -
+                   width_basis.dot(width_coefficients))
+        width_coefficients[0] += np.maximum(outside.max(axis=0), 0.0)
+
+    model_centers = _harmonic_basis(angles, center_orders).dot(center_coefficients)
+    model_half_widths = _harmonic_basis(angles, width_orders).dot(width_coefficients)
+
+    model_edges = np.empty((len(angles), 4))
+    model_edges[:, 0::2] = model_centers - model_half_widths
+    model_edges[:, 1::2] = model_centers + model_half_widths
+
+    return model_edges
+
+
+def union_bounds(bounds_list, missing=0.0):
+    """
+    Combine the edges found for several elements into edges that contain all of them.
+    Elements without an edge in a projection, NaN, are left out of that projection.
+
+    :param bounds_list: Dictionaries of left, right, top and bottom edges, keys 0 to 3, as
+                        returned by profile_bounds() or coefficient_sweep() with missing=NaN.
+    :type  bounds_list: list of dict
+    :param missing:     The value of an edge that no element has.
+    :type  missing:     float
+    :return: A dictionary of the outermost edges.
+    """
+
+    bounds = {}
+    for key in range(4):
+        edges = np.array([element_bounds[key] for element_bounds in bounds_list], dtype=float)
+        found = ~np.isnan(edges)
+        if key in (0, 2):
+            outer = np.where(found, edges, np.inf).min(axis=0)
+        else:
+            outer = np.where(found, edges, -np.inf).max(axis=0)
+        bounds[key] = np.where(found.any(axis=0), outer, missing)
+
+    return bounds
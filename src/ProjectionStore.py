@@ -0,0 +1,208 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import time
+import h5py
+import numpy as np
+from ScanIndex import USER_CACHE_DIR, PARALLEL_THRESHOLD, PROCESS_CONTEXT
+
+#  The directory that holds the memory mapped projection stacks.
+PROJECTION_CACHE_DIR = os.path.join(USER_CACHE_DIR, 'projections')
+#  The largest total size of the stacks in the cache, in bytes.
+PROJECTION_CACHE_BYTES = 4 * 1024 ** 3
+#  Temporary files older than this, in seconds, were left by an interrupted fill.
+STALE_TEMP_SECONDS = 24 * 60 * 60
+
+
+def projection_key(scan_index, element_index):
+    """
+    Create a key that identifies the stack of one element of a data set.  The key
+    changes if any file of the data set is replaced or modified, and is calculated
+    without opening the files.
+
+    :param scan_index:    The files of the data set, sorted by theta.
+    :type  scan_index:    list of ScanIndex.ScanRecord
+    :param element_index: The index of the element in the XRF_roi data.
+    :type  element_index: int
+    :return: A hexadecimal string.
+    """
+
+    key = hashlib.sha1()
+    key.update('{}\n'.format(element_index).encode('utf-8'))
+    for record in scan_index:
+        file_stat = os.stat(record.path)
+        key.update('{}\n{}\n{}\n'.format(os.path.abspath(record.path), file_stat.st_size,
+                                         file_stat.st_mtime_ns).encode('utf-8'))
+
+    return key.hexdigest()
+
+
+def fill_projections(stack_file, start, paths, element_index):
+    """
+    Copy the element maps of a group of files into rows start to start + len(paths)
+    of a stack file.  This runs in a worker process.
+    """
+
+    stack = np.load(stack_file, mmap_mode='r+')
+    for i, path in enumerate(paths):
+        with h5py.File(path, 'r') as hdf_file:
+            projection = np.nan_to_num(hdf_file['MAPS']['XRF_roi'][element_index])
+        #  A smaller projection fills the top left corner of its row.
+        stack[start + i, :projection.shape[0], :projection.shape[1]] = projection
+    stack.flush()
+    del stack
+
+    return
+
+
+def prune_projections(cache_dir=PROJECTION_CACHE_DIR, max_bytes=PROJECTION_CACHE_BYTES, keep=None):
+    """
+    Remove the least recently used stacks until the stacks in the cache take at most
+    max_bytes, and remove temporary files left by fills that did not finish.
+
+    :param cache_dir: The directory for the stack files.
+    :type  cache_dir: str
+    :param max_bytes: The largest total size of the stacks.
+    :type  max_bytes: int
+    :param keep:      The full path of a stack that is not removed, e.g. one just created.
+    :type  keep:      str
+    :return:
+    """
+
+    now = time.time()
+    stacks = []
+    for entry in os.scandir(cache_dir):
+        try:
+            file_stat = entry.stat()
+            if entry.name.endswith('.tmp.npy'):
+                if now - file_stat.st_mtime > STALE_TEMP_SECONDS:
+                    os.remove(entry.path)
+            elif entry.name.endswith('.npy'):
+                stacks.append((file_stat.st_mtime, file_stat.st_size, entry.path))
+        except OSError:
+            continue
+
+    total = sum(size for mtime, size, path in stacks)
+    #  load_projections() updates the modification time of a stack when it is used.
+    for mtime, size, path in sorted(stacks):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            print('Unable to remove the projection stack {}: {}'.format(path, e))
+            continue
+        total -= size
+
+    return
+
+
+def load_projections(scan_index, element_index, cache_dir=PROJECTION_CACHE_DIR, max_workers=None):
+    """
+    Get the stack of projections of one element of a data set as a read only memory
+    mapped array.  The stack is read from the hdf5 files in parallel the first time,
+    and saved as a .npy file in cache_dir, so that later calls, also from a new
+    session, do not read the hdf5 files at all.  NaN values are replaced by zero.  If
+    the files differ in shape, the stack has the largest shape and smaller projections
+    are padded with zeros on the bottom and right.  The stack keeps the data type of
+    the files.  The least recently used stacks are removed once the cache is larger
+    than PROJECTION_CACHE_BYTES.
+
+    :param scan_index:    The files of the data set, sorted by theta.
+    :type  scan_index:    list of ScanIndex.ScanRecord
+    :param element_index: The index of the element in the XRF_roi data.
+    :type  element_index: int
+    :param cache_dir:     The directory for the stack files.
+    :type  cache_dir:     str
+    :param max_workers:   The number of worker processes, None to use the number of CPUs.
+    :type  max_workers:   int
+    :return: An (N, H, W) numpy.memmap.
+    """
+
+    stack_file = os.path.join(cache_dir, projection_key(scan_index, element_index) + '.npy')
+
+    if os.path.exists(stack_file):
+        try:
+            #  Mark the stack as recently used.
+            os.utime(stack_file)
+        except OSError:
+            pass
+        return np.load(stack_file, mmap_mode='r')
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    num_rows = max(record.shape[1] for record in scan_index)
+    num_columns = max(record.shape[2] for record in scan_index)
+    paths = [record.path for record in scan_index]
+    dtypes = []
+    for path in paths:
+        with h5py.File(path, 'r') as hdf_file:
+            dtypes.append(hdf_file['MAPS']['XRF_roi'].dtype)
+    #  Write to a temporary file so that an interrupted fill is never used.
+    temp_file = '{}.{}.tmp.npy'.format(stack_file[:-4], os.getpid())
+    stack = np.lib.format.open_memmap(temp_file, mode='w+', dtype=np.result_type(*dtypes),
+                                      shape=(len(paths), num_rows, num_columns))
+    del stack
+
+    try:
+        if len(paths) < PARALLEL_THRESHOLD or max_workers == 1:
+            fill_projections(temp_file, 0, paths, element_index)
+        else:
+            if max_workers is None:
+                max_workers = min(os.cpu_count() or 1, 8)
+            chunk_size = -(-len(paths) // max_workers)
+            starts = list(range(0, len(paths), chunk_size))
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=PROCESS_CONTEXT) as executor:
+                list(executor.map(fill_projections, [temp_file] * len(starts), starts,
+                                  [paths[start:start + chunk_size] for start in starts],
+                                  [element_index] * len(starts)))
+        os.replace(temp_file, stack_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    prune_projections(cache_dir, keep=stack_file)
+
+    return np.load(stack_file, mmap_mode='r')
@@ -0,0 +1,409 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtWidgets import *
+
+#  The largest size, in pixels, of a projection in a mosaic.
+MOSAIC_TILE_SIZE = 64
+
+#  The number of empty pixels between the tiles of a mosaic.
+MOSAIC_PADDING = 2
+
+#  The number of projections that are read from the projection stack at a time.
+MOSAIC_BLOCK_SIZE = 64
+
+
+def create_rect_roi(pos, size):
+    """
+    Create the editable ROI box used to adjust the boundaries of a projection.
+
+    :param pos:  The (left, top) edge of the box in pixels.
+    :type  pos:  list
+    :param size: The (width, height) of the box in pixels.
+    :type  size: list
+    :return: A pyqtgraph.RectROI.
+    """
+
+    roi = pg.RectROI(pos, size, pen=pg.mkPen(width=4.5, color='r'), translateSnap=True, scaleSnap=True)
+    ## handles scaling vertically from opposite edge
+    roi.addScaleHandle([0.5, 0], [0.5, 1])
+    roi.addScaleHandle([0.5, 1], [0.5, 0])
+    ## handles scaling horizonatally from opposite edge
+    roi.addScaleHandle([0, 0.5], [1, 0.5])
+    roi.addScaleHandle([1, 0.5], [0, 0.5])
+    ## handles scaling both vertically and horizontally
+    roi.addScaleHandle([1, 1], [0, 0])
+    roi.addScaleHandle([0, 0], [1, 1])
+    roi.addScaleHandle([0, 1], [1, 0])
+    roi.addScaleHandle([1, 0], [0, 1])
+
+    return roi
+
+
+def build_mosaic(stack, columns, step, padding=MOSAIC_PADDING):
+    """
+    Pack downsampled projections into one image.  Each tile is scaled to its own
+    maximum so that weak projections are visible next to strong ones.
+
+    :param stack:   An (N, H, W) array of projections, e.g. a memory mapped stack.
+    :type  stack:   numpy.ndarray
+    :param columns: The number of tiles in each row of the mosaic.
+    :type  columns: int
+    :param step:    Every step-th pixel of each projection is kept.
+    :type  step:    int
+    :param padding: The number of empty pixels between tiles.
+    :type  padding: int
+    :return: The mosaic image and the (height, width) of a tile including its padding.
+    """
+
+    num_projections, height, width = stack.shape
+    tile_height = -(-height // step) + padding
+    tile_width = -(-width // step) + padding
+    rows = -(-num_projections // columns)
+    mosaic = np.zeros((rows * tile_height, columns * tile_width), dtype=np.float32)
+
+    for start in range(0, num_projections, MOSAIC_BLOCK_SIZE):
+        block = np.nan_to_num(np.asarray(stack[start:start + MOSAIC_BLOCK_SIZE, ::step, ::step], dtype=np.float32))
+        peaks = block.reshape(len(block), -1).max(axis=1)
+        peaks[peaks <= 0] = 1
+        block /= peaks[:, np.newaxis, np.newaxis]
+        for i, tile in enumerate(block):
+            row, column = divmod(start + i, columns)
+            mosaic[row * tile_height:row * tile_height + tile.shape[0],
+                   column * tile_width:column * tile_width + tile.shape[1]] = tile
+
+    return mosaic, (tile_height, tile_width)
+
+
+def roi_outlines(bounds, columns, tile_shape, step):
+    """
+    Calculate the outlines of the boundaries of every projection in mosaic coordinates,
+    as one line with NaN between boxes so that they can be drawn by a single item.
+
+    :param bounds:     The dictionary of left, right, top and bottom edges in pixels.
+    :type  bounds:     dict
+    :param columns:    The number of tiles in each row of the mosaic.
+    :type  columns:    int
+    :param tile_shape: The (height, width) of a tile including its padding.
+    :type  tile_shape: tuple
+    :param step:       The downsampling step of the mosaic.
+    :type  step:       int
+    :return: Arrays of x and y values, 6 for each box.
+    """
+
+    left, right, top, bottom = [np.asarray(bounds[key], dtype=float) / step for key in range(4)]
+    rows, column = np.divmod(np.arange(len(left)), columns)
+    x_offset = column * tile_shape[1]
+    y_offset = rows * tile_shape[0]
+
+    nan = np.full(len(left), np.nan)
+    x = np.column_stack([left, right, right, left, left, nan]) + x_offset[:, np.newaxis]
+    y = np.column_stack([top, top, bottom, bottom, top, nan]) + y_offset[:, np.newaxis]
+
+    return x.ravel(), y.ravel()
+
+
+class RoiEditor(pg.GraphicsLayoutWidget):
+    """
+    Shows one projection at full resolution with an editable ROI box.  The projection is
+    read from the stack only when it is shown.
+    """
+
+    def __init__(self, boundary, on_changed=None):
+        super(RoiEditor, self).__init__()
+
+        self.boundary = boundary
+        self.on_changed = on_changed
+        self.index = None
+        self.roi = None
+
+        self.label = self.addLabel('', row=0, col=0)
+        self.view = self.addViewBox(row=1, col=0, lockAspect=True, enableMouse=False)
+        self.image = pg.ImageItem()
+        self.view.addItem(self.image)
+        self.resize(400, 400)
+
+        return
+
+    def show_projection(self, index):
+
+        self.index = index
+        bounds = self.boundary.bounds
+        projection = np.asarray(self.boundary.projections[index])
+
+        self.label.setText('{}: {}'.format(index, self.boundary.theta[index]))
+        self.image.setImage(projection)
+
+        if self.roi is not None:
+            self.view.removeItem(self.roi)
+        self.roi = create_rect_roi([bounds[0][index], bounds[2][index]],
+                                   [bounds[1][index] - bounds[0][index], bounds[3][index] - bounds[2][index]])
+        self.roi.sigRegionChangeFinished.connect(self.on_roi_changed)
+        self.view.addItem(self.roi)
+        self.view.autoRange()
+
+        self.setWindowTitle('Coarse scan ROI {}'.format(index))
+        self.show()
+        self.raise_()
+
+        return
+
+    def on_roi_changed(self, roi):
+
+        self.boundary.set_roi(self.index, roi)
+        if self.on_changed is not None:
+            self.on_changed(self.index)
+
+        return
+
+
+class RoiMosaic(pg.GraphicsLayoutWidget):
+    """
+    Shows downsampled projections of every coarse scan as one image, with the boundaries
+    drawn over them as one line.  Clicking a projection opens it in a RoiEditor.
+    """
+
+    def __init__(self, boundary, tile_size=MOSAIC_TILE_SIZE):
+        super(RoiMosaic, self).__init__()
+
+        pg.setConfigOptions(imageAxisOrder='row-major')
+
+        self.boundary = boundary
+        num_projections, height, width = boundary.projections.shape
+        self.step = max(1, -(-max(height, width) // tile_size))
+        self.columns = max(1, int(np.ceil(np.sqrt(num_projections * height / float(width)))))
+
+        mosaic, self.tile_shape = build_mosaic(boundary.projections, self.columns, self.step)
+
+        self.view = self.addViewBox(row=0, col=0, lockAspect=True)
+        self.view.invertY(True)
+        self.image = pg.ImageItem(mosaic)
+        self.view.addItem(self.image)
+        self.outlines = pg.PlotDataItem(pen=pg.mkPen(width=1, color='r'), connect='finite')
+        self.view.addItem(self.outlines)
+        self.update_outlines()
+        self.view.autoRange()
+
+        self.editor = RoiEditor(boundary, self.on_roi_edited)
+        self.scene().sigMouseClicked.connect(self.on_mouse_clicked)
+
+        self.setWindowTitle('Coarse scan ROIs')
+        self.resize(900, 900)
+
+        return
+
+    def update_outlines(self):
+
+        x, y = roi_outlines(self.boundary.bounds, self.columns, self.tile_shape, self.step)
+        self.outlines.setData(x, y)
+
+        return
+
+    def get_tile_index(self, scene_pos):
+        """
+        :return: The index of the projection under a point of the scene, or None.
+        """
+
+        point = self.view.mapSceneToView(scene_pos)
+        if point.x() < 0 or point.y() < 0:
+            return None
+
+        row = int(point.y() // self.tile_shape[0])
+        column = int(point.x() // self.tile_shape[1])
+        index = row * self.columns + column
+        if column >= self.columns or index >= len(self.boundary.theta):
+            return None
+
+        return index
+
+    def on_mouse_clicked(self, event):
+
+        index = self.get_tile_index(event.scenePos())
+        if index is not None:
+            self.editor.show_projection(index)
+
+        return
+
+    def on_roi_edited(self, index):
+
+        self.update_outlines()
+
+        return
+
+    def closeEvent(self, event):
+
+        #  The editor refers to a projection by its index in this mosaic.
+        self.editor.close()
+        super(RoiMosaic, self).closeEvent(event)
+
+        return
+
+
+class RoiTile(pg.GraphicsLayoutWidget):
+    """
+    One projection of a RoiGrid with its editable ROI box.  A tile knows the index of
+    the projection that it shows, so an edit needs no lookup, and it is reused for
+    another projection when it scrolls out of view.
+    """
+
+    def __init__(self, boundary, parent=None):
+        super(RoiTile, self).__init__(parent)
+
+        self.boundary = boundary
+        self.index = None
+
+        self.label = self.addLabel('', row=0, col=0)
+        self.view = self.addViewBox(row=1, col=0, lockAspect=True, enableMouse=False)
+        self.image = pg.ImageItem()
+        self.view.addItem(self.image)
+        self.roi = create_rect_roi([0, 0], [1, 1])
+        self.roi.sigRegionChangeFinished.connect(self.on_roi_changed)
+        self.view.addItem(self.roi)
+
+        return
+
+    def set_projection(self, index):
+
+        self.index = index
+        bounds = self.boundary.bounds
+
+        self.label.setText('{}: {}'.format(index, self.boundary.theta[index]))
+        self.image.setImage(np.asarray(self.boundary.projections[index]))
+        #  Move the box without signalling an edit.
+        self.roi.setPos([bounds[0][index], bounds[2][index]], finish=False)
+        self.roi.setSize([bounds[1][index] - bounds[0][index], bounds[3][index] - bounds[2][index]], finish=False)
+        self.view.autoRange()
+
+        return
+
+    def on_roi_changed(self, roi):
+
+        if self.index is not None:
+            self.boundary.set_roi(self.index, roi)
+
+        return
+
+
+class RoiGrid(QScrollArea):
+    """
+    A scrolling grid of every projection with its editable ROI box.  Only the tiles in
+    view are built, and tiles that scroll out of view are reused, so the grid opens as
+    quickly for a thousand projections as for ten.
+    """
+
+    def __init__(self, boundary, tile_width=220, tile_height=220):
+        super(RoiGrid, self).__init__()
+
+        pg.setConfigOptions(imageAxisOrder='row-major')
+
+        self.boundary = boundary
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = 1
+        self.tiles = {}
+        self.spare_tiles = []
+
+        self.container = QWidget()
+        self.setWidget(self.container)
+        self.setWidgetResizable(False)
+        self.verticalScrollBar().valueChanged.connect(self.update_tiles)
+
+        self.setWindowTitle('Coarse scan ROIs')
+        self.resize(6 * tile_width + 30, 4 * tile_height)
+
+        return
+
+    def resizeEvent(self, event):
+
+        super(RoiGrid, self).resizeEvent(event)
+        self.update_layout()
+
+        return
+
+    def update_layout(self):
+
+        num_projections = len(self.boundary.theta)
+        self.columns = max(1, self.viewport().width() // self.tile_width)
+        rows = -(-num_projections // self.columns)
+        self.container.setFixedSize(self.columns * self.tile_width, rows * self.tile_height)
+
+        #  Every tile may move, so place them all again.
+        self.spare_tiles.extend(self.tiles.values())
+        self.tiles = {}
+        self.update_tiles()
+
+        return
+
+    def get_visible_indices(self):
+
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height()
+        first = (top // self.tile_height) * self.columns
+        last = (bottom // self.tile_height + 1) * self.columns
+
+        return range(first, min(last, len(self.boundary.theta)))
+
+    def update_tiles(self, *args):
+
+        visible = self.get_visible_indices()
+
+        for index in list(self.tiles):
+            if index not in visible:
+                self.spare_tiles.append(self.tiles.pop(index))
+
+        for index in visible:
+            if index in self.tiles:
+                continue
+            if self.spare_tiles:
+                tile = self.spare_tiles.pop()
+            else:
+                tile = RoiTile(self.boundary, self.container)
+            tile.set_projection(index)
+            row, column = divmod(index, self.columns)
+            tile.setGeometry(column * self.tile_width, row * self.tile_height, self.tile_width, self.tile_height)
+            tile.show()
+            self.tiles[index] = tile
+
+        for tile in self.spare_tiles:
+            tile.hide()
+            tile.index = None
+
+        return
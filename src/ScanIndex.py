@@ -0,0 +1,438 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import h5py
+import numpy as np
+
+#  Below this many files the cost of starting worker processes is larger than the time saved.
+PARALLEL_THRESHOLD = 16
+
+#  The worker processes are started from GUI and indexing threads that may be inside h5py, so they
+#  are spawned instead of forked; a forked child could inherit a lock held by one of those threads.
+PROCESS_CONTEXT = multiprocessing.get_context('spawn')
+
+#  The directory for caches that cannot be kept next to the scan data.
+USER_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'CoordinateTransforms')
+
+#  The name of the metadata cache file that is kept in a scan directory.
+CACHE_FILE_NAME = '.coarse_scan_metadata.json'
+CACHE_VERSION = 1
+
+#  One coarse scan file.  shape is the shape of MAPS/XRF_roi, (channels, rows, columns),
+#  and channels is the list of channel names.
+ScanRecord = namedtuple('ScanRecord', ['theta', 'path', 'shape', 'channels'])
+
+
+def read_scan_metadata(path, stage_pv):
+    """
+    Read the rotation stage angle, data shape and channel names of one scan file.  Only the
+    metadata is read and the file is closed before returning.
+
+    :param path:     The full path to the hdf5 file.
+    :type  path:     str
+    :param stage_pv: The EPICS PV that is associated with the rotation stage.
+    :type  stage_pv: str
+    :return: A ScanRecord, with theta set to None if the file has no value for stage_pv.
+    """
+
+    byte_stage_pv = stage_pv.encode('ascii')
+
+    with h5py.File(path, 'r') as hdf_file:
+        maps = hdf_file['MAPS']
+        shape = tuple(maps['XRF_roi'].shape)
+        channels = tuple(name.decode('ascii') for name in maps['channel_names'][:])
+        extra_pvs = maps['extra_pvs']
+        pv_index = np.where(extra_pvs[0] == byte_stage_pv)[0]
+        if len(pv_index) == 0:
+            return ScanRecord(None, path, shape, channels)
+        theta = float(extra_pvs[1, pv_index[0]])
+
+    return ScanRecord(theta, path, shape, channels)
+
+
+class MetadataCache(object):
+    """
+    A cache of the metadata of the scan files in one directory, saved as a JSON file
+    next to the data.  An entry is used only while the size and modification time
+    of its file are unchanged.  If the directory is not writable the cache is kept
+    in ~/.cache/CoordinateTransforms instead.
+    """
+
+    def __init__(self, directory):
+
+        self.directory = os.path.abspath(directory)
+        self.cache_file = self.get_cache_file(self.directory)
+        self.entries = {}
+        self.modified = False
+
+        self.load()
+
+        return
+
+    @staticmethod
+    def get_cache_file(directory):
+
+        if os.access(directory, os.W_OK):
+            return os.path.join(directory, CACHE_FILE_NAME)
+
+        key = hashlib.sha1(directory.encode('utf-8')).hexdigest()
+
+        return os.path.join(USER_CACHE_DIR, key + '.json')
+
+    def load(self):
+
+        try:
+            with open(self.cache_file, 'r') as cache:
+                contents = json.load(cache)
+        except (IOError, OSError, ValueError):
+            return
+
+        if contents.get('version') == CACHE_VERSION and contents.get('directory') == self.directory:
+            self.entries = contents.get('files', {})
+
+        return
+
+    def save(self):
+
+        if not self.modified:
+            return
+
+        contents = {'version': CACHE_VERSION, 'directory': self.directory, 'files': self.entries}
+        temp_file = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(temp_file, 'w') as cache:
+                json.dump(contents, cache)
+            os.replace(temp_file, self.cache_file)
+            self.modified = False
+        except (IOError, OSError) as e:
+            print('Unable to save the scan metadata cache {}: {}'.format(self.cache_file, e))
+
+        return
+
+    def lookup(self, path, stage_pv):
+        """
+        :return: The cached ScanRecord of a file, or None if the file has changed or
+                 the angle of stage_pv has not been cached.
+        """
+
+        entry = self.entries.get(os.path.basename(path))
+        if entry is None or stage_pv not in entry['theta']:
+            return None
+
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+
+        if entry['size'] != file_stat.st_size or entry['mtime'] != file_stat.st_mtime_ns:
+            return None
+
+        return ScanRecord(entry['theta'][stage_pv], path, tuple(entry['shape']), tuple(entry['channels']))
+
+    def store(self, record, stage_pv, file_stat):
+        """
+        Add the metadata of a file.  file_stat must be taken before the file was read,
+        so that a file written during the read is read again next time.
+        """
+
+        name = os.path.basename(record.path)
+        entry = self.entries.get(name)
+        if entry is None or entry['size'] != file_stat.st_size or entry['mtime'] != file_stat.st_mtime_ns:
+            entry = {'size': file_stat.st_size, 'mtime': file_stat.st_mtime_ns, 'theta': {}}
+            self.entries[name] = entry
+
+        entry['shape'] = list(record.shape)
+        entry['channels'] = list(record.channels)
+        entry['theta'][stage_pv] = record.theta
+        self.modified = True
+
+        return
+
+
+def index_scans(paths, stage_pv, max_workers=None, use_cache=True):
+    """
+    Read the metadata of a list of scan files in parallel.  h5py serializes calls
+    into the HDF5 library inside one process, so the files are read by a pool of
+    worker processes.  Files that are unchanged since they were last indexed are
+    not opened, their metadata comes from the MetadataCache of their directory.
+
+    :param paths:       The full paths to the hdf5 files.
+    :type  paths:       list of str
+    :param stage_pv:    The EPICS PV that is associated with the rotation stage.
+    :type  stage_pv:    str
+    :param max_workers: The number of worker processes, None to use the number of CPUs.
+    :type  max_workers: int
+    :param use_cache:   Read and update the metadata cache files.
+    :type  use_cache:   bool
+    :return: A list of ScanRecord sorted by theta.  Files without a rotation stage
+             angle are left out.
+    """
+
+    paths = list(paths)
+    records = [None] * len(paths)
+    caches = {}
+
+    if use_cache:
+        for i, path in enumerate(paths):
+            directory = os.path.dirname(os.path.abspath(path))
+            if directory not in caches:
+                caches[directory] = MetadataCache(directory)
+            records[i] = caches[directory].lookup(path, stage_pv)
+
+    missing = [i for i in range(len(paths)) if records[i] is None]
+    missing_paths = [paths[i] for i in missing]
+    file_stats = [os.stat(path) for path in missing_paths]
+
+    if len(missing_paths) < PARALLEL_THRESHOLD or max_workers == 1:
+        read_records = [read_scan_metadata(path, stage_pv) for path in missing_paths]
+    else:
+        if max_workers is None:
+            max_workers = min(os.cpu_count() or 1, 8)
+        chunk_size = max(1, len(missing_paths) // (4 * max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=PROCESS_CONTEXT) as executor:
+            read_records = list(executor.map(read_scan_metadata, missing_paths,
+                                             [stage_pv] * len(missing_paths), chunksize=chunk_size))
+
+    for i, record, file_stat in zip(missing, read_records, file_stats):
+        records[i] = record
+        if use_cache:
+            caches[os.path.dirname(os.path.abspath(record.path))].store(record, stage_pv, file_stat)
+
+    for cache in caches.values():
+        cache.save()
+
+    for record in records:
+        if record.theta is None:
+            print('No value for {} in {}, skipping file.'.format(stage_pv, record.path))
+
+    records = [record for record in records if record.theta is not None]
+    records.sort(key=lambda record: record.theta)
+
+    return records
+
+
+class HDFHandlePool(object):
+    """
+    A bounded pool of open, read only hdf5 files.  The least recently used file is
+    closed when the pool is full, so the number of open files and the memory held by
+    their chunk caches stay bounded however many files a scan has.  A pinned file is
+    not closed until it is unpinned, even if the pool grows past maxsize.  A file that
+    is used again after it was closed is counted as a reopen.
+    """
+
+    def __init__(self, maxsize=32, rdcc_nbytes=1024 ** 2, rdcc_nslots=521, rdcc_w0=0.75):
+
+        self.maxsize = maxsize
+        #  The default chunk cache settings of every file opened by the pool.
+        self.chunk_cache = {'rdcc_nbytes': rdcc_nbytes, 'rdcc_nslots': rdcc_nslots, 'rdcc_w0': rdcc_w0}
+        #  Chunk cache settings of single files, that replace the defaults.
+        self.file_chunk_cache = {}
+        self.lock = threading.Lock()
+        self.files = OrderedDict()
+        self.pins = {}              #  The number of users of each pinned file.
+        self.closed_paths = set()
+        self.hits = 0
+        self.misses = 0
+        self.reopens = 0
+
+        return
+
+    def set_chunk_cache(self, path, **chunk_cache):
+        """
+        Set the chunk cache of one file, e.g. rdcc_nbytes=64 * 1024 ** 2 for a file that is read
+        many times.  The settings are used the next time the file is opened.
+        """
+
+        with self.lock:
+            self.file_chunk_cache[path] = chunk_cache
+
+        return
+
+    def get(self, path, pin=False):
+        """
+        :param path: The full path to the hdf5 file.
+        :type  path: str
+        :param pin:  Keep the file open until unpin() is called.
+        :type  pin:  bool
+        :return: The open h5py.File of path.
+        """
+
+        with self.lock:
+            if pin:
+                self.pins[path] = self.pins.get(path, 0) + 1
+
+            hdf_file = self.files.get(path)
+            if hdf_file is not None:
+                self.files.move_to_end(path)
+                self.hits += 1
+                return hdf_file
+
+            self.misses += 1
+            if path in self.closed_paths:
+                self.reopens += 1
+                self.closed_paths.discard(path)
+
+            chunk_cache = dict(self.chunk_cache)
+            chunk_cache.update(self.file_chunk_cache.get(path, {}))
+            try:
+                hdf_file = h5py.File(path, 'r', **chunk_cache)
+            except (IOError, OSError):
+                if pin:
+                    self._unpin(path)
+                raise
+            self.files[path] = hdf_file
+            self._close_unused()
+
+        return hdf_file
+
+    def unpin(self, path):
+        """
+        Release a file pinned by get(path, pin=True).
+        """
+
+        with self.lock:
+            self._unpin(path)
+            self._close_unused()
+
+        return
+
+    def _unpin(self, path):
+
+        count = self.pins.get(path, 0) - 1
+        if count > 0:
+            self.pins[path] = count
+        else:
+            self.pins.pop(path, None)
+
+        return
+
+    def _close_unused(self):
+        """
+        Close the least recently used files that are not pinned until there are at most
+        maxsize open files.  Called with the lock held.
+        """
+
+        while len(self.files) > self.maxsize:
+            old_path = next((path for path in self.files if path not in self.pins), None)
+            if old_path is None:
+                break
+            self.files.pop(old_path).close()
+            self.closed_paths.add(old_path)
+
+        return
+
+    def close(self, paths=None):
+        """
+        Close some files, or every file if paths is None.  Closing a file on purpose does
+        not count it as a reopen when it is opened again.
+        """
+
+        with self.lock:
+            if paths is None:
+                paths = list(self.files)
+            for path in paths:
+                hdf_file = self.files.pop(path, None)
+                if hdf_file is not None:
+                    hdf_file.close()
+                self.closed_paths.discard(path)
+
+        return
+
+    def get_stats(self):
+
+        with self.lock:
+            return {'open': len(self.files), 'hits': self.hits, 'misses': self.misses, 'reopens': self.reopens}
+
+
+#  The pool of the files read by every ScanFileList.
+hdf_pool = HDFHandlePool()
+
+
+class ScanFileList(object):
+    """
+    A read only list of the hdf5 files of a scan, in the order of a scan index.  Files
+    are taken from an HDFHandlePool, so only a bounded number are open at once.  A file
+    taken by index should be used before the next one is taken, since taking another
+    file may close it.  A file taken by iteration is pinned until the next one is
+    taken, and a slice is another ScanFileList, so no file is opened until it is used.
+    """
+
+    def __init__(self, paths, pool=None):
+
+        self.paths = list(paths)
+        self.pool = hdf_pool if pool is None else pool
+
+        return
+
+    def __len__(self):
+
+        return len(self.paths)
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return ScanFileList(self.paths[index], self.pool)
+
+        return self.pool.get(self.paths[index])
+
+    def __iter__(self):
+
+        for path in self.paths:
+            hdf_file = self.pool.get(path, pin=True)
+            try:
+                yield hdf_file
+            finally:
+                self.pool.unpin(path)
+
+    def close(self):
+
+        self.pool.close(self.paths)
+
+        return
@@ -0,0 +1,149 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+from collections import namedtuple
+import numpy as np
+from Transform import drives_to_axes
+
+#  The names of the columns of drive and motor position arrays.
+POSITION_NAMES = ('x', 'y', 'z', 't', 'fine_x', 'fine_y')
+
+#  The corners of a scan box as multiples of the (x width, y width) from its center.
+CORNERS = ((-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5))
+
+
+class LimitViolation(namedtuple('LimitViolation', ['row', 'corner', 'kind', 'axis', 'value', 'low', 'high'])):
+    """
+    A scan box corner that is outside of a limit.  row is the index in the scan list,
+    corner an index into CORNERS, kind is 'drive' or 'motor', and axis is one of
+    POSITION_NAMES.
+    """
+
+    __slots__ = ()
+
+
+def scan_corners(coord_list, x_width_list, y_width_list):
+    """
+    Calculate the drive positions of every corner of every scan box.  A scan moves the
+    fine X and Y drives over a box centered on the coordinates of its row.
+
+    :param coord_list:   Drive positions in (x, y, z, t, fine_x, fine_y) order, one per scan.
+    :type  coord_list:   list of float tuples
+    :param x_width_list: The width of each scan in the X direction.
+    :type  x_width_list: list of floats
+    :param y_width_list: The width of each scan in the Y direction.
+    :type  y_width_list: list of floats
+    :return: An (N, 4, 6) array of drive positions.
+    """
+
+    num_rows = min(len(coord_list), len(x_width_list), len(y_width_list))
+    centers = np.asarray(coord_list[:num_rows], dtype=float).reshape(num_rows, 6)
+    x_widths = np.asarray(x_width_list[:num_rows], dtype=float)
+    y_widths = np.asarray(y_width_list[:num_rows], dtype=float)
+
+    corners = np.repeat(centers[:, np.newaxis, :], len(CORNERS), axis=1)
+    for i, (x_factor, y_factor) in enumerate(CORNERS):
+        corners[:, i, 4] += x_factor * x_widths
+        corners[:, i, 5] += y_factor * y_widths
+
+    return corners
+
+
+def check_scan_limits(calibration, coord_list, x_width_list, y_width_list, drive_limits, motor_limits=None,
+                      use_offsets=True):
+    """
+    Check that every corner of every scan box is inside the drive and motor limits.
+    All of the corners are converted to motor positions in one call, so a whole scan
+    plan is checked at once before a script is written.
+
+    :param calibration:  The calibration of the coordinate system.
+    :type  calibration:  CS.CalibrationSnapshot
+    :param coord_list:   Drive positions in (x, y, z, t, fine_x, fine_y) order, one per scan.
+    :type  coord_list:   list of float tuples
+    :param x_width_list: The width of each scan in the X direction.
+    :type  x_width_list: list of floats
+    :param y_width_list: The width of each scan in the Y direction.
+    :type  y_width_list: list of floats
+    :param drive_limits: The (low, high) drive limits in (x, y, z, t, fine_x, fine_y) order.
+    :type  drive_limits: tuple
+    :param motor_limits: The (low, high) motor limits, or None to skip the motor check.
+    :type  motor_limits: tuple
+    :param use_offsets:  Use offsets in the calculation of motor values.
+    :type  use_offsets:  bool
+    :return: A list of LimitViolation, sorted by row.  The list is empty if the plan is good.
+    """
+
+    corners = scan_corners(coord_list, x_width_list, y_width_list)
+    num_rows = corners.shape[0]
+    drives = corners.reshape(-1, 6)
+
+    checks = [('drive', drives, drive_limits)]
+    if motor_limits is not None:
+        axes, motors = drives_to_axes(calibration, drives[:, 3], drives[:, 0], drives[:, 1], drives[:, 2],
+                                      drives[:, 4], drives[:, 5], use_offsets)
+        checks.append(('motor', motors, motor_limits))
+
+    violations = []
+    for kind, positions, (low, high) in checks:
+        low = np.asarray(low, dtype=float)
+        high = np.asarray(high, dtype=float)
+        outside = (positions < low) | (positions > high)
+        for point, axis in zip(*np.nonzero(outside)):
+            row, corner = divmod(int(point), len(CORNERS))
+            violations.append(LimitViolation(row, corner, kind, POSITION_NAMES[axis], float(positions[point, axis]),
+                                             float(low[axis]), float(high[axis])))
+
+    violations.sort(key=lambda violation: (violation.row, violation.corner))
+
+    return violations
+
+
+def format_violations(violations, max_lines=50):
+    """
+    :return: A readable report of a list of LimitViolation.
+    """
+
+    lines = ['Row {}, corner {}: {} {} = {:.4f} is outside [{}, {}]'.format(
+             violation.row, violation.corner, violation.kind, violation.axis, violation.value, violation.low,
+             violation.high) for violation in violations[:max_lines]]
+
+    if len(violations) > max_lines:
+        lines.append('... and {} more'.format(len(violations) - max_lines))
+
+    return '\n'.join(lines)
@@ -0,0 +1,190 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import os
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QThread, QTimer, pyqtSignal
+from ScanIndex import read_scan_metadata, index_scans
+from ProfileCache import profile_cache
+
+
+class ScanWatcher(QObject):
+    """
+    Watches a directory for new scan files.  A file is ready once its size has not
+    changed between two polls and its metadata can be read, which is when the writer
+    has closed it or it has become readable in SWMR mode.  Ready files are sent, sorted
+    by name, with scansReady.
+    """
+
+    scansReady = pyqtSignal(list, name = "scansReady" )
+
+    def __init__(self, stage_pv, poll_interval=1000):
+        super(ScanWatcher, self).__init__()
+
+        self.stage_pv = stage_pv
+        self.directory = None
+        self.known_paths = set()
+        self.pending = {}           #  The size of each new file at the last poll.
+
+        self.watcher = QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.check_directory)
+
+        #  Polling also finds files on file systems that do not report changes.
+        self.timer = QTimer()
+        self.timer.setInterval(poll_interval)
+        self.timer.timeout.connect(self.poll)
+
+        return
+
+    def start(self, directory, known_paths=()):
+        """
+        Start watching a directory.
+
+        :param directory:   The directory to watch.
+        :type  directory:   str
+        :param known_paths: The full paths of files that have already been read.
+        :type  known_paths: iterable of str
+        :return:
+        """
+
+        self.stop()
+        self.directory = directory
+        self.known_paths = set(known_paths)
+        self.pending = {}
+
+        self.watcher.addPath(directory)
+        self.check_directory()
+        self.timer.start()
+
+        return
+
+    def stop(self):
+
+        self.timer.stop()
+        if self.directory is not None:
+            self.watcher.removePath(self.directory)
+            self.directory = None
+
+        return
+
+    def is_running(self):
+
+        return self.directory is not None
+
+    def check_directory(self, *args):
+
+        if self.directory is None:
+            return
+
+        try:
+            file_names = os.listdir(self.directory)
+        except OSError as e:
+            print('Unable to list {}: {}'.format(self.directory, e))
+            return
+
+        for file_name in file_names:
+            path = os.path.join(self.directory, file_name)
+            if file_name.endswith('.h5') and path not in self.known_paths:
+                self.pending.setdefault(path, None)
+
+        return
+
+    def is_ready(self, path):
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            self.pending.pop(path, None)
+            return False
+
+        last_size = self.pending[path]
+        self.pending[path] = size
+        if size == 0 or size != last_size:
+            return False
+
+        try:
+            read_scan_metadata(path, self.stage_pv)
+        except (OSError, KeyError):
+            return False
+
+        return True
+
+    def poll(self):
+
+        self.check_directory()
+
+        ready = sorted(path for path in list(self.pending) if self.is_ready(path))
+        for path in ready:
+            del self.pending[path]
+            self.known_paths.add(path)
+
+        if ready:
+            self.scansReady.emit(ready)
+
+        return
+
+
+class ScanIndexThread(QThread):
+    """
+    Reads the metadata and the column and row profiles of new scan files without blocking
+    the GUI, and sends the new ScanIndex.ScanRecord list with scansIndexed.  The profiles
+    are left in the profile cache, so adding the files to an XRFBoundary does not read them.
+    """
+
+    scansIndexed = pyqtSignal(object, name = "scansIndexed" )
+
+    def __init__(self, paths, stage_pv, parent=None):
+        super(ScanIndexThread, self).__init__(parent)
+
+        self.paths = list(paths)
+        self.stage_pv = stage_pv
+
+        return
+
+    def run(self):
+
+        try:
+            records = index_scans(self.paths, self.stage_pv)
+            profile_cache.build([record.path for record in records])
+        except (OSError, KeyError, ValueError) as e:
+            print('Unable to read the new scan files: {}'.format(e))
+            return
+
+        self.scansIndexed.emit(records)
+
+        return
@@ -0,0 +1,214 @@
+'''
+Copyright (c) 2018, UChicago Argonne, LLC. All rights reserved.
+Copyright 2016. UChicago Argonne, LLC. This software was produced
+under U.S. Government contract DE-AC02-06CH11357 for Argonne National
+Laboratory (ANL), which is operated by UChicago Argonne, LLC for the
+U.S. Department of Energy. The U.S. Government has rights to use,
+reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR
+UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR
+ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is
+modified to produce derivative works, such modified software should
+be clearly marked, so as not to confuse it with the version available
+from ANL.
+Additionally, redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the following
+conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in
+      the documentation and/or other materials provided with the
+      distribution.
+    * Neither the name of UChicago Argonne, LLC, Argonne National
+      Laboratory, ANL, the U.S. Government, nor the names of its
+      contributors may be used to endorse or promote products derived
+      from this software without specific prior written permission.
+THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS
+"AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago
+Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+from collections import namedtuple
+import numpy as np
+from Transform import axes_to_drives
+
+
+class TrajectoryChunk(namedtuple('TrajectoryChunk', ['times', 'theta', 'sx', 'sz', 'px'])):
+    """
+    A block of drive setpoints from drive_trajectory().  Every field is a 1D array of
+    the same length; times are in seconds from the start of the sweep and theta is
+    the rotation drive position in degrees.
+    """
+
+    __slots__ = ()
+
+
+class TrapezoidProfile(object):
+    """
+    The angular velocity profile of a continuous rotation: accelerate to a constant
+    velocity, cruise, then decelerate to a stop at the end angle.  If there is not
+    enough room to reach the requested velocity the profile is triangular.
+    """
+
+    def __init__(self, start_angle, end_angle, velocity, acceleration=None):
+        """
+
+        :param start_angle:  The rotation angle at the start of the sweep, in degrees.
+        :type  start_angle:  float
+        :param end_angle:    The rotation angle at the end of the sweep, in degrees.
+        :type  end_angle:    float
+        :param velocity:     The cruise velocity in degrees per second.
+        :type  velocity:     float
+        :param acceleration: The acceleration in degrees per second squared.  None for
+                             an instantaneous change in velocity.
+        :type  acceleration: float
+        """
+
+        if velocity <= 0:
+            raise ValueError('velocity must be greater than zero')
+        if acceleration is not None and acceleration <= 0:
+            raise ValueError('acceleration must be greater than zero')
+
+        self.start_angle = float(start_angle)
+        self.end_angle = float(end_angle)
+        self.direction = 1.0 if end_angle >= start_angle else -1.0
+        self.distance = abs(self.end_angle - self.start_angle)
+        self.acceleration = acceleration
+
+        if acceleration is None or self.distance == 0:
+            #  A sweep of zero length takes no time.
+            self.accel_time = 0.0
+            self.velocity = float(velocity)
+        else:
+            self.accel_time = velocity / acceleration
+            self.velocity = float(velocity)
+            #  Not enough distance to reach the cruise velocity.
+            if acceleration * self.accel_time ** 2 > self.distance:
+                self.accel_time = np.sqrt(self.distance / acceleration)
+                self.velocity = acceleration * self.accel_time
+
+        accel_distance = 0.5 * self.velocity * self.accel_time
+        self.cruise_time = (self.distance - 2 * accel_distance) / self.velocity
+        self.duration = 2 * self.accel_time + self.cruise_time
+
+        return
+
+    def angles(self, times):
+        """
+        :param times: Times in seconds from the start of the sweep.
+        :type  times: array_like
+        :return: The rotation angle at each time.
+        """
+
+        times = np.clip(np.asarray(times, dtype=float), 0, self.duration)
+        accel_time = self.accel_time
+        cruise_end = accel_time + self.cruise_time
+
+        if accel_time > 0:
+            acceleration = self.velocity / accel_time
+        else:
+            acceleration = 0.0
+
+        accel_distance = 0.5 * self.velocity * accel_time
+        time_left = self.duration - times
+
+        distance = np.where(times < accel_time, 0.5 * acceleration * times ** 2,
+                            np.where(times <= cruise_end, accel_distance + self.velocity * (times - accel_time),
+                                     self.distance - 0.5 * acceleration * time_left ** 2))
+
+        return self.start_angle + self.direction * distance
+
+
+def drive_trajectory(calibration, point, profile, sample_period, chunk_size=4096, use_offsets=True):
+    """
+    Generate the drive setpoints that keep a point of the sample on the optical axis
+    during a continuous rotation.  The trajectory is produced in chunks, so a long
+    sweep can be streamed to a controller without being held in memory.
+
+    :param calibration:   The calibration of the coordinate system, e.g. from
+                          XZT_Transform.get_calibration().
+    :type  calibration:   CS.CalibrationSnapshot
+    :param point:         The sample frame (x, y, z, fine_x, fine_y) axis positions to
+                          follow, or a function that takes an array of angles and returns
+                          an (N, 5) array of them, e.g. the center of an ROI track.
+    :type  point:         tuple or callable
+    :param profile:       The rotation, e.g. a TrapezoidProfile.  It needs a duration
+                          attribute and an angles(times) method.
+    :type  profile:       TrapezoidProfile
+    :param sample_period: The time between setpoints in seconds.
+    :type  sample_period: float
+    :param chunk_size:    The number of setpoints in each chunk.
+    :type  chunk_size:    int
+    :param use_offsets:   Use offsets in the calculation of motor values.
+    :type  use_offsets:   bool
+    :return: A generator of TrajectoryChunk
+    """
+
+    if sample_period <= 0:
+        raise ValueError('sample_period must be greater than zero')
+
+    #  The last setpoint is always the end of the sweep.
+    num_samples = int(np.ceil(profile.duration / sample_period)) + 1
+
+    for first in range(0, num_samples, chunk_size):
+        times = np.minimum(np.arange(first, min(first + chunk_size, num_samples)) * sample_period, profile.duration)
+        theta = profile.angles(times)
+
+        if callable(point):
+            axes = np.asarray(point(theta), dtype=float).reshape(len(theta), 5)
+        else:
+            axes = np.broadcast_to(np.asarray(point, dtype=float), (len(theta), 5))
+
+        drives, motors = axes_to_drives(calibration, theta, axes[:, 0], axes[:, 1], axes[:, 2], axes[:, 3],
+                                        axes[:, 4], use_offsets)
+
+        yield TrajectoryChunk(times, drives[:, 3], drives[:, 0], drives[:, 2], drives[:, 4])
+
+    return
+
+
+def interpolated_track(theta, x, y, z=0, fine_x=None, fine_y=None, period=360.0):
+    """
+    Create a point function for drive_trajectory() that follows positions known at a
+    few angles, e.g. the centers of the coarse scan ROIs, by periodic linear
+    interpolation.
+
+    :param theta:  The angles of the known positions in degrees, in any order.
+    :type  theta:  array_like
+    :param x:      The X axis position at each angle.
+    :type  x:      array_like
+    :param y:      The Y axis position at each angle.
+    :type  y:      array_like
+    :param z:      The Z axis position at each angle.
+    :type  z:      array_like
+    :param fine_x: The fine X axis position at each angle, x if None.
+    :type  fine_x: array_like
+    :param fine_y: The fine Y axis position at each angle, y if None.
+    :type  fine_y: array_like
+    :param period: The period of the rotation in degrees, None for no wraparound.
+    :type  period: float
+    :return: A function of an array of angles.
+    """
+
+    theta = np.asarray(theta, dtype=float)
+    columns = [x, y, z, x if fine_x is None else fine_x, y if fine_y is None else fine_y]
+    columns = [np.broadcast_to(np.asarray(column, dtype=float), theta.shape) for column in columns]
+
+    #  np.interp needs increasing angles when there is no period.
+    order = np.argsort(theta, kind='stable')
+    theta = theta[order]
+    columns = [column[order] for column in columns]
+
+    def track(angles):
+        return np.column_stack([np.interp(angles, theta, column, period=period) for column in columns])
+
+    return track
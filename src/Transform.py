@@ -37,21 +37,505 @@ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 POSSIBILITY OF SUCH DAMAGE.
 '''
 
-from math import cos, sin, pi
+from collections import OrderedDict
+from math import pi
+import threading
+import numpy as np
 from CS import CoordinateSystem as CS
 
+#  The homogeneous coordinate vector used by the kinematics matrices is
+#  (x, y, z, t, fine_x, fine_y, 1), the same order as get_axis_positions().
+HOMOGENEOUS_SIZE = 7
+
+
+def _as_columns(angle, x, y, z, fine_x, fine_y):
+    """
+    Convert the arguments of a batch transform into six equal length float arrays.
+    If only the first argument is given it must be an (N, 6) array whose columns are
+    (angle, x, y, z, fine_x, fine_y).
+
+    :return: A tuple of six 1D numpy arrays.
+    """
+
+    if x is None and y is None and z is None and fine_x is None and fine_y is None:
+        points = np.atleast_2d(np.asarray(angle, dtype=float))
+        if points.ndim != 2 or points.shape[1] != 6:
+            raise ValueError('Expected an (N, 6) array of (angle, x, y, z, fine_x, fine_y) points, got shape %s'
+                             % (points.shape,))
+        return tuple(points[:, i] for i in range(6))
+
+    columns = [np.atleast_1d(np.asarray(0 if value is None else value, dtype=float))
+               for value in (angle, x, y, z, fine_x, fine_y)]
+    try:
+        columns = np.broadcast_arrays(*columns)
+    except ValueError:
+        raise ValueError('Batch transform arguments must have equal lengths, got %s'
+                         % ([len(column) for column in columns],))
+
+    return tuple(np.array(column, dtype=float) for column in columns)
+
+
+def _check_pv_values(values, pv_names):
+    """
+    Make sure that none of the PV reads of a stateful transform timed out.  A missing
+    value must not be turned into a position of 0 by _as_columns().
+
+    :param values:   The values returned by one of the get_*_pv_positions() methods.
+    :type  values:   tuple
+    :param pv_names: The names of the PVs in the same order as values.
+    :type  pv_names: list of str
+    :return: The values, unchanged.
+    """
+
+    timed_out = [name for name, value in zip(pv_names, values) if value is None]
+    if timed_out:
+        raise TimeoutError('No value read from %s' % ', '.join(timed_out))
+
+    return values
+
+
+def translation_matrix(x=0, y=0, z=0):
+    """
+    Create a homogeneous matrix that adds an (x, y, z) offset to the coarse and
+    fine stages.  The coarse and fine X stages share the X offset, and the coarse
+    and fine Y stages share the Y offset.
+
+    :return: A 7x7 numpy array.
+    """
+
+    matrix = np.eye(HOMOGENEOUS_SIZE)
+    matrix[:6, 6] = (x, y, z, 0, x, y)
+
+    return matrix
+
+
+def origin_offset_matrix(origin_offsets):
+    """
+    Create the matrix that moves axis positions from the sample origin to the
+    center of rotation.
+
+    :param origin_offsets: The (xo, yo, zo) values from get_sample_origin_offsets().
+    :type  origin_offsets: tuple
+    :return: A 7x7 numpy array.
+    """
+
+    return translation_matrix(*origin_offsets)
+
+
+def optical_axis_offset_matrix(optical_offsets):
+    """
+    Create the matrix that moves positions from the center of rotation to the
+    optical axis.
+
+    :param optical_offsets: The (xa, ya, za) values from get_optical_axis_offsets().
+    :type  optical_offsets: tuple
+    :return: A 7x7 numpy array.
+    """
+
+    return translation_matrix(*optical_offsets)
+
+
+def rotation_matrix(angles):
+    """
+    Create the rotation matrices that take positions about the center of rotation
+    to drive positions, one for each angle.
+
+    :param angles: Rotation angles in degrees.
+    :type  angles: array_like
+    :return: An (N, 7, 7) numpy array.
+    """
+
+    angles = np.atleast_1d(np.asarray(angles, dtype=float))
+    cosine_factor = np.cos(angles * (pi / 180.0))
+    sine_factor = np.sin(angles * (pi / 180.0))
+
+    matrices = np.zeros((len(angles), HOMOGENEOUS_SIZE, HOMOGENEOUS_SIZE))
+    #  X drive
+    matrices[:, 0, 0] = -cosine_factor
+    matrices[:, 0, 2] = -sine_factor
+    #  Y drive
+    matrices[:, 1, 1] = -1
+    #  Z drive
+    matrices[:, 2, 2] = -cosine_factor
+    matrices[:, 2, 4] = sine_factor
+    #  Rotation drive
+    matrices[:, 3, 3] = 1
+    #  Fine X drive
+    matrices[:, 4, 2] = -sine_factor
+    matrices[:, 4, 4] = -cosine_factor
+    #  Fine Y drive
+    matrices[:, 5, 5] = -1
+    matrices[:, 6, 6] = 1
+
+    return matrices
+
+
+def axes_to_drives_matrix(angles, origin_offsets, optical_offsets):
+    """
+    Compose the matrices that convert axis positions to drive positions.  This is
+    the geometry of XZT_Transform.transform_axes(): move to the center of rotation,
+    rotate, then move to the optical axis.
+
+    :return: An (N, 7, 7) numpy array.
+    """
+
+    return np.matmul(optical_axis_offset_matrix(optical_offsets),
+                     np.matmul(rotation_matrix(angles), origin_offset_matrix(origin_offsets)))
+
+
+def drives_to_axes_matrix(angles, origin_offsets, optical_offsets):
+    """
+    Compose the matrices that convert drive positions to axis positions, using the
+    geometry of XZT_Transform.transform_drives().
+
+    :return: An (N, 7, 7) numpy array.
+    """
+
+    xo_offset, yo_offset, zo_offset = origin_offsets
+    xa_offset, ya_offset, za_offset = optical_offsets
+
+    angles = np.atleast_1d(np.asarray(angles, dtype=float))
+    cosine_factor = np.cos(angles * (pi / 180.0))
+    sine_factor = np.sin(angles * (pi / 180.0))
+
+    matrices = np.zeros((len(angles), HOMOGENEOUS_SIZE, HOMOGENEOUS_SIZE))
+    #  X axis
+    matrices[:, 0, 0] = -cosine_factor
+    matrices[:, 0, 2] = sine_factor
+    matrices[:, 0, 6] = (xa_offset * cosine_factor) + (za_offset * sine_factor)
+    #  Y axis
+    matrices[:, 1, 1] = -1
+    matrices[:, 1, 6] = ya_offset
+    #  Z axis
+    matrices[:, 2, 2] = -cosine_factor
+    matrices[:, 2, 4] = -sine_factor
+    matrices[:, 2, 6] = (xa_offset * sine_factor) + (za_offset * cosine_factor)
+    #  Rotation axis
+    matrices[:, 3, 3] = 1
+    #  Fine X axis
+    matrices[:, 4, 2] = sine_factor
+    matrices[:, 4, 4] = -cosine_factor
+    matrices[:, 4, 6] = (xa_offset * cosine_factor) + (za_offset * sine_factor)
+    #  Fine Y axis
+    matrices[:, 5, 5] = -1
+    matrices[:, 5, 6] = ya_offset
+    matrices[:, 6, 6] = 1
+
+    return np.matmul(translation_matrix(-xo_offset, -yo_offset, -zo_offset), matrices)
+
+
+def drives_to_motors_matrix(offsets, scales, use_offsets=True, fine_from_coarse=False):
+    """
+    Create the matrix that converts drive positions to motor units.
+
+    When use_offsets is True, transform_axes() has always calculated the fine motor
+    positions from the coarse X and Y drives.  Set fine_from_coarse to reproduce that.
+
+    :param offsets:          The values from get_offsets().
+    :type  offsets:          tuple
+    :param scales:           The values from get_scale_factors().
+    :type  scales:           tuple
+    :param use_offsets:      Use offsets in the calculation of motor values.
+    :type  use_offsets:      bool
+    :param fine_from_coarse: Use the coarse drives for the fine motors.
+    :type  fine_from_coarse: bool
+    :return: A 7x7 numpy array.
+    """
+
+    scales = np.asarray(scales, dtype=float)
+    matrix = np.zeros((HOMOGENEOUS_SIZE, HOMOGENEOUS_SIZE))
+    matrix[np.arange(6), np.arange(6)] = 1.0 / scales
+    matrix[6, 6] = 1
+
+    if use_offsets:
+        if fine_from_coarse:
+            matrix[4, 4] = 0
+            matrix[4, 0] = 1.0 / scales[4]
+            matrix[5, 5] = 0
+            matrix[5, 1] = 1.0 / scales[5]
+    else:
+        matrix[:6, 6] = -np.asarray(offsets, dtype=float) / scales
+
+    return matrix
+
+
+def motors_to_drives_matrix(offsets, scales, use_offsets=True):
+    """
+    Create the matrix that converts motor positions to drive units.  This is the
+    inverse of drives_to_motors_matrix().
+
+    :return: A 7x7 numpy array.
+    """
+
+    matrix = np.eye(HOMOGENEOUS_SIZE)
+    matrix[np.arange(6), np.arange(6)] = np.asarray(scales, dtype=float)
+
+    if not use_offsets:
+        matrix[:6, 6] = np.asarray(offsets, dtype=float)
+
+    return matrix
+
+
+def apply_matrices(matrices, points, index=None):
+    """
+    Apply homogeneous matrices to an (N, 6) array of positions.
+
+    :param matrices: A single 7x7 matrix, or an (M, 7, 7) stack of matrices.
+    :type  matrices: numpy.ndarray
+    :param points:   An (N, 6) array of positions in (x, y, z, t, fine_x, fine_y) order.
+    :type  points:   numpy.ndarray
+    :param index:    For a stack of matrices, the matrix to use for each point.
+    :type  index:    numpy.ndarray
+    :return: An (N, 6) numpy array.
+    """
+
+    if matrices.ndim == 2:
+        return np.dot(points, matrices[:6, :6].T) + matrices[:6, 6]
+
+    if index is None:
+        index = np.arange(len(points))
+
+    linear = matrices[:, :6, :6][index]
+    translation = matrices[:, :6, 6][index]
+
+    return np.einsum('nij,nj->ni', linear, points) + translation
+
+
+class MatrixCache(object):
+    """
+    A least recently used cache of kinematics matrices keyed by angle and
+    calibration.  It is safe to share between threads.
+    """
+
+    def __init__(self, maxsize=4096):
+
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.matrices = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        return
+
+    def get(self, key, angles, build):
+        """
+        Return the matrices for an array of unique angles, building only the ones
+        that are not in the cache.
+
+        :param key:    Identifies the kind of matrix and the calibration it was built with.
+        :type  key:    tuple
+        :param angles: Unique rotation angles in degrees.
+        :type  angles: numpy.ndarray
+        :param build:  A function that builds a stack of matrices for an array of angles.
+        :type  build:  callable
+        :return: A numpy array with one entry per angle.
+        """
+
+        #  Too many angles to be worth keeping, build them all at once.
+        if len(angles) > self.maxsize:
+            with self.lock:
+                self.misses += len(angles)
+            return build(angles)
+
+        entries = [None] * len(angles)
+        missing = []
+        with self.lock:
+            for i, angle in enumerate(angles.tolist()):
+                matrix = self.matrices.get((key, angle))
+                if matrix is None:
+                    missing.append(i)
+                else:
+                    self.matrices.move_to_end((key, angle))
+                    entries[i] = matrix
+
+            self.hits += len(angles) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            built = build(angles[missing])
+            with self.lock:
+                for matrix, i in zip(built, missing):
+                    entries[i] = matrix
+                    self.matrices[(key, float(angles[i]))] = matrix
+                while len(self.matrices) > self.maxsize:
+                    self.matrices.popitem(last=False)
+
+        return np.stack(entries)
+
+    def clear(self):
+
+        with self.lock:
+            self.matrices.clear()
+
+        return
+
+
+def get_matrices(calibration, kind, angles, use_offsets=True, cache=None):
+    """
+    Return the composed kinematics matrices for an array of angles.
+
+    :param calibration: The calibration to build the matrices with.
+    :type  calibration: CS.CalibrationSnapshot
+    :param kind:        'axes' for axes -> drives matrices, or 'drives' for drives -> axes.
+    :type  kind:        str
+    :param angles:      Rotation angles in degrees.
+    :type  angles:      array_like
+    :param use_offsets: Use offsets in the calculation of motor values.
+    :type  use_offsets: bool
+    :param cache:       A cache to look the matrices up in, or None to always build them.
+    :type  cache:       MatrixCache
+    :return: A tuple of (index of each angle in the returned stacks, (M, 7, 7) geometry
+             matrices, (M, 7, 7) motor matrices), with one matrix per unique angle.
+    """
+
+    version, origin_offsets, optical_offsets, offsets, scales = calibration
+    unique_angles, index = np.unique(np.asarray(angles, dtype=float), return_inverse=True)
+
+    if kind == 'axes':
+        motor_matrix = drives_to_motors_matrix(offsets, scales, use_offsets, fine_from_coarse=True)
+
+        def build(build_angles):
+            geometry = axes_to_drives_matrix(build_angles, origin_offsets, optical_offsets)
+            return np.stack((geometry, np.matmul(motor_matrix, geometry)), axis=1)
+
+    elif kind == 'drives':
+        motor_matrix = drives_to_motors_matrix(offsets, scales, use_offsets)
+
+        def build(build_angles):
+            geometry = drives_to_axes_matrix(build_angles, origin_offsets, optical_offsets)
+            return np.stack((geometry, np.broadcast_to(motor_matrix, geometry.shape)), axis=1)
+
+    else:
+        raise ValueError('Unknown matrix kind %s' % kind)
+
+    #  Each pair of geometry and motor matrices is a single entry.
+    if cache is None:
+        pairs = build(unique_angles)
+    else:
+        pairs = cache.get((kind, tuple(calibration), use_offsets), unique_angles, build)
+
+    return index.reshape(-1), pairs[:, 0], pairs[:, 1]
+
+
+def axes_to_drives(calibration, angle, x=None, y=None, z=None, fine_x=None, fine_y=None, use_offsets=True,
+                   cache=None):
+    """
+    Calculate drive and motor positions from axis positions.  This is a pure function,
+    it only uses its arguments, so it is safe to call from any thread or process.
+
+    The points may be given either as six equal length arrays, or as a single
+    (N, 6) array whose columns are (angle, x, y, z, fine_x, fine_y).
+
+    :param calibration: The calibration of the coordinate system.
+    :type  calibration: CS.CalibrationSnapshot
+    :param use_offsets: Use offsets in the calculation of motor values.
+    :type  use_offsets: bool
+    :param cache:       An optional cache of matrices.
+    :type  cache:       MatrixCache
+    :return: Two (N, 6) arrays of drive and motor positions in
+             (x, y, z, t, fine_x, fine_y) order.
+    """
+
+    t_axis, x_axis, y_axis, z_axis, fine_x_axis, fine_y_axis = _as_columns(angle, x, y, z, fine_x, fine_y)
+    axes = np.column_stack((x_axis, y_axis, z_axis, t_axis, fine_x_axis, fine_y_axis))
+
+    index, geometry, motor = get_matrices(calibration, 'axes', t_axis, use_offsets, cache)
+    drives = apply_matrices(geometry, axes, index)
+    motors = apply_matrices(motor, axes, index)
+
+    return drives, motors
+
+
+def drives_to_axes(calibration, angle, x=None, y=None, z=None, fine_x=None, fine_y=None, use_offsets=True,
+                   cache=None):
+    """
+    Calculate axis and motor positions from drive positions.  This is a pure function,
+    it only uses its arguments, so it is safe to call from any thread or process.
+
+    The points may be given either as six equal length arrays, or as a single
+    (N, 6) array whose columns are (angle, x, y, z, fine_x, fine_y).
+
+    :param calibration: The calibration of the coordinate system.
+    :type  calibration: CS.CalibrationSnapshot
+    :param use_offsets: Use offsets in the calculation of motor values.
+    :type  use_offsets: bool
+    :param cache:       An optional cache of matrices.
+    :type  cache:       MatrixCache
+    :return: Two (N, 6) arrays of axis and motor positions in
+             (x, y, z, t, fine_x, fine_y) order.
+    """
+
+    t_drive, x_drive, y_drive, z_drive, fine_x_drive, fine_y_drive = _as_columns(angle, x, y, z, fine_x, fine_y)
+    drives = np.column_stack((x_drive, y_drive, z_drive, t_drive, fine_x_drive, fine_y_drive))
+
+    index, geometry, motor = get_matrices(calibration, 'drives', t_drive, use_offsets, cache)
+    axes = apply_matrices(geometry, drives, index)
+    motors = apply_matrices(motor[0], drives)
+
+    return axes, motors
+
+
+def motors_to_axes(calibration, angle, x=None, y=None, z=None, fine_x=None, fine_y=None, use_offsets=True,
+                   cache=None):
+    """
+    Calculate axis and drive positions from motor positions.  This is a pure function,
+    it only uses its arguments, so it is safe to call from any thread or process.
+
+    The points may be given either as six equal length arrays, or as a single
+    (N, 6) array whose columns are (angle, x, y, z, fine_x, fine_y).
+
+    :param calibration: The calibration of the coordinate system.
+    :type  calibration: CS.CalibrationSnapshot
+    :param use_offsets: Use offsets in the calculation of motor values.
+    :type  use_offsets: bool
+    :param cache:       An optional cache of matrices.
+    :type  cache:       MatrixCache
+    :return: Two (N, 6) arrays of axis and drive positions in
+             (x, y, z, t, fine_x, fine_y) order.
+    """
+
+    t_motor, x_motor, y_motor, z_motor, fine_x_motor, fine_y_motor = _as_columns(angle, x, y, z, fine_x, fine_y)
+    motors = np.column_stack((x_motor, y_motor, z_motor, t_motor, fine_x_motor, fine_y_motor))
+
+    version, origin_offsets, optical_offsets, offsets, scales = calibration
+    drives = apply_matrices(motors_to_drives_matrix(offsets, scales, use_offsets), motors)
+
+    index, geometry, motor = get_matrices(calibration, 'drives', drives[:, 3], use_offsets, cache)
+    axes = apply_matrices(geometry, drives, index)
+
+    return axes, drives
+
 
 class XZT_Transform(object):
+    """
+    The stateful interface to the XZT coordinate transforms.  The calculations are
+    done by the pure functions axes_to_drives(), drives_to_axes() and
+    motors_to_axes(); the methods of this class read the calibration and positions
+    from the IOC and store the results in the coordinate system.
+    """
 
-    def __init__(self, prefix):
+    def __init__(self, prefix, cache_size=4096):
 
         self.cosine_factor = 0
         self.sine_factor = 0
 
         self.coordsys = CS(prefix)
 
+        self.matrix_cache = MatrixCache(cache_size)
+
         return
 
+    def get_calibration(self):
+        """
+        Return the calibration snapshot of the coordinate system.  The snapshot version
+        changes whenever any of the values change, so matrices cached with an older
+        calibration are never used again.
+
+        :return: A CalibrationSnapshot
+        """
+
+        return self.coordsys.get_calibration()
+
     def transform_axes(self, angle=0, x=0, y=0, z=0, fine_x=0, fine_y=0, use_offsets=True, use_pvs=True):
         """"
         This method takes values that represent axis positions (as defined in
@@ -74,16 +558,12 @@ class XZT_Transform(object):
         :type use_offsets: bool
         :param use_pvs: Use current pv values or manually entered values.
         :type use_pvs: bool
+        :raises TimeoutError: If use_pvs is True and any of the PVs could not be read.
         """
 
-        # Get all of the offset values.
-        xo_offset, yo_offset, zo_offset = self.coordsys.get_sample_origin_offsets()
-        xa_offset, ya_offset, za_offset = self.coordsys.get_optical_axis_offsets()
-        x_offset, y_offset, z_offset, t_offset, fine_x_offset, fine_y_offset = self.coordsys.get_offsets()
-        x_scale, y_scale, z_scale, t_scale, fine_x_scale, fine_y_scale = self.coordsys.get_scale_factors()
-
         if use_pvs:
-            x_axis, y_axis, z_axis, t_axis, fine_x_axis, fine_y_axis = self.coordsys.get_axis_pv_positions()
+            x_axis, y_axis, z_axis, t_axis, fine_x_axis, fine_y_axis = _check_pv_values(
+                self.coordsys.get_axis_pv_positions(), self.coordsys.get_pv_names(self.coordsys.axis_pvs))
         else:
             x_axis = x
             y_axis = y
@@ -93,52 +573,48 @@ class XZT_Transform(object):
 
         t_axis = angle
 
-        self.coordsys.set_axis_positions(t_axis, x_axis, y_axis, z_axis, fine_x_axis, fine_y_axis)
-
-        cosine_factor = cos(t_axis * (pi/180.0))
-        sine_factor = sin(t_axis * (pi/180.0))
-
-        # Calculate the drive positions
-        x_drive = -(xo_offset * cosine_factor) - (x_axis * cosine_factor) - (z_axis * sine_factor)\
-                          - (zo_offset * sine_factor) + xa_offset
-
-        y_drive = -yo_offset - y_axis + ya_offset
-
-        z_drive = -(zo_offset * cosine_factor) + (fine_x_axis * sine_factor) - (z_axis * cosine_factor)\
-                          + (xo_offset * sine_factor) + za_offset
-
-        fine_x_drive = -(xo_offset * cosine_factor) - (fine_x_axis * cosine_factor) - (z_axis * sine_factor)\
-                              - (zo_offset * sine_factor) + xa_offset
-
-        fine_y_drive = -yo_offset - fine_y_axis + ya_offset
-
-        t_drive = t_axis
+        drives, motors = axes_to_drives(self.get_calibration(), t_axis, x_axis, y_axis, z_axis, fine_x_axis,
+                                        fine_y_axis, use_offsets, self.matrix_cache)
+        x_drive, y_drive, z_drive, t_drive, fine_x_drive, fine_y_drive = drives[0].tolist()
+        x_motor, y_motor, z_motor, t_motor, fine_x_motor, fine_y_motor = motors[0].tolist()
 
+        self.coordsys.set_axis_positions(t_axis, x_axis, y_axis, z_axis, fine_x_axis, fine_y_axis)
         self.coordsys.set_drive_positions(t_drive, x_drive, y_drive, z_drive, fine_x_drive, fine_y_drive)
-
-        # Calculate the motor positions
-        if use_offsets:
-
-            x_motor = x_drive / x_scale
-            y_motor = y_drive / y_scale
-            z_motor = z_drive / z_scale
-            t_motor = t_drive / t_scale
-            fine_x_motor = x_drive / fine_x_scale
-            fine_y_motor = y_drive / fine_y_scale
-
-        else:
-
-            x_motor = (x_drive - x_offset) / x_scale
-            y_motor = (y_drive - y_offset) / y_scale
-            z_motor = (z_drive - z_offset) / z_scale
-            t_motor = (t_drive - t_offset) / t_scale
-            fine_x_motor = (fine_x_drive - fine_x_offset) / fine_x_scale
-            fine_y_motor = (fine_y_drive - fine_y_offset) / fine_y_scale
-
         self.coordsys.set_motor_positions(t_motor, x_motor, y_motor, z_motor, fine_x_motor, fine_y_motor)
 
         return
 
+    def transform_axes_array(self, angle, x=None, y=None, z=None, fine_x=None, fine_y=None, use_offsets=True):
+        """
+        This method is the batch version of transform_axes().  It takes arrays of axis
+        positions and calculates the corresponding drive and motor positions for every
+        point in one vectorized pass.  The offset and scale PVs are read once per call
+        and the state of the coordinate system is not changed.
+
+        The points may be given either as six equal length arrays, or as a single
+        (N, 6) array whose columns are (angle, x, y, z, fine_x, fine_y).
+
+        :param angle: The position values of the rotation axis, or an (N, 6) array of points.
+        :type angle: array_like
+        :param x: The position values of the coarse X axis.
+        :type x: array_like
+        :param y: The position values of the coarse Y axis.
+        :type y: array_like
+        :param z: The position values of the Z axis.
+        :type z: array_like
+        :param fine_x: The position values of the fine X axis.
+        :type fine_x: array_like
+        :param fine_y: The position values of the fine Y axis.
+        :type fine_y: array_like
+        :param use_offsets: Use offsets in the calculation of motor values.
+        :type use_offsets: bool
+        :return: Two (N, 6) arrays of drive and motor positions.  The columns are in the
+                 same order as get_drive_positions(): (x, y, z, t, fine_x, fine_y).
+        """
+
+        return axes_to_drives(self.get_calibration(), angle, x, y, z, fine_x, fine_y, use_offsets,
+                              self.matrix_cache)
+
     def transform_drives(self, angle=0, x=0, y=0, z=0, fine_x=0, fine_y=0, use_offsets=True, use_pvs=True):
         """"
         This method takes values that represent axis positions (as defined in
@@ -161,16 +637,12 @@ class XZT_Transform(object):
         :type use_offsets: bool
         :param use_pvs: Use current pv values or manually entered values.
         :type use_pvs: bool
+        :raises TimeoutError: If use_pvs is True and any of the PVs could not be read.
         """
 
-        # Get all of the offset values.
-        xo_offset, yo_offset, zo_offset = self.coordsys.get_sample_origin_offsets()
-        xa_offset, ya_offset, za_offset = self.coordsys.get_optical_axis_offsets()
-        x_offset, y_offset, z_offset, t_offset, fine_x_offset, fine_y_offset = self.coordsys.get_offsets()
-        x_scale, y_scale, z_scale, t_scale, fine_x_scale, fine_y_scale = self.coordsys.get_scale_factors()
-
         if use_pvs:
-            x_drive, y_drive, z_drive, t_drive, fine_x_drive, fine_y_drive = self.coordsys.get_drive_pv_positions()
+            x_drive, y_drive, z_drive, t_drive, fine_x_drive, fine_y_drive = _check_pv_values(
+                self.coordsys.get_drive_pv_positions(), self.coordsys.get_pv_names(self.coordsys.drive_pvs))
         else:
             x_drive = x
             y_drive = y
@@ -180,54 +652,138 @@ class XZT_Transform(object):
 
         t_drive = angle
 
+        axes, motors = drives_to_axes(self.get_calibration(), t_drive, x_drive, y_drive, z_drive, fine_x_drive,
+                                      fine_y_drive, use_offsets, self.matrix_cache)
+        x_motor, y_motor, z_motor, t_motor, fine_x_motor, fine_y_motor = motors[0].tolist()
+        x_axis, y_axis, z_axis, t_axis, fine_x_axis, fine_y_axis = axes[0].tolist()
+
         self.coordsys.set_drive_positions(t_drive, x_drive, y_drive, z_drive, fine_x_drive, fine_y_drive)
+        self.coordsys.set_motor_positions(t_motor, x_motor, y_motor, z_motor, fine_x_motor, fine_y_motor)
+        self.coordsys.set_axis_positions(t_axis, x_axis, y_axis, z_axis, fine_x_axis, fine_y_axis)
 
-        cosine_factor = cos(t_drive * (pi / 180))
-        sine_factor = sin(t_drive * (pi / 180))
+        return
 
-        # Calculate the motor positions
-        if use_offsets:
+    def transform_drives_array(self, angle, x=None, y=None, z=None, fine_x=None, fine_y=None, use_offsets=True):
+        """
+        This method is the batch version of transform_drives().  It takes arrays of drive
+        positions and calculates the corresponding axis and motor positions for every
+        point in one vectorized pass.  The offset and scale PVs are read once per call
+        and the state of the coordinate system is not changed.
+
+        The points may be given either as six equal length arrays, or as a single
+        (N, 6) array whose columns are (angle, x, y, z, fine_x, fine_y).
+
+        :param angle: The position values of the rotation drive, or an (N, 6) array of points.
+        :type angle: array_like
+        :param x: The position values of the coarse X drive.
+        :type x: array_like
+        :param y: The position values of the coarse Y drive.
+        :type y: array_like
+        :param z: The position values of the Z drive.
+        :type z: array_like
+        :param fine_x: The position values of the fine X drive.
+        :type fine_x: array_like
+        :param fine_y: The position values of the fine Y drive.
+        :type fine_y: array_like
+        :param use_offsets: Use offsets in the calculation of motor values.
+        :type use_offsets: bool
+        :return: Two (N, 6) arrays of axis and motor positions.  The columns are in the
+                 same order as get_axis_positions(): (x, y, z, t, fine_x, fine_y).
+        """
 
-            x_motor = x_drive / x_scale
-            y_motor = y_drive / y_scale
-            z_motor = z_drive / z_scale
-            t_motor = t_drive / t_scale
-            fine_x_motor = fine_x_drive / fine_x_scale
-            fine_y_motor = fine_y_drive / fine_y_scale
+        return drives_to_axes(self.get_calibration(), angle, x, y, z, fine_x, fine_y, use_offsets,
+                              self.matrix_cache)
 
-        else:
+    def transform_motors(self, angle=0, x=0, y=0, z=0, fine_x=0, fine_y=0, use_offsets=True, use_pvs=True):
+        """"
+        This method takes values that represent motor positions and calculates
+        the values of the corresponding drive and axis positions.  It is the
+        inverse of the motor calculation done in transform_drives().
 
-            x_motor = (x_drive - x_offset) / x_scale
-            y_motor = (y_drive - y_offset) / y_scale
-            z_motor = (z_drive - z_offset) / z_scale
-            t_motor = (t_drive - t_offset) / t_scale
-            fine_x_motor = (fine_x_drive - fine_x_offset) / fine_x_scale
-            fine_y_motor = (fine_y_drive - fine_y_offset) / fine_y_scale
+        :param angle: The position value of the rotation motor.
+        :type angle: float
+        :param x: The position value of the coarse X motor.
+        :type x: float
+        :param y: The position of the coarse Y motor
+        :type y: float
+        :param z: The position value of the Z motor.
+        :type z: float
+        :param fine_x: The position of the fine X motor.
+        :type fine_x: float
+        :param fine_y: The position of the fine y motor.
+        :type fine_y: float
+        :param use_offsets: Use offsets in the calculation of motor values.
+        :type use_offsets: bool
+        :param use_pvs: Use current pv values or manually entered values.
+        :type use_pvs: bool
+        :raises TimeoutError: If use_pvs is True and any of the PVs could not be read.
+        """
 
-        self.coordsys.set_motor_positions(t_motor, x_motor, y_motor, z_motor, fine_x_motor, fine_y_motor)
+        if use_pvs:
+            x_motor, y_motor, z_motor, t_motor, fine_x_motor, fine_y_motor = _check_pv_values(
+                self.coordsys.get_motor_pv_positions(), self.coordsys.get_pv_names(self.coordsys.motor_pvs))
+        else:
+            x_motor = x
+            y_motor = y
+            z_motor = z
+            fine_x_motor = fine_x
+            fine_y_motor = fine_y
 
-        x_axis = -(x_drive * cosine_factor) + (z_drive * sine_factor) - xo_offset + \
-                 (xa_offset * cosine_factor) + (za_offset * sine_factor)
+        t_motor = angle
 
-        y_axis = -yo_offset - y_drive + ya_offset
+        axes, drives = motors_to_axes(self.get_calibration(), t_motor, x_motor, y_motor, z_motor, fine_x_motor,
+                                      fine_y_motor, use_offsets, self.matrix_cache)
+        x_axis, y_axis, z_axis, t_axis, fine_x_axis, fine_y_axis = axes[0].tolist()
+        x_drive, y_drive, z_drive, t_drive, fine_x_drive, fine_y_drive = drives[0].tolist()
 
-        z_axis = -(fine_x_drive * sine_factor) - (z_drive * cosine_factor) - zo_offset + \
-                 (xa_offset * sine_factor) + (za_offset * cosine_factor)
+        self.coordsys.set_motor_positions(t_motor, x_motor, y_motor, z_motor, fine_x_motor, fine_y_motor)
+        self.coordsys.set_drive_positions(t_drive, x_drive, y_drive, z_drive, fine_x_drive, fine_y_drive)
+        self.coordsys.set_axis_positions(t_axis, x_axis, y_axis, z_axis, fine_x_axis, fine_y_axis)
 
-        t_axis = t_drive
+        return
 
-        fine_x_axis = -(fine_x_drive * cosine_factor) + (z_drive * sine_factor) - xo_offset +\
-                      (xa_offset * cosine_factor) + (za_offset * sine_factor)
+    def transform_motors_array(self, angle, x=None, y=None, z=None, fine_x=None, fine_y=None, use_offsets=True):
+        """
+        This method is the batch version of transform_motors().  It takes arrays of motor
+        positions, converts them to drive positions and then to axis positions for every
+        point in one vectorized pass.  The offset and scale PVs are read once per call
+        and the state of the coordinate system is not changed.
+
+        The points may be given either as six equal length arrays, or as a single
+        (N, 6) array whose columns are (angle, x, y, z, fine_x, fine_y).
+
+        :param angle: The position values of the rotation motor, or an (N, 6) array of points.
+        :type angle: array_like
+        :param x: The position values of the coarse X motor.
+        :type x: array_like
+        :param y: The position values of the coarse Y motor.
+        :type y: array_like
+        :param z: The position values of the Z motor.
+        :type z: array_like
+        :param fine_x: The position values of the fine X motor.
+        :type fine_x: array_like
+        :param fine_y: The position values of the fine Y motor.
+        :type fine_y: array_like
+        :param use_offsets: Use offsets in the calculation of motor values.
+        :type use_offsets: bool
+        :return: Two (N, 6) arrays of axis and drive positions.  The columns are in the
+                 same order as get_axis_positions(): (x, y, z, t, fine_x, fine_y).
+        """
 
-        fine_y_axis = -yo_offset - fine_y_drive + ya_offset
+        return motors_to_axes(self.get_calibration(), angle, x, y, z, fine_x, fine_y, use_offsets,
+                              self.matrix_cache)
 
-        self.coordsys.set_axis_positions(t_axis, x_axis, y_axis, z_axis, fine_x_axis, fine_y_axis)
+    def drive_trajectory(self, point, profile, sample_period, chunk_size=4096, use_offsets=True):
+        """
+        Generate drive setpoints for a continuous rotation, see Trajectory.drive_trajectory().
+        The calibration is read once when the generator is created.
 
-        return
+        :return: A generator of Trajectory.TrajectoryChunk
+        """
 
-    def transform_motors(self, angle=0, x=0, y=0, z=0, fine_x=0, use_offsets=True):
+        from Trajectory import drive_trajectory
 
-        return
+        return drive_trajectory(self.get_calibration(), point, profile, sample_period, chunk_size, use_offsets)
 
     def get_axis_positions(self):
         """
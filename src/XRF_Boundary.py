@@ -40,15 +40,23 @@ POSSIBILITY OF SUCH DAMAGE.
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtGui
 import os
+from collections import OrderedDict
 import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from pylab import *
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import pyqtSignal, QTimer
 from PyQt5.QtWidgets import *
+from ScanIndex import index_scans, ScanFileList
+from ProjectionBounds import profile_bounds, coefficient_sweep, interpolate_edges, sinusoid_edges, union_bounds
+from ProjectionStore import load_projections
+from ProfileCache import profile_cache
+from RoiViews import RoiGrid, RoiMosaic
 class XRFBoundary(QWidget):
     roiChangedSig = pyqtSignal(list, name = "roiChangedSig" )
+    #  The indices of the rows of the boundaries that changed, and the new rows.
+    roiRowsChangedSig = pyqtSignal(list, list, name = "roiRowsChangedSig" )
     def __init__(self):
         super(XRFBoundary, self).__init__()
 
@@ -57,21 +65,63 @@ class XRFBoundary(QWidget):
         self.file_names = {}
         self.theta = []             #  A list of rotation stage positions from the scan.
         self.hdf_files = []         #  A list of hdf5 files that make up the scan data.
+        self.scan_index = []        #  A list of ScanIndex.ScanRecord sorted by theta.
         self.element = None
         self.element_index = 0
         self.element_list = []
         self.bounds = {}
+        self.bounds_sweep = None    #  The bounds of every coefficient from 0 to 100, see calc_bounds_sweep().
+        self.bounds_cache = OrderedDict()   #  Recent values of bounds_sweep by element.
         self.bounds_positions = []
         self.coarse_positions = []
-        self.projections = []
+        self._projections = None
+
+        #  The settings of the last call to interpolate_bounds(), reused to update rows.
+        self.dtheta = None
+        self.fine_angles = np.zeros(0)
+        self.period = None
+        self.model = 'linear'
+        #  The rows of bounds_positions before offset_bounds(), and its offsets.
+        self.fine_positions = []
+        self.position_offsets = (0, 0, 0, 0, 0)
+        self.fine_scan_angles = None
+
+        #  The settings of the last boundary search and the offsets of offset_ROI_bounds(),
+        #  reused to find the boundaries of files added by add_records().
+        self.bounds_settings = None
+        self.coefficient = None
+        self.roi_offsets = None
+        #  The pixels that offset_ROI_bounds() added to each side of the ROIs in self.bounds.  The
+        #  fine scans are interpolated from the boundaries without them, see get_unshifted_bounds().
+        self.roi_shifts = (0, 0, 0, 0)
+
+        #  ROI edits are collected and the boundaries updated once the edits stop.
+        self.pending_rois = set()
+        self.roi_timer = QTimer()
+        self.roi_timer.setSingleShot(True)
+        self.roi_timer.setInterval(150)
+        self.roi_timer.timeout.connect(self.emit_roi_changes)
 
         return
 
+    @property
+    def projections(self):
+        """
+        The stack of projections of the current element, in the sorted order of self.theta.
+        It is only loaded when images are shown, calc_xy_bounds() needs just the profiles.
+        """
+
+        if self._projections is None and self.scan_index:
+            self._projections = load_projections(self.scan_index, self.element_index)
+
+        return self._projections
+
     #  Searches for path, files, and projection angles.
     def open_files(self, path, files, stage_pv):
         """
         This function will iterate over all .hd5 files in the supplied path and will create three lists.
-        These lists are of those same file names, h5py file objects, and sample rotation stage angles.
+        These lists are of those same file names, h5py file objects, and sample rotation stage angles,
+        all sorted by the rotation stage angle.
 
         :param path:     A string that contains the full path to the files of interest.
         :type  path:     str
@@ -82,40 +132,129 @@ class XRFBoundary(QWidget):
         :return:
         """
 
-        #  Create a list of files in the given directory
+        #  Only the .h5 files are scan data.
+        full_paths = [os.path.join(path, file) for file in files if file.endswith('.h5')]
+
+        #  Read the rotation stage angle and data shape of every file in parallel.
+        #  The index is sorted by angle, and the files are opened again only when
+        #  their data is used.
+        scan_index = index_scans(full_paths, stage_pv)
+
+        self.set_scan_index(scan_index)
+        return
+
+    def add_files(self, paths, stage_pv):
+        """
+        This function adds new scan files to the files opened by open_files(), keeping every list
+        sorted by the rotation stage angle.  Only the new files are read.
+
+        :param paths:    The full paths to the new files.
+        :type  paths:    list
+        :param stage_pv: The EPICS PV that is associated with the rotation stage.
+        :type  stage_pv: str
+        :return: The number of files that were added.
+        """
+
+        known_paths = set(record.path for record in self.scan_index)
+        new_paths = [path for path in paths if path.endswith('.h5') and path not in known_paths]
+
+        return self.add_records(index_scans(new_paths, stage_pv))
+
+    def add_records(self, records):
+        """
+        This function adds scan files that have already been indexed, e.g. by a ScanIndexThread,
+        keeping every list sorted by the rotation stage angle.  If boundaries were found, those of
+        the files that were already open are kept, including ROIs edited by the user, and the new
+        files get boundaries with the same settings.  If fine scans were built, only the rows that
+        depend on the new files, or whose angles are new, are calculated again.
+
+        :param records: The new files.
+        :type  records: list of ScanIndex.ScanRecord
+        :return: The number of files that were added.
+        """
+
+        known_paths = set(record.path for record in self.scan_index)
+        records = [record for record in records if record.path not in known_paths]
+        if not records:
+            return 0
+
+        has_bounds = self.bounds_settings is not None and len(self.bounds.get(0, ())) == len(self.scan_index)
+        if has_bounds:
+            unshifted = self.get_unshifted_bounds()
+            old_bounds = dict(zip(self.file_names[1], zip(*[unshifted[key] for key in range(4)])))
+        has_rows = has_bounds and len(self.fine_positions) > 0
+        if has_rows:
+            old_rows = dict(zip(self.fine_angles.tolist(), self.fine_positions))
+            #  ROI edits that have not been applied to the rows yet are applied with the new files.
+            edited_paths = set(self.file_names[1][i] for i in self.pending_rois)
+            self.pending_rois = set()
+
+        scan_index = sorted(list(self.scan_index) + records, key=lambda record: record.theta)
+        self.set_scan_index(scan_index)
+        if not has_bounds:
+            return len(records)
+
+        element_indices, bound_y, combine, weights = self.bounds_settings
+        if self.coefficient is not None and 0 <= self.coefficient <= 100:
+            self.calc_bounds_sweep(element_indices, bound_y, combine, weights)
+            self.select_coefficient(self.coefficient)
+        else:
+            self.calc_xy_bounds(self.coefficient, element_indices, bound_y, combine, weights)
+
+        added = []
+        for i, path in enumerate(self.file_names[1]):
+            if path in old_bounds:
+                for key in range(4):
+                    self.bounds[key][i] = old_bounds[path][key]
+            else:
+                added.append(i)
+        #  Shift every ROI again, the pixel size depends on the first scan, which may be new.
+        if self.roi_offsets is not None:
+            self.offset_ROI_bounds(*self.roi_offsets)
+
+        if not has_rows:
+            return len(records)
+
+        #  Keep the rows whose angle was already scanned and does not depend on the new files.
+        self.fine_angles = self.get_fine_angles(self.dtheta, self.fine_scan_angles, self.period)
+        edited = [i for i, path in enumerate(self.file_names[1]) if path in edited_paths]
+        affected = set(self.get_affected_rows(added + edited).tolist())
+        calc = [i for i, angle in enumerate(self.fine_angles.tolist()) if i in affected or angle not in old_rows]
+        new_rows = self.calc_fine_positions(self.fine_angles[calc]) if calc else []
+        self.fine_positions = [old_rows.get(angle) for angle in self.fine_angles.tolist()]
+        for i, new_row in zip(calc, new_rows):
+            self.fine_positions[i] = new_row
+        self.bounds_positions = [self.offset_row(i) for i in range(len(self.fine_positions))]
+
+        return len(records)
+
+    def set_scan_index(self, scan_index):
+        """
+        This function sets the files of the scan from a list of ScanIndex.ScanRecord sorted by theta,
+        and calculates the profiles of any file that is not already in the profile cache.
+
+        :param scan_index: The scan files.
+        :type  scan_index: list
+        :return:
+        """
+
+        if isinstance(self.hdf_files, ScanFileList):
+            self.hdf_files.close()
+
         file_names = {}
-        file_names[0], file_names[1], theta_array, hdf_files = [], [], [], []
-
-        #  Encode the stage_pv value into binary format.
-        byte_stage_pv = stage_pv.encode('ascii')
-
-        #  Iterate through each file in the list
-        for file in files:
-            #  If the file has the extension .h5, add the file name to a list and add
-            #  the file name with full path to another list.
-            if file.endswith('.h5'):
-                full_path = os.path.join(path, file)
-                file_names[0].append(file)
-                file_names[1].append(full_path)
-                #  Create a File object for each file, make it read only.
-                temp_file = h5py.File(full_path, 'r')
-                hdf_files.append(temp_file)
-                #  Search for the angle of the sample stage for this data set.
-                #  Add that value to an array.
-                data_set = temp_file['MAPS']['extra_pvs']
-                pv_index = np.where(data_set[0]==byte_stage_pv)
-                if len(pv_index[0]) > 0:
-                    theta = float(data_set[1][pv_index[0][0]])
-                    theta_array = np.append(theta_array, theta)
-
-        sortedindx = np.argsort(theta_array)
-        theta = theta_array[sortedindx]
-        file_names[0] = np.array(file_names[0])[sortedindx]
-        file_names[1] = np.array(file_names[1])[sortedindx]
+        file_names[0] = np.array([os.path.basename(record.path) for record in scan_index])
+        file_names[1] = np.array([record.path for record in scan_index])
 
+        self.scan_index = scan_index
         self.file_names = file_names
-        self.theta = theta
-        self.hdf_files = hdf_files
+        self.theta = np.array([record.theta for record in scan_index])
+        self.hdf_files = ScanFileList(file_names[1])
+        self._projections = None
+        self.bounds_sweep = None
+        self.bounds_cache = OrderedDict()
+
+        #  Calculate, or load from the cache, the column and row profiles of every element.
+        profile_cache.build(file_names[1])
         return
 
     def create_element_list(self):
@@ -125,7 +264,10 @@ class XRFBoundary(QWidget):
         :return:
         """
         self.element_list = []
-        if self.hdf_files:
+        if self.scan_index:
+            #  The channel names were read, or taken from the metadata cache, by open_files().
+            self.element_list = list(self.scan_index[0].channels)
+        elif self.hdf_files:
             elem_list = list(self.hdf_files[0]['MAPS']['channel_names'][:])
             for elem in elem_list:
                 self.element_list.append(elem.decode('ascii'))
@@ -153,6 +295,9 @@ class XRFBoundary(QWidget):
         :return:
         """
 
+        if self.scan_index:
+            return list(self.scan_index[0].channels).index(element)
+
         elem_list = list(self.hdf_files[0]['MAPS']['channel_names'][:])
         elem_index = elem_list.index(element.encode('ascii'))
 
@@ -185,7 +330,59 @@ class XRFBoundary(QWidget):
         """
         return self.bounds_positions
 
-    def calc_xy_bounds(self, coefficient, element_index, bound_y = True):
+    def set_elements(self, element_index):
+        """
+        This function sets the elements used to find boundaries.  The images shown with the
+        boundaries are those of the first element.
+
+        :param element_index: The index of an element, or a list of indices.
+        :type  element_index: int or list
+        :return: A tuple of element indices.
+        """
+
+        if isinstance(element_index, (int, np.integer)):
+            element_indices = (int(element_index),)
+        else:
+            element_indices = tuple(int(index) for index in element_index)
+
+        if element_indices[0] != self.element_index:
+            self.element_index = element_indices[0]
+            self._projections = None
+
+        return element_indices
+
+    def get_element_profiles(self, element_indices, weights = None):
+        """
+        This function returns the column and row profiles of a weighted sum of elements, which are
+        the profiles of the same weighted sum of their images.  By default each element is scaled
+        by its largest column value, so that every element counts the same.
+
+        :param element_indices:
+        :type  element_indices: tuple
+        :param weights: One weight per element, or None.
+        :type  weights: list
+        :return: A list of column means and a list of row means, one per scan file.
+        """
+
+        column_sums = None
+        row_sums = None
+        for i, element_index in enumerate(element_indices):
+            element_columns, element_rows = profile_cache.get(self.file_names[1], element_index)
+            if weights is not None:
+                weight = weights[i]
+            else:
+                peak = max(columns.max() for columns in element_columns)
+                weight = 1.0 / peak if len(element_indices) > 1 and peak > 0 else 1.0
+            if column_sums is None:
+                column_sums = [weight * columns for columns in element_columns]
+                row_sums = [weight * rows for rows in element_rows]
+            else:
+                column_sums = [total + weight * columns for total, columns in zip(column_sums, element_columns)]
+                row_sums = [total + weight * rows for total, rows in zip(row_sums, element_rows)]
+
+        return column_sums, row_sums
+
+    def calc_xy_bounds(self, coefficient, element_index, bound_y = True, combine = 'sum', weights = None):
 
         """
         This function will find the outer boundaries of the sample in each of the scan files that are selected by the
@@ -193,114 +390,90 @@ class XRFBoundary(QWidget):
 
         :param coefficient: 
         :type  coefficient: int
-        :param element_index:
-        :type  element_index: int
+        :param element_index: The index of an element, or a list of indices to combine.
+        :type  element_index: int or list
+        :param combine: 'sum' to find the boundaries of the weighted sum of the elements, 'union' to find
+                        boundaries that contain the boundaries of every element.
+        :type  combine: str
+        :param weights: The weight of each element for combine='sum', see get_element_profiles().
+        :type  weights: list
         :return:
         """
 
-        bounds = {}
-        theta_array_length = len(self.theta)
-        bounds[0] = np.zeros(theta_array_length)  #  x left edge
-        bounds[1] = np.zeros(theta_array_length)  #  x right edge
-        bounds[2] = np.zeros(theta_array_length)  #  y top edge
-        bounds[3] = np.zeros(theta_array_length)  #  y bottom edge
-
-        #  Creates a 2D array of dimension (number of lines) x (number of pixels)
-        tmp = self.hdf_files[0]["MAPS"]["XRF_roi"][element_index]
-        dim_x = len(tmp[0])
-        dim_y = len(tmp)
-
-        count = 0
-        self.projections = []
-        self.bounds = []
-        #  This block loops once for each scan angle.
-        #  The loops counts over an array of indices that represent the
-        #  self.theta list in sorted order by angle.
-        for i in range(len(self.theta)):
-            count += 1
-            #  Replace all values of NaN with a zero.
-            projection = np.nan_to_num(self.hdf_files[i]["MAPS"]["XRF_roi"][element_index])
-            self.projections.append(projection)
-            #  Create two arrays of the x and y positions from the scan.
-            x_positions = self.hdf_files[i]["MAPS"]["x_axis"][:]
-            y_positions = self.hdf_files[i]["MAPS"]["y_axis"][:]
-
-            #  Calculate background noise/coeff, edges, width, and center
-            #  Create an array where each element is a sum of a column in the scan data.
-            #  It will be a 1D array of size equal to the number of columns.
-            column_sums = np.sum(projection, axis=0) / dim_y
-            #  Create an array where each element is a sum of a row in the scan data.
-            #  It will be a 1D array of size equal to the number of rows.
-            row_sums = np.sum(projection, axis=1) / dim_x
-            #  Find the mean of the first two elements of the sum of columns.
-            smallest_column_sum = np.sort(column_sums[column_sums>0])[:1]
-            #  Find the mean of the first two elements of the sum of columns.
-            smallest_row_sum = np.sort(row_sums[row_sums>0])[:1]
-
-            # set the noise level equal to the smallest of column_sums or row_sums
-            if smallest_column_sum <= smallest_row_sum:
-                noise = smallest_column_sum
-            else:
-                noise = smallest_row_sum
-                
-            scale_factor = coefficient / 100
-
-            #  Find the largest value in column_sum
-            largest_column_sum = np.sort(column_sums)[::-1][:1]
-            #  difference between largest_column_sum and noise
-            diff_col = largest_column_sum - noise
-            #  set vertical boundary threshold equal to the noise plus a fraction of diff_col
-            thresh_col = diff_col * scale_factor + noise
-
-            #  Find the largest value in row_sum
-            largest_row_sum = np.sort(row_sums)[::-1][:1]
-            # difference between largest_row_sum and noise
-            diff_row = largest_row_sum - noise
-            #  set horizontal boundary threshold equal to the noise plus a fraction of diff_row
-            thresh_row = diff_row * scale_factor + noise
-
-            left_boundary = 0
-            right_boundary = 0
-            top_boundary = 0
-            bottom_boundary = 0
-
-            #  Find left edge of the image.
-            for j in range(len(column_sums)):
-
-                if column_sums[j] > thresh_col:
-                    left_boundary = j
-                    #  Save the column index for the left boundary of the image.
-                    bounds[0][i] = left_boundary
-                    break
-            #  Find right edge image.
-            for k in range(len(column_sums)):
-                if column_sums[len(column_sums) - k - 1] > thresh_col:
-                    right_boundary = len(column_sums) - k - 1
-                    #  Save the column index of the right boundary of the image.
-                    bounds[1][i] = right_boundary
-                    break
-            #  Find top edge of the image.
-            if bound_y:
-                for l in range(len(row_sums)):
-                    if row_sums[l] > thresh_row:
-                        top_boundary = l
-                        bounds[2][i] = top_boundary
-                        break
-            #  Find bottom edge of the image.
-                for m in range(len(row_sums)):
-                    if row_sums[len(row_sums) - m - 1] > thresh_row:
-                        bottom_boundary = len(row_sums) - m - 1
-                        bounds[3][i] = bottom_boundary
-                        break
+        element_indices = self.set_elements(element_index)
+        self.bounds_settings = (element_indices, bound_y, combine, weights)
+        self.coefficient = coefficient
+        self.roi_shifts = (0, 0, 0, 0)
+
+        #  Find the edges of every projection at once from the cached mean of each column
+        #  and row, so the projections themselves are not read.
+        if combine == 'sum':
+            column_sums, row_sums = self.get_element_profiles(element_indices, weights)
+            self.bounds = profile_bounds(column_sums, row_sums, coefficient, bound_y)
+        elif combine == 'union':
+            #  Edges that an element does not have are NaN, so they do not move the union.
+            self.bounds = union_bounds([profile_bounds(*profile_cache.get(self.file_names[1], index),
+                                                       coefficient=coefficient, bound_y=bound_y, missing=np.nan)
+                                        for index in element_indices])
+        else:
+            raise ValueError('Unknown element combination {}'.format(combine))
+        return
+
+    def calc_bounds_sweep(self, element_index, bound_y = True, combine = 'sum', weights = None):
+        """
+        This function finds the boundaries of the sample in each scan for every integer
+        coefficient from 0 to 100 at once, so that select_coefficient() can change the
+        coefficient without recalculating anything.  The boundaries of each element, or
+        combination of elements, are kept until other files are opened, so switching
+        back to an element is immediate.
+
+        :param element_index: The index of an element, or a list of indices to combine.
+        :type  element_index: int or list
+        :param bound_y:
+        :type  bound_y: bool
+        :param combine: 'sum' or 'union', see calc_xy_bounds().
+        :type  combine: str
+        :param weights: The weight of each element for combine='sum'.
+        :type  weights: list
+        :return:
+        """
+
+        element_indices = self.set_elements(element_index)
+        self.bounds_settings = (element_indices, bound_y, combine, weights)
+        key = (element_indices, bool(bound_y), combine, None if weights is None else tuple(weights))
+
+        bounds_sweep = self.bounds_cache.pop(key, None)
+        if bounds_sweep is None:
+            if combine == 'sum':
+                column_sums, row_sums = self.get_element_profiles(element_indices, weights)
+                bounds_sweep = coefficient_sweep(column_sums, row_sums, bound_y)
+            elif combine == 'union':
+                bounds_sweep = union_bounds([coefficient_sweep(*profile_cache.get(self.file_names[1], index),
+                                                               bound_y=bound_y, missing=np.nan)
+                                             for index in element_indices])
             else:
-                for l in range(len(row_sums)):
-                    top_boundary = 0
-                    bounds[2][i] = top_boundary
-                for m in range(len(row_sums)):
-                    bottom_boundary = len(row_sums)-1
-                    bounds[3][i] = bottom_boundary
-
-        self.bounds = bounds
+                raise ValueError('Unknown element combination {}'.format(combine))
+
+        #  Keep the most recently used boundaries last, and only a few of them.
+        self.bounds_cache[key] = bounds_sweep
+        while len(self.bounds_cache) > 16:
+            self.bounds_cache.popitem(last=False)
+
+        self.bounds_sweep = bounds_sweep
+        return
+
+    def select_coefficient(self, coefficient):
+        """
+        This function sets the boundaries to those found by calc_bounds_sweep() for one coefficient.
+
+        :param coefficient: An integer from 0 to 100.
+        :type  coefficient: int
+        :return:
+        """
+
+        self.coefficient = coefficient
+        self.roi_shifts = (0, 0, 0, 0)
+        self.bounds = {key: edges[coefficient].copy() for key, edges in self.bounds_sweep.items()}
         return
 
     def calc_coarse_bounds(self):
@@ -311,15 +484,16 @@ class XRFBoundary(QWidget):
         """
         x_positions = self.hdf_files[0]["MAPS"]["x_axis"][:]
         y_positions = self.hdf_files[0]["MAPS"]["y_axis"][:]
+        bounds = self.get_unshifted_bounds()
         self.coarse_positions = []
         for i in range(len(self.theta)):
 
-            x_left = round(x_positions[int(self.bounds[0][i])], 5)
-            x_right = round(x_positions[int(self.bounds[1][i])], 5)
+            x_left = round(x_positions[int(bounds[0][i])], 5)
+            x_right = round(x_positions[int(bounds[1][i])], 5)
             x_center = round((x_right + x_left) / 2, 5)
             x_width = round(x_right - x_left, 5)
-            y_top = round(y_positions[int(self.bounds[2][i])], 5)
-            y_bottom = round(y_positions[int(self.bounds[3][i])], 5)
+            y_top = round(y_positions[int(bounds[2][i])], 5)
+            y_bottom = round(y_positions[int(bounds[3][i])], 5)
             y_center = round((y_top + y_bottom) / 2, 5)
             y_width = round(y_bottom - y_top, 5)
             x_pos_temp = list([self.theta[i], x_center, x_width, y_center, y_width])
@@ -327,124 +501,203 @@ class XRFBoundary(QWidget):
 
         return self.coarse_positions
 
-    def interpolate_bounds(self, dtheta):
+    def interpolate_bounds(self, dtheta=None, angles=None, period=None, model='linear'):
         '''
         This function interpolates boundary parameters for fine scans from coarse
-        scan boundary information. It selects parameters from a lookup table regardless
-        of whether or not the sampeld values were original or interpolated values.
+        scan boundary information.  The edges are interpolated linearly between the
+        neighbouring coarse scan angles, for any angle increment or list of angles,
+        or with model='sinusoid' are taken from a sinusoidal model of the rotating
+        sample that is fit to every coarse scan.
 
         :param dtheta: Incremental angle value between tomography scans
         :type  dtheta: float
+        :param angles: The angles of the tomography scans, used instead of dtheta, e.g.
+                       a golden angle or irregular schedule.
+        :type  angles: list of floats
+        :param period: The period of the rotation, e.g. 360, to interpolate across the
+                       last and first coarse scan angles.  With dtheta, the fine scans
+                       then cover one period from the first coarse scan angle.  None to
+                       not wrap around.
+        :type  period: float
+        :param model:  'linear' or 'sinusoid'.
+        :type  model:  str
 
         :return:
         '''
+        if model not in ('linear', 'sinusoid'):
+            raise ValueError('Unknown boundary model {}'.format(model))
+
         self.dtheta = dtheta
-        theta_coarse = self.theta
-        ExFine = np.round(np.arange(self.theta[0],self.theta[-1]+0.1,0.1),2)
-        fine = np.arange(self.theta[0],self.theta[-1], dtheta)
-        fine = np.round(fine, 2)
-        num_projections = len(fine)
-        num_exFine = len(ExFine)
+        fine = self.get_fine_angles(dtheta, angles, period)
+        self.fine_angles = fine
+        self.fine_scan_angles = angles
+        self.period = period
+        self.model = model
+
+        self.bounds_positions = self.calc_fine_positions(fine)
+        #  The rows before offset_bounds(), and no offsets until it is called.
+        self.fine_positions = [list(row) for row in self.bounds_positions]
+        self.position_offsets = (0, 0, 0, 0, 0)
+
+        return self.bounds_positions
+
+    def get_fine_angles(self, dtheta=None, angles=None, period=None):
+        '''
+        This function returns the fine scan angles of interpolate_bounds() for the current coarse scans.
+
+        :return: An array of angles.
+        '''
+
+        if angles is not None:
+            return np.asarray(angles, dtype=float)
+        if period is not None:
+            return np.round(np.arange(self.theta[0], self.theta[0] + period, dtheta), 2)
+        return np.round(np.arange(self.theta[0], self.theta[-1], dtheta), 2)
+
+    def calc_fine_positions(self, fine):
+        '''
+        This function calculates the rows of boundary parameters of a list of fine scan angles,
+        with the settings of the last call to interpolate_bounds().
+
+        :param fine: The fine scan angles.
+        :type  fine: numpy.ndarray
+
+        :return: A list of [angle, x center, x width, y center, y width] lists.
+        '''
 
-        self.bounds_positions = []
         x_positions = self.hdf_files[0]["MAPS"]["x_axis"][:]
         y_positions = self.hdf_files[0]["MAPS"]["y_axis"][:]
 
-        # thes are the interpolated edges at 0.1 degree increments, they will serve as a lookup table.
-        left_edge = np.zeros(num_exFine)  #  x left edge
-        right_edge = np.zeros(num_exFine)  #  x right edge
-        top_edge = np.zeros(num_exFine)  #  y top edge
-        bottom_edge = np.zeros(num_exFine)  #  y bottom edge
+        #  The left, right, top and bottom edges of each coarse scan in position units.  The
+        #  offsets are added to the rows by offset_bounds(), not taken from the shifted ROIs.
+        bounds = self.get_unshifted_bounds()
+        coarse_edges = np.column_stack([x_positions[bounds[0].astype(int)],
+                                        x_positions[bounds[1].astype(int)],
+                                        y_positions[bounds[2].astype(int)],
+                                        y_positions[bounds[3].astype(int)]])
+        if self.model == 'sinusoid':
+            fine_edges = sinusoid_edges(self.theta, coarse_edges, fine)
+        else:
+            fine_edges = interpolate_edges(self.theta, coarse_edges, fine, self.period)
+        left_edge, right_edge, top_edge, bottom_edge = fine_edges.T
 
-        # these are the interpolated edges at the user defined angle increments.
-        left_edge2 = np.zeros(num_projections)  #  x left edge
-        right_edge2 = np.zeros(num_projections)  #  x right edge
-        top_edge2 = np.zeros(num_projections)  #  y top edge
-        bottom_edge2 = np.zeros(num_projections)  #  y bottom edge
+        x_center = (right_edge + left_edge)/2
+        x_width = right_edge - left_edge
+        y_center = (bottom_edge + top_edge)/2
+        y_width = bottom_edge - top_edge
 
-        angle_index = []
+        return [list(row) for row in zip(fine, x_center, x_width, y_center, y_width)]
 
-        # pupulates scan_parameters with non-interpolated values
-        for i in range(len(self.theta)):
-            temp_index = int(np.where(ExFine == self.theta[i])[0])
-            angle_index.append(temp_index)
-            left_edge[temp_index] = x_positions[int(self.bounds[0][i])]
-            right_edge[temp_index] = x_positions[int(self.bounds[1][i])]
-            top_edge[temp_index] = y_positions[int(self.bounds[2][i])]
-            bottom_edge[temp_index] = y_positions[int(self.bounds[3][i])]
-
-        for i in range(num_exFine):
-            if i>0 and i in angle_index:
-                # calculates incremental boundary shift in position units between adjacent coarse scans.
-                temp_index = int(np.where(np.array(angle_index) == i)[0][0])
-                frame_difference = angle_index[temp_index] - angle_index[temp_index-1]
-
-                diffx1 = (left_edge[i]-left_edge[angle_index[temp_index-1]])/frame_difference
-                diffx2 = (right_edge[i]-right_edge[angle_index[temp_index-1]])/frame_difference
-                diffy1 = (top_edge[i]-top_edge[angle_index[temp_index-1]])/frame_difference
-                diffy2 = (bottom_edge[i]-bottom_edge[angle_index[temp_index-1]])/frame_difference
-
-                for j in range(1,frame_difference):
-                    # adds incremental boundary shift to frames in between coarse scans.
-                    indx = i - frame_difference + j
-                    left_edge[indx] = left_edge[i-frame_difference] + diffx1*j
-                    right_edge[indx] = right_edge[i-frame_difference] + diffx2*j
-                    top_edge[indx] = top_edge[i-frame_difference] + diffy1*j
-                    bottom_edge[indx] = bottom_edge[i-frame_difference] + diffy2*j
-
-        for i in range(num_projections):
-            idx = int(np.where(ExFine == fine[i])[0][0])
-            left_edge2[i] = left_edge[idx]
-            right_edge2[i] = right_edge[idx]
-            top_edge2[i] = top_edge[idx]
-            bottom_edge2[i] = bottom_edge[idx]
-
-        for i in range(num_projections):
-            x_center = (right_edge2[i] + left_edge2[i])/2
-            x_width = right_edge2[i] - left_edge2[i]
-            y_center = (bottom_edge2[i] + top_edge2[i])/2
-            y_width = bottom_edge2[i] - top_edge2[i]
-            pos_temp = list([fine[i],x_center,x_width,y_center,y_width])
-            self.bounds_positions.append(pos_temp)
+    def get_affected_rows(self, coarse_indices):
+        '''
+        This function finds the fine scan rows that depend on the boundaries of some coarse scans.
+        With linear interpolation these are the fine angles between the neighbours of each coarse
+        scan, any other change affects every row.
 
-        return self.bounds_positions
+        :param coarse_indices: Indices into self.theta.
+        :type  coarse_indices: iterable of int
+
+        :return: An array of row indices.
+        '''
+
+        num_coarse = len(self.theta)
+        if self.model != 'linear' or self.period is not None:
+            return np.arange(len(self.fine_angles))
+
+        affected = np.zeros(len(self.fine_angles), dtype=bool)
+        for index in coarse_indices:
+            low = self.theta[index - 1] if index > 0 else -np.inf
+            high = self.theta[index + 1] if index < num_coarse - 1 else np.inf
+            affected |= (self.fine_angles > low) & (self.fine_angles < high)
+
+        return np.nonzero(affected)[0]
 
     def offset_bounds(self, angle_offset, left_offset, right_offset, top_offset, bottom_offset):
-        for i in range(1, len(self.bounds_positions)):
-            # [angle, xcenter, xwidth, ycenter, ywidth]
-            self.bounds_positions[i-1][0] += angle_offset
-            self.bounds_positions[i-1][1] += (self.bounds_positions[i][1] - self.bounds_positions[i-1][1])*angle_offset + (right_offset - left_offset)
-            self.bounds_positions[i-1][2] += (self.bounds_positions[i][2] - self.bounds_positions[i-1][2])*angle_offset + (right_offset + left_offset)
-            self.bounds_positions[i-1][3] += (self.bounds_positions[i][3] - self.bounds_positions[i-1][3])*angle_offset + (top_offset - bottom_offset)
-            self.bounds_positions[i-1][4] += (self.bounds_positions[i][4] - self.bounds_positions[i-1][4])*angle_offset + (top_offset + bottom_offset)
-        self.bounds_positions[-1][0] += angle_offset
-        self.bounds_positions[-1][1] += (self.bounds_positions[-1][1] - self.bounds_positions[-2][1])*angle_offset + (right_offset - left_offset)
-        self.bounds_positions[-1][2] += (self.bounds_positions[-1][2] - self.bounds_positions[-2][2])*angle_offset + (right_offset + left_offset)
-        self.bounds_positions[-1][3] += (self.bounds_positions[-1][3] - self.bounds_positions[-2][3])*angle_offset + (top_offset - bottom_offset)
-        self.bounds_positions[-1][4] += (self.bounds_positions[-1][4] - self.bounds_positions[-2][4])*angle_offset + (top_offset + bottom_offset)
-
-        for i in range(len(self.bounds_positions)):
-            self.bounds_positions[i][0] = round(self.bounds_positions[i][0], 4)
-            self.bounds_positions[i][1] = round(self.bounds_positions[i][1], 4)
-            self.bounds_positions[i][2] = round(self.bounds_positions[i][2], 4)
-            self.bounds_positions[i][3] = round(self.bounds_positions[i][3], 4)
-            self.bounds_positions[i][4] = round(self.bounds_positions[i][4], 4)
+        """
+        This function offsets the interpolated boundaries by the user offsets.  The offsets are
+        applied to the rows saved by interpolate_bounds(), so they are not applied twice, and are
+        kept so that rows recalculated after an ROI edit are offset the same way.
+        """
+
+        self.position_offsets = (angle_offset, left_offset, right_offset, top_offset, bottom_offset)
+        self.bounds_positions = [self.offset_row(i) for i in range(len(self.fine_positions))]
         return
 
+    def offset_row(self, i, rounded=True):
+        """
+        This function returns one row of boundaries with the offsets of the last call to offset_bounds().
+        The widths and centers are moved along the slope to the next row by the angle offset, and the
+        last row along the slope from the row before it.
+
+        :param i: The index of the row.
+        :type  i: int
+        :param rounded: Round the values to 4 decimal places.
+        :type  rounded: bool
+
+        :return: An [angle, x center, x width, y center, y width] list.
+        """
+
+        angle_offset, left_offset, right_offset, top_offset, bottom_offset = self.position_offsets
+        constants = (right_offset - left_offset, right_offset + left_offset, top_offset - bottom_offset,
+                     top_offset + bottom_offset)
+        row = self.fine_positions[i]
+
+        if i < len(self.fine_positions) - 1:
+            slopes = [self.fine_positions[i+1][k] - row[k] for k in range(1, 5)]
+        elif i > 0:
+            previous = self.offset_row(i - 1, rounded=False)
+            slopes = [row[k] - previous[k] for k in range(1, 5)]
+        else:
+            slopes = [0.0] * 4
+
+        new_row = [row[0] + angle_offset] + [row[k] + (slopes[k-1]*angle_offset + constants[k-1])
+                                             for k in range(1, 5)]
+        if rounded:
+            new_row = [round(value, 4) for value in new_row]
+        return new_row
+
     def offset_ROI_bounds(self, left_offset, right_offset, top_offset, bottom_offset):
+        """
+        This function widens the ROIs in self.bounds by the boundary offsets, so that the ROIs that are
+        shown include the offsets.  The shifts of an earlier call are removed first.
+        """
+
+        unshifted = self.get_unshifted_bounds()
+        for key in range(4):
+            self.bounds[key][:] = unshifted[key]
+        self.roi_shifts = (0, 0, 0, 0)
+
         coarse_bounds = self.calc_coarse_bounds()
-        x_pixel_size = round(coarse_bounds[0][2]/(self.projections[0].shape[1]-1), 4)
-        y_pixel_size = round(coarse_bounds[0][4]/(self.projections[0].shape[0]-1), 4)
+        num_rows, num_columns = self.scan_index[0].shape[1:]
+        x_pixel_size = round(coarse_bounds[0][2]/(num_columns-1), 4)
+        y_pixel_size = round(coarse_bounds[0][4]/(num_rows-1), 4)
+
+        self.roi_offsets = (left_offset, right_offset, top_offset, bottom_offset)
+        self.roi_shifts = (int(left_offset/x_pixel_size), int(right_offset/x_pixel_size),
+                           int(top_offset/y_pixel_size), int(bottom_offset/y_pixel_size))
 
+        left_shift, right_shift, top_shift, bottom_shift = self.roi_shifts
         for i in range(len(self.bounds[0])):
 
-            self.bounds[0][i] -= int(left_offset/x_pixel_size)
-            self.bounds[1][i] += int(right_offset/x_pixel_size)
-            self.bounds[2][i] -= int(top_offset/y_pixel_size)
-            self.bounds[3][i] += int(bottom_offset/y_pixel_size)
+            self.bounds[0][i] -= left_shift
+            self.bounds[1][i] += right_shift
+            self.bounds[2][i] -= top_shift
+            self.bounds[3][i] += bottom_shift
 
         return
 
+    def get_unshifted_bounds(self):
+        """
+        This function returns the boundaries in self.bounds without the shifts of offset_ROI_bounds().
+
+        :return: A dictionary of arrays of the left, right, top and bottom edges, keys 0 to 3.
+        """
+
+        left_shift, right_shift, top_shift, bottom_shift = self.roi_shifts
+
+        return {0: np.asarray(self.bounds[0]) + left_shift, 1: np.asarray(self.bounds[1]) - right_shift,
+                2: np.asarray(self.bounds[2]) + top_shift, 3: np.asarray(self.bounds[3]) - bottom_shift}
+
     def show_roi_box(self):
 
         """
@@ -485,90 +738,39 @@ class XRFBoundary(QWidget):
     def show_roi_box2(self):
         """
         Display images from scan data and add a box to indicate the sample boundaries found in calc_xy_bounds().
+        Only the images in view are drawn, so that the window opens quickly for any number of scans.
+
+        :return:
+        """
+
+        self.w = RoiGrid(self)
+        return self.w
+
+    def show_roi_mosaic(self):
+        """
+        Display downsampled images from all scans in one image, with the sample boundaries found in
+        calc_xy_bounds() drawn over them.  Clicking an image opens it at full resolution to adjust
+        its boundaries.
 
         :return:
         """
-        #open new window containing coasre scan projections. 
-        pg.setConfigOptions(imageAxisOrder='row-major')
-        # app = QtGui.QApplication([])
-        num_coarse_scans = len(self.theta)
-        proj_w = self.projections[0].shape[1]
-        proj_h = self.projections[0].shape[0]
-        sqrt_length = np.sqrt(num_coarse_scans)
-        cols = int(np.ceil(sqrt_length))
-        rows = int(np.ceil(sqrt_length))
-        xovery_scale = proj_h/proj_w
-
-        if proj_w >= proj_h:
-            ratio = proj_w//proj_h
-            cols -= 1
-            rows += 1
-            if ratio > 3:
-                ratio = 3
-            screen_w = 110*ratio*cols
-            screen_h = 110*rows
-
-        if proj_w <proj_h:
-            ratio = proj_h//proj_w
-            cols += 1
-            rows -= 1
-            if ratio > 3:
-                ratio = 3
-            screen_w = 110*proj_w
-            screen_h = 110*ratio*rows
-
-
-        self.w = pg.GraphicsWindow(size=(screen_w,screen_h), border=True)
-        self.w.setWindowTitle('Coarse scan ROIs')
-
-        # self.w.scene().sigMouseClicked.connect(self.get_window)
-
-
-        self.windowz = {}
-        views = {}
-        cntr = 0
-        theta = np.sort(self.theta)
-        self.box_width = list(np.array(self.bounds[1]) - np.array(self.bounds[0]))
-        self.box_height = list(np.array(self.bounds[3]) - np.array(self.bounds[2]))
-
-        for i in range(rows):
-            for j in range(cols):
-                if cntr == num_coarse_scans:
-                    break
-                else:
-                    projection = self.projections[cntr]
-                    self.windowz[cntr] = self.w.addLayout(row=i, col=j)
-                    views[cntr,0] = self.windowz[cntr].addLabel(str(cntr)+": "+ str(theta[cntr]), row=0, col=0)
-                    views[cntr,1] = self.windowz[cntr].addViewBox(row=1, col=0, lockAspect=True, enableMouse=False)
-                    views[cntr,1].setAspectLocked(lock=True, ratio=xovery_scale)
-                    img = pg.ImageItem(projection)
-                    # img.rotate(90)
-                    views[cntr,1].addItem(img)
-                    views[cntr,1].disableAutoRange('xy')
-                    views[cntr,1].autoRange()
-                    roi = pg.RectROI([self.bounds[0][cntr], self.bounds[2][cntr]], [self.box_width[cntr], self.box_height[cntr]], pen=pg.mkPen(width=4.5, color='r'), translateSnap=True, scaleSnap=True)
-                    ## handles scaling vertically from opposite edge
-                    roi.addScaleHandle([0.5, 0], [0.5, 1])
-                    roi.addScaleHandle([0.5, 1], [0.5, 0])
-                    ## handles scaling horizonatally from opposite edge
-                    roi.addScaleHandle([0, 0.5], [1, 0.5])
-                    roi.addScaleHandle([1, 0.5], [0, 0.5])
-                    ## handles scaling both vertically and horizontally
-                    roi.addScaleHandle([1, 1], [0, 0])
-                    roi.addScaleHandle([0, 0], [1, 1])
-                    roi.addScaleHandle([0, 1], [1, 0])
-                    roi.addScaleHandle([1, 0], [0, 1])
-                    roi.sigRegionChangeFinished.connect(self.update_roi)
-                    pg.mkPen(width=2)
-                    views[cntr,1].addItem(roi)
-                    cntr += 1
-
-        return self.w 
-        
-    def update_roi(self, roi):
-        self.current_x = self.w.scene().clickEvents[0].scenePos().x()
-        self.current_y = self.w.scene().clickEvents[0].scenePos().y()
-        self.indx = self.get_window(self.current_x, self.current_y)
+
+        self.w = RoiMosaic(self)
+        return self.w
+
+    def set_roi(self, index, roi):
+        '''
+        This function moves an ROI that was edited by the user back inside its projection and
+        saves it as the boundaries of that projection.  The fine scan boundaries are updated
+        once the edits stop.
+
+        :param index: The index of the projection in self.theta.
+        :type  index: int
+        :param roi:   The edited ROI.
+        :type  roi:   pyqtgraph.ROI
+
+        :return:
+        '''
 
         roi_left =roi.pos().x()
         roi_right = roi.pos().x() + roi.size().x()
@@ -576,28 +778,33 @@ class XRFBoundary(QWidget):
         roi_bottom = roi.pos().y()
 
         #check whether any of the ROI edges are out of bounds, if they are, set the ROI box
-        # edge to the edge boundary and update self.bounds accordingly.
-
-        max_x = self.projections[0].shape[1]
-        max_y = self.projections[0].shape[0]
+        # edge to the edge boundary and update self.bounds accordingly.  The ROIs may extend
+        # past the projection by the shifts of offset_ROI_bounds().
+
+        left_shift, right_shift, top_shift, bottom_shift = self.roi_shifts
+        max_y, max_x = self.scan_index[index].shape[1:]
+        min_x = -left_shift
+        min_y = -top_shift
+        max_x += right_shift
+        max_y += bottom_shift
         valid_flag = True
 
         ## if way far left or way far right
-        if ((roi_left <= 0 and roi_right<=0) or (roi_left >= max_x and roi_right>= max_x)):
+        if ((roi_left <= min_x and roi_right<=min_x) or (roi_left >= max_x and roi_right>= max_x)):
             print("case 1")
-            roi_left = 0
+            roi_left = min_x
             roi_right = max_x-1
             valid_flag = False
         ## if way far above or way far below.
-        if ((roi_top <= 0 and roi_bottom<=0) or (roi_top >= max_y and roi_bottom>=max_y)):
+        if ((roi_top <= min_y and roi_bottom<=min_y) or (roi_top >= max_y and roi_bottom>=max_y)):
             print("case 2")
             roi_top = max_y-1
-            roi_bottom = 0
+            roi_bottom = min_y
             valid_flag = False
         ## if partially left
-        if roi_left < 0:
+        if roi_left < min_x:
             print("case 3")
-            roi_left = 0
+            roi_left = min_x
             valid_flag = False
         ##if partially right
         if roi_right >= max_x:
@@ -610,9 +817,9 @@ class XRFBoundary(QWidget):
             roi_top = max_y-1
             valid_flag = False
         #if partially below
-        if roi_bottom < 0:
+        if roi_bottom < min_y:
             print("case 6")
-            roi_bottom = 0
+            roi_bottom = min_y
             valid_flag = False
 
         try:
@@ -622,29 +829,48 @@ class XRFBoundary(QWidget):
         except e:
             print(e)
 
-        self.bounds[0][self.indx] = roi_left
-        self.bounds[1][self.indx] = roi_right
-        self.bounds[2][self.indx] = roi_bottom
-        self.bounds[3][self.indx] = roi_top
+        self.bounds[0][index] = roi_left
+        self.bounds[1][index] = roi_right
+        self.bounds[2][index] = roi_bottom
+        self.bounds[3][index] = roi_top
 
-        new_bounds = self.interpolate_bounds(self.dtheta)
-        new_bounds = np.round(new_bounds,4).tolist()
-        self.roiChangedSig.emit(new_bounds)
-        return self.w
-
-    def get_window(self, x, y):
-        self.height = self.w.viewRect().height()
-        self.width = self.w.viewRect().width()
+        #  Wait for the edits to stop before updating the fine scan boundaries.
+        self.pending_rois.add(index)
+        self.roi_timer.start()
+        return
 
-        self.rows = len(self.w.ci.rows)
-        self.cols = len(self.w.ci.rows[0])
-        
-        self.grid_x_size = self.width/self.cols
-        self.grid_y_size = self.height/self.rows
+    def emit_roi_changes(self):
+        '''
+        This function recalculates the fine scan boundaries that depend on the ROIs edited
+        since the last call, and emits roiRowsChangedSig with only those rows, or
+        roiChangedSig if every row changed.
 
-        self.win_coord_x = x//self.grid_x_size
-        self.win_coord_y = y//self.grid_y_size
+        :return:
+        '''
 
-        #gettting index from coordinates:
-        indx = int(self.win_coord_y*self.cols+self.win_coord_x)
-        return indx
+        if not self.pending_rois:
+            return
+
+        rows = self.get_affected_rows(self.pending_rois)
+        self.pending_rois = set()
+        if len(rows) == 0:
+            return
+
+        new_rows = self.calc_fine_positions(self.fine_angles[rows])
+        for row, new_row in zip(rows, new_rows):
+            self.fine_positions[row] = new_row
+
+        #  An offset row also depends on the next row, and the last row on the row before it.
+        num_rows = len(self.fine_positions)
+        changed = set(rows.tolist()) | set(row - 1 for row in rows.tolist() if row > 0)
+        if num_rows - 2 in changed:
+            changed.add(num_rows - 1)
+        changed = sorted(changed)
+        for row in changed:
+            self.bounds_positions[row] = self.offset_row(row)
+
+        if len(changed) == num_rows:
+            self.roiChangedSig.emit(self.bounds_positions)
+        else:
+            self.roiRowsChangedSig.emit(changed, [self.bounds_positions[row] for row in changed])
+        return
@@ -0,0 +1,39 @@
+import os
+
+import h5py
+import numpy as np
+
+from ProfileCache import ProfileCache
+from ProjectionBounds import profile_bounds, projection_profiles
+
+
+def write_scan(path, cube):
+
+    with h5py.File(path, 'w') as hdf_file:
+        hdf_file.create_group('MAPS')['XRF_roi'] = cube
+
+    return path
+
+
+def test_get_mixed_shapes(tmp_path):
+
+    rng = np.random.default_rng(0)
+    cubes = [rng.uniform(0, 1, shape) for shape in [(2, 8, 12), (2, 10, 6), (2, 8, 12)]]
+    paths = [write_scan(str(tmp_path / 'scan_{}.h5'.format(i)), cube) for i, cube in enumerate(cubes)]
+    cache = ProfileCache(str(tmp_path / 'cache'))
+
+    column_sums, row_sums = cache.get(paths, 1)
+
+    assert [len(columns) for columns in column_sums] == [12, 6, 12]
+    assert [len(rows) for rows in row_sums] == [8, 10, 8]
+    expected = profile_bounds(*projection_profiles([cube[1] for cube in cubes]), 30)
+    bounds = profile_bounds(column_sums, row_sums, 30)
+    for key in range(4):
+        np.testing.assert_array_equal(bounds[key], expected[key])
+
+    #  A new cache finds the saved profiles without reading the files.
+    cache = ProfileCache(str(tmp_path / 'cache'))
+    for path, columns in zip(paths, column_sums):
+        cached = cache.lookup(path, os.stat(path))
+        assert cached is not None
+        np.testing.assert_allclose(cached[0][1], columns)
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+from ProjectionBounds import profile_bounds, coefficient_sweep, projection_profiles, union_bounds
+
+
+def loop_bounds(projections, coefficient, bound_y=True):
+    """
+    The boundary search of XRFBoundary.calc_xy_bounds() before it was vectorized, one
+    projection at a time, used as the reference for the vectorized search.
+    """
+
+    bounds = {key: np.zeros(len(projections)) for key in range(4)}
+
+    for i, projection in enumerate(projections):
+        projection = np.nan_to_num(projection)
+        dim_y, dim_x = projection.shape
+        column_sums = np.sum(projection, axis=0) / dim_y
+        row_sums = np.sum(projection, axis=1) / dim_x
+        smallest_column_sum = np.sort(column_sums[column_sums > 0])[:1]
+        smallest_row_sum = np.sort(row_sums[row_sums > 0])[:1]
+
+        if smallest_column_sum <= smallest_row_sum:
+            noise = smallest_column_sum
+        else:
+            noise = smallest_row_sum
+
+        scale_factor = coefficient / 100
+        thresh_col = (np.max(column_sums) - noise) * scale_factor + noise
+        thresh_row = (np.max(row_sums) - noise) * scale_factor + noise
+
+        for j in range(len(column_sums)):
+            if column_sums[j] > thresh_col:
+                bounds[0][i] = j
+                break
+        for k in range(len(column_sums)):
+            if column_sums[len(column_sums) - k - 1] > thresh_col:
+                bounds[1][i] = len(column_sums) - k - 1
+                break
+        if bound_y:
+            for l in range(len(row_sums)):
+                if row_sums[l] > thresh_row:
+                    bounds[2][i] = l
+                    break
+            for m in range(len(row_sums)):
+                if row_sums[len(row_sums) - m - 1] > thresh_row:
+                    bounds[3][i] = len(row_sums) - m - 1
+                    break
+        else:
+            bounds[2][i] = 0
+            bounds[3][i] = len(row_sums) - 1
+
+    return bounds
+
+
+def make_projections(shapes, seed=0):
+    """
+    Create projections of a bright blob on a noisy background, with some NaN pixels.
+    """
+
+    rng = np.random.default_rng(seed)
+    projections = []
+    for dim_y, dim_x in shapes:
+        y, x = np.mgrid[:dim_y, :dim_x]
+        center_y, center_x = rng.uniform(0.3, 0.7, 2) * (dim_y, dim_x)
+        radius = rng.uniform(0.1, 0.25) * min(dim_y, dim_x)
+        projection = 10 * np.exp(-((x - center_x) ** 2 + (y - center_y) ** 2) / (2 * radius ** 2))
+        projection += rng.uniform(0, 0.5, (dim_y, dim_x))
+        projection[rng.uniform(size=(dim_y, dim_x)) < 0.01] = np.nan
+        projections.append(projection)
+
+    return projections
+
+
+@pytest.mark.parametrize('bound_y', [True, False])
+@pytest.mark.parametrize('coefficient', [0, 5, 20, 50, 99])
+def test_profile_bounds_matches_loop(coefficient, bound_y):
+
+    projections = make_projections([(24, 32)] * 12)
+    bounds = profile_bounds(*projection_profiles(np.array(projections)), coefficient, bound_y)
+    expected = loop_bounds(projections, coefficient, bound_y)
+
+    for key in range(4):
+        np.testing.assert_array_equal(bounds[key], expected[key])
+
+
+@pytest.mark.parametrize('bound_y', [True, False])
+def test_coefficient_sweep_matches_loop(bound_y):
+
+    projections = make_projections([(24, 32)] * 12, seed=1)
+    sweep = coefficient_sweep(*projection_profiles(np.array(projections)), bound_y)
+
+    for coefficient in range(0, 101, 7):
+        expected = loop_bounds(projections, coefficient, bound_y)
+        for key in range(4):
+            np.testing.assert_array_equal(sweep[key][coefficient], expected[key])
+
+
+def test_mixed_shapes_match_loop():
+
+    projections = make_projections([(24, 32), (16, 40), (24, 32), (30, 20), (16, 40)], seed=2)
+    column_sums, row_sums = projection_profiles(projections)
+    bounds = profile_bounds(column_sums, row_sums, 20)
+    sweep = coefficient_sweep(column_sums, row_sums)
+    expected = loop_bounds(projections, 20)
+
+    for key in range(4):
+        np.testing.assert_array_equal(bounds[key], expected[key])
+        np.testing.assert_array_equal(sweep[key][20], expected[key])
+
+
+def test_union_ignores_elements_without_edges():
+
+    projections = make_projections([(24, 32)] * 6, seed=3)
+    #  A second element with no signal in half of the projections.
+    weak = [projection if i % 2 else np.zeros_like(projection)
+            for i, projection in enumerate(make_projections([(24, 32)] * 6, seed=4))]
+    profiles = [projection_profiles(np.array(projections)), projection_profiles(np.array(weak))]
+
+    bounds = union_bounds([profile_bounds(*element, 20, missing=np.nan) for element in profiles])
+    sweep = union_bounds([coefficient_sweep(*element, missing=np.nan) for element in profiles])
+    strong = loop_bounds(projections, 20)
+    #  The loop can not search a projection without signal.
+    weak_bounds = loop_bounds(weak[1::2], 20)
+
+    for key in range(4):
+        outer = np.minimum if key in (0, 2) else np.maximum
+        expected = strong[key].copy()
+        expected[1::2] = outer(strong[key][1::2], weak_bounds[key])
+        np.testing.assert_array_equal(bounds[key], expected)
+        np.testing.assert_array_equal(sweep[key][20], expected)
+
+    #  Without an edge in any element the edge is the missing value.
+    empty = projection_profiles(np.zeros((2, 24, 32)))
+    bounds = union_bounds([profile_bounds(*empty, 20, missing=np.nan)] * 2)
+    for key in range(4):
+        np.testing.assert_array_equal(bounds[key], np.zeros(2))
@@ -0,0 +1,229 @@
+from math import cos, sin, pi
+
+import numpy as np
+import pytest
+
+import PVBackend
+from CS import CalibrationSnapshot
+from Transform import (XZT_Transform, MatrixCache, axes_to_drives, drives_to_axes, motors_to_axes,
+                       drives_to_motors_matrix, motors_to_drives_matrix, apply_matrices)
+
+ORIGIN_OFFSETS = (0.4, -0.3, 1.2)
+OPTICAL_OFFSETS = (-0.7, 0.25, 0.9)
+OFFSETS = (0.05, -0.02, 0.3, 1.5, -0.01, 0.04)
+SCALES = (1.5, -2.0, 0.5, 1.25, 0.8, -1.1)
+
+
+def baseline_axes_to_drives(point, use_offsets):
+    """
+    The hand expanded transform_axes() calculation before the matrices were used,
+    one point at a time, used as the reference for the matrix transforms.
+    """
+
+    t_axis, x_axis, y_axis, z_axis, fine_x_axis, fine_y_axis = point
+    xo_offset, yo_offset, zo_offset = ORIGIN_OFFSETS
+    xa_offset, ya_offset, za_offset = OPTICAL_OFFSETS
+    x_offset, y_offset, z_offset, t_offset, fine_x_offset, fine_y_offset = OFFSETS
+    x_scale, y_scale, z_scale, t_scale, fine_x_scale, fine_y_scale = SCALES
+
+    cosine_factor = cos(t_axis * (pi/180.0))
+    sine_factor = sin(t_axis * (pi/180.0))
+
+    x_drive = -(xo_offset * cosine_factor) - (x_axis * cosine_factor) - (z_axis * sine_factor)\
+        - (zo_offset * sine_factor) + xa_offset
+    y_drive = -yo_offset - y_axis + ya_offset
+    z_drive = -(zo_offset * cosine_factor) + (fine_x_axis * sine_factor) - (z_axis * cosine_factor)\
+        + (xo_offset * sine_factor) + za_offset
+    fine_x_drive = -(xo_offset * cosine_factor) - (fine_x_axis * cosine_factor) - (z_axis * sine_factor)\
+        - (zo_offset * sine_factor) + xa_offset
+    fine_y_drive = -yo_offset - fine_y_axis + ya_offset
+    t_drive = t_axis
+
+    if use_offsets:
+        x_motor = x_drive / x_scale
+        y_motor = y_drive / y_scale
+        z_motor = z_drive / z_scale
+        t_motor = t_drive / t_scale
+        fine_x_motor = x_drive / fine_x_scale
+        fine_y_motor = y_drive / fine_y_scale
+    else:
+        x_motor = (x_drive - x_offset) / x_scale
+        y_motor = (y_drive - y_offset) / y_scale
+        z_motor = (z_drive - z_offset) / z_scale
+        t_motor = (t_drive - t_offset) / t_scale
+        fine_x_motor = (fine_x_drive - fine_x_offset) / fine_x_scale
+        fine_y_motor = (fine_y_drive - fine_y_offset) / fine_y_scale
+
+    return ((x_drive, y_drive, z_drive, t_drive, fine_x_drive, fine_y_drive),
+            (x_motor, y_motor, z_motor, t_motor, fine_x_motor, fine_y_motor))
+
+
+def baseline_drives_to_axes(point, use_offsets):
+    """
+    The hand expanded transform_drives() calculation before the matrices were used.
+    """
+
+    t_drive, x_drive, y_drive, z_drive, fine_x_drive, fine_y_drive = point
+    xo_offset, yo_offset, zo_offset = ORIGIN_OFFSETS
+    xa_offset, ya_offset, za_offset = OPTICAL_OFFSETS
+    x_offset, y_offset, z_offset, t_offset, fine_x_offset, fine_y_offset = OFFSETS
+    x_scale, y_scale, z_scale, t_scale, fine_x_scale, fine_y_scale = SCALES
+
+    cosine_factor = cos(t_drive * (pi / 180))
+    sine_factor = sin(t_drive * (pi / 180))
+
+    if use_offsets:
+        x_motor = x_drive / x_scale
+        y_motor = y_drive / y_scale
+        z_motor = z_drive / z_scale
+        t_motor = t_drive / t_scale
+        fine_x_motor = fine_x_drive / fine_x_scale
+        fine_y_motor = fine_y_drive / fine_y_scale
+    else:
+        x_motor = (x_drive - x_offset) / x_scale
+        y_motor = (y_drive - y_offset) / y_scale
+        z_motor = (z_drive - z_offset) / z_scale
+        t_motor = (t_drive - t_offset) / t_scale
+        fine_x_motor = (fine_x_drive - fine_x_offset) / fine_x_scale
+        fine_y_motor = (fine_y_drive - fine_y_offset) / fine_y_scale
+
+    x_axis = -(x_drive * cosine_factor) + (z_drive * sine_factor) - xo_offset + \
+        (xa_offset * cosine_factor) + (za_offset * sine_factor)
+    y_axis = -yo_offset - y_drive + ya_offset
+    z_axis = -(fine_x_drive * sine_factor) - (z_drive * cosine_factor) - zo_offset + \
+        (xa_offset * sine_factor) + (za_offset * cosine_factor)
+    t_axis = t_drive
+    fine_x_axis = -(fine_x_drive * cosine_factor) + (z_drive * sine_factor) - xo_offset +\
+        (xa_offset * cosine_factor) + (za_offset * sine_factor)
+    fine_y_axis = -yo_offset - fine_y_drive + ya_offset
+
+    return ((x_axis, y_axis, z_axis, t_axis, fine_x_axis, fine_y_axis),
+            (x_motor, y_motor, z_motor, t_motor, fine_x_motor, fine_y_motor))
+
+
+def make_points(count=50, seed=0):
+    """
+    Create (angle, x, y, z, fine_x, fine_y) points, with repeated angles so that the
+    matrices are shared between points.
+    """
+
+    rng = np.random.RandomState(seed)
+    points = rng.uniform(-5, 5, size=(count, 6))
+    points[:, 0] = rng.choice([-90.0, 0.0, 12.5, 45.0, 180.0, 271.0], size=count)
+
+    return points
+
+
+@pytest.fixture
+def calibration():
+
+    return CalibrationSnapshot(0, ORIGIN_OFFSETS, OPTICAL_OFFSETS, OFFSETS, SCALES)
+
+
+@pytest.fixture
+def transform(monkeypatch):
+    """
+    An XZT_Transform whose calibration PVs are served by a SimulatedIOC.
+    """
+
+    ioc = PVBackend.SimulatedIOC()
+    monkeypatch.setattr(PVBackend, '_backend', ioc)
+    xzt_transform = XZT_Transform('test')
+    coordsys = xzt_transform.coordsys
+    values = ORIGIN_OFFSETS + OPTICAL_OFFSETS + OFFSETS + SCALES
+    for pv_name, value in zip(coordsys.get_pv_names(coordsys.calibration_pvs), values):
+        ioc.set_value(pv_name, value)
+
+    return xzt_transform
+
+
+@pytest.mark.parametrize('use_offsets', [True, False])
+@pytest.mark.parametrize('use_cache', [True, False])
+def test_axes_to_drives_matches_baseline(calibration, use_offsets, use_cache):
+
+    points = make_points()
+    cache = MatrixCache() if use_cache else None
+    drives, motors = axes_to_drives(calibration, points, use_offsets=use_offsets, cache=cache)
+
+    expected = [baseline_axes_to_drives(point, use_offsets) for point in points]
+    np.testing.assert_allclose(drives, [drive for drive, motor in expected], atol=1e-12)
+    np.testing.assert_allclose(motors, [motor for drive, motor in expected], atol=1e-12)
+
+
+@pytest.mark.parametrize('use_offsets', [True, False])
+@pytest.mark.parametrize('use_cache', [True, False])
+def test_drives_to_axes_matches_baseline(calibration, use_offsets, use_cache):
+
+    points = make_points()
+    cache = MatrixCache() if use_cache else None
+    axes, motors = drives_to_axes(calibration, points, use_offsets=use_offsets, cache=cache)
+
+    expected = [baseline_drives_to_axes(point, use_offsets) for point in points]
+    np.testing.assert_allclose(axes, [axis for axis, motor in expected], atol=1e-12)
+    np.testing.assert_allclose(motors, [motor for axis, motor in expected], atol=1e-12)
+
+
+@pytest.mark.parametrize('use_offsets', [True, False])
+def test_scalar_transforms_match_baseline(transform, use_offsets):
+
+    for point in make_points(10, seed=1):
+        angle, x, y, z, fine_x, fine_y = point
+
+        transform.transform_axes(angle, x, y, z, fine_x, fine_y, use_offsets, use_pvs=False)
+        drives, motors = baseline_axes_to_drives(point, use_offsets)
+        np.testing.assert_allclose(transform.get_drive_positions(), drives, atol=1e-12)
+        np.testing.assert_allclose(transform.get_motor_positions(), motors, atol=1e-12)
+
+        transform.transform_drives(angle, x, y, z, fine_x, fine_y, use_offsets, use_pvs=False)
+        axes, motors = baseline_drives_to_axes(point, use_offsets)
+        np.testing.assert_allclose(transform.get_axis_positions(), axes, atol=1e-12)
+        np.testing.assert_allclose(transform.get_motor_positions(), motors, atol=1e-12)
+
+
+@pytest.mark.parametrize('use_offsets', [True, False])
+def test_batch_transforms_match_scalar(transform, use_offsets):
+
+    points = make_points(20, seed=2)
+    drives, motors = transform.transform_axes_array(points, use_offsets=use_offsets)
+    axes, drive_motors = transform.transform_drives_array(*points.T, use_offsets=use_offsets)
+
+    for i, point in enumerate(points):
+        transform.transform_axes(*point, use_offsets=use_offsets, use_pvs=False)
+        np.testing.assert_allclose(drives[i], transform.get_drive_positions(), atol=1e-12)
+        np.testing.assert_allclose(motors[i], transform.get_motor_positions(), atol=1e-12)
+
+        transform.transform_drives(*point, use_offsets=use_offsets, use_pvs=False)
+        np.testing.assert_allclose(axes[i], transform.get_axis_positions(), atol=1e-12)
+        np.testing.assert_allclose(drive_motors[i], transform.get_motor_positions(), atol=1e-12)
+
+
+@pytest.mark.parametrize('use_offsets', [True, False])
+def test_transform_motors_round_trip(transform, use_offsets):
+
+    for point in make_points(10, seed=3):
+        angle, x, y, z, fine_x, fine_y = point
+        transform.transform_drives(angle, x, y, z, fine_x, fine_y, use_offsets, use_pvs=False)
+        drives = transform.get_drive_positions()
+        axes = transform.get_axis_positions()
+        x_motor, y_motor, z_motor, t_motor, fine_x_motor, fine_y_motor = transform.get_motor_positions()
+
+        transform.transform_motors(t_motor, x_motor, y_motor, z_motor, fine_x_motor, fine_y_motor, use_offsets,
+                                   use_pvs=False)
+        np.testing.assert_allclose(transform.get_drive_positions(), drives, atol=1e-12)
+        np.testing.assert_allclose(transform.get_axis_positions(), axes, atol=1e-12)
+
+
+@pytest.mark.parametrize('use_offsets', [True, False])
+def test_motor_matrices_are_inverse(calibration, use_offsets):
+
+    drives = make_points(20, seed=4)[:, [1, 2, 3, 0, 4, 5]]
+    to_motors = drives_to_motors_matrix(OFFSETS, SCALES, use_offsets)
+    to_drives = motors_to_drives_matrix(OFFSETS, SCALES, use_offsets)
+
+    np.testing.assert_allclose(apply_matrices(to_drives, apply_matrices(to_motors, drives)), drives, atol=1e-12)
+
+    motors = apply_matrices(to_motors, drives)
+    axes, motor_drives = motors_to_axes(calibration, motors[:, [3, 0, 1, 2, 4, 5]], use_offsets=use_offsets)
+    expected, expected_motors = drives_to_axes(calibration, drives[:, [3, 0, 1, 2, 4, 5]], use_offsets=use_offsets)
+    np.testing.assert_allclose(motor_drives, drives, atol=1e-12)
+    np.testing.assert_allclose(axes, expected, atol=1e-12)
@@ -0,0 +1,136 @@
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+pytest.importorskip('pyqtgraph')
+pytest.importorskip('matplotlib')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QPointF
+from PyQt5.QtWidgets import QApplication
+
+import ProfileCache
+from XRF_Boundary import XRFBoundary
+
+#  XRFBoundary is a QWidget.
+app = QApplication.instance() or QApplication([])
+
+STAGE_PV = '2xfm:m58.VAL'
+#  Offsets of one and more pixels.
+OFFSETS = [0.1, 0.25]
+
+
+class EditedRoi(object):
+    """
+    The part of a pyqtgraph.ROI that XRFBoundary.set_roi() uses.
+    """
+
+    def __init__(self, left, top, right, bottom):
+
+        self.position = QPointF(left, top)
+        self.extent = QPointF(right - left, bottom - top)
+
+    def pos(self):
+
+        return self.position
+
+    def size(self):
+
+        return self.extent
+
+    def setSize(self, size, finish=True):
+
+        self.extent = QPointF(*size)
+
+    def setPos(self, x, y, finish=True):
+
+        self.position = QPointF(x, y)
+
+
+@pytest.fixture
+def scan_dir(tmp_path, monkeypatch):
+    """
+    A directory of coarse scans of a sample that moves across a 40 by 30 pixel map as it rotates.
+    """
+
+    monkeypatch.setattr(ProfileCache.profile_cache, 'cache_dir', str(tmp_path / 'profiles'))
+    ProfileCache.profile_cache.clear()
+
+    rng = np.random.default_rng(0)
+    channels = np.array([b'Fe', b'Zn'])
+    for i, angle in enumerate(rng.permutation(np.linspace(-90, 90, 12))):
+        height, width = 30, 40
+        cube = rng.uniform(0, 0.5, (len(channels), height, width))
+        center = int(width / 2 + 10 * np.sin(np.radians(angle)))
+        cube[:, 8:22, center - 6:center + 6] += rng.uniform(5, 10, (len(channels), 14, 12))
+        with h5py.File(str(tmp_path / 'scan_{:04d}.h5'.format(i)), 'w') as hdf_file:
+            maps = hdf_file.create_group('MAPS')
+            maps['XRF_roi'] = cube
+            maps['x_axis'] = np.linspace(-1.5, 1.5, width)
+            maps['y_axis'] = np.linspace(-1, 1, height)
+            maps['channel_names'] = channels
+            maps['extra_pvs'] = np.array([[b'a', STAGE_PV.encode('ascii')], [b'0', str(angle).encode('ascii')]])
+
+    return str(tmp_path)
+
+
+def build_scan(boundary, offset):
+    """
+    Find boundaries and build the fine scans the way CoarseScanWidget does.
+    """
+
+    boundary.calc_bounds_sweep([0, 1], True, 'sum')
+    boundary.select_coefficient(20)
+    boundary.interpolate_bounds(1.0)
+    boundary.offset_bounds(0.5, offset, offset, offset, offset)
+    boundary.offset_ROI_bounds(offset, offset, offset, offset)
+
+    return
+
+
+def open_boundary(directory, files):
+
+    boundary = XRFBoundary()
+    boundary.open_files(directory, files, STAGE_PV)
+
+    return boundary
+
+
+@pytest.mark.parametrize('offset', OFFSETS)
+def test_unchanged_roi_keeps_rows(scan_dir, offset):
+
+    files = sorted(file_name for file_name in os.listdir(scan_dir) if file_name.endswith('.h5'))
+    boundary = open_boundary(scan_dir, files)
+    build_scan(boundary, offset)
+    assert boundary.roi_shifts != (0, 0, 0, 0)
+    rows = [list(row) for row in boundary.bounds_positions]
+
+    for index in (0, 5, len(files) - 1):
+        bounds = boundary.bounds
+        boundary.set_roi(index, EditedRoi(bounds[0][index], bounds[2][index], bounds[1][index], bounds[3][index]))
+        boundary.emit_roi_changes()
+
+        assert boundary.bounds_positions == rows
+
+
+@pytest.mark.parametrize('offset', OFFSETS)
+@pytest.mark.parametrize('added', [0, 6])
+def test_added_file_matches_full_set(scan_dir, offset, added):
+
+    files = sorted(file_name for file_name in os.listdir(scan_dir) if file_name.endswith('.h5'))
+    full = open_boundary(scan_dir, files)
+    build_scan(full, offset)
+
+    #  Leave out the scan at one position of the sorted angles, and add it afterwards.
+    new_file = full.file_names[0][added]
+    boundary = open_boundary(scan_dir, [file_name for file_name in files if file_name != new_file])
+    build_scan(boundary, offset)
+    assert boundary.add_files([os.path.join(scan_dir, new_file)], STAGE_PV) == 1
+
+    assert list(boundary.file_names[0]) == list(full.file_names[0])
+    for key in range(4):
+        np.testing.assert_array_equal(boundary.bounds[key], full.bounds[key])
+    assert boundary.bounds_positions == full.bounds_positions